@@ -0,0 +1,91 @@
+"""Load test for the project-01 agent server: throughput vs number of concurrent chat sessions.
+
+Starts server.py in this process on a free port, with bench/fake_llm.FakeChatModel
+as the model (default 200 ms to first token, 2 ms per token). Then for each
+session count it opens that many keep-alive connections, and each session sends
+its messages one after another. The router is off, so every turn reaches the model.
+
+Run from the repo root:  python bench/agent_server_load.py [--sessions 1,4,16,64] [--max-model-calls 32]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-01-ai-agent"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-offline")
+
+import main  # noqa: E402
+import server  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+
+MESSAGES = ["hi im genesis", "what can you do?", "5 + 5 please", "tell me about loops", "thanks!"]
+
+
+async def post(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: dict) -> Tuple[int, dict]:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(b"POST /chat HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    status = int(head.split(" ", 2)[1])
+    length = next(int(line.split(":", 1)[1]) for line in head.split("\r\n") if line.lower().startswith("content-length"))
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def session(port: int, sid: str, turns: int, latencies: List[float], statuses: List[int]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for i in range(turns):
+            started = time.perf_counter()
+            status, _ = await post(reader, writer, {"session": sid, "message": MESSAGES[i % len(MESSAGES)]})
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+    finally:
+        writer.close()
+
+
+def pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+async def run(args: argparse.Namespace) -> None:
+    main._MODELS[(main.MODEL_NAME, 0.0)] = FakeChatModel(latency_ms=args.latency_ms, token_ms=args.token_ms, reply_tokens=args.tokens)
+    chat = await server.create_chat_server("memory", max_model_calls=args.max_model_calls, use_router=False)
+    srv = await server.start(chat, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    print(f"fake model: {args.latency_ms:.0f} ms to first token, {args.token_ms:.0f} ms/token, {args.tokens} tokens; "
+          f"model calls at once: {args.max_model_calls}; {args.turns} turns per session")
+    print(f"{'sessions':>8}{'turns':>7}{'turns/s':>9}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'non-200':>9}")
+    base = None
+    async with srv:
+        for n in [int(x) for x in args.sessions.split(",")]:
+            latencies: List[float] = []
+            statuses: List[int] = []
+            started = time.perf_counter()
+            await asyncio.gather(*(session(port, f"load-{n}-{i}", args.turns, latencies, statuses) for i in range(n)))
+            elapsed = time.perf_counter() - started
+            rate = len(latencies) / elapsed
+            base = base or rate
+            errors = sum(1 for s in statuses if s != 200)
+            print(f"{n:>8}{len(latencies):>7}{rate:>9.1f}{rate / base:>8.1f}x{pct(latencies, .5) * 1e3:>9.0f}{pct(latencies, .95) * 1e3:>9.0f}{errors:>9}")
+    st = chat.stats()
+    print(f"model calls: {st['model_calls']}, served: {st['served']}, rejected: {st['rejected']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", default="1,2,4,8,16,32,64,128")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--max-model-calls", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--tokens", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""Project-01 agent over a 50-turn scripted conversation: per-turn latency and prompt-token growth.
+
+Compares no memory (old behaviour), a checkpointed thread without trimming, and
+checkpointed threads trimmed to AGENT_HISTORY_TOKENS (in-memory and SQLite).
+Uses bench/fake_llm.FakeChatModel, so it runs offline.
+
+Run from the repo root:  python bench/agent_threads.py [turns] [--latency-ms 5]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-01-ai-agent"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-offline")
+
+import main  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+
+SCRIPT = [
+    "hi im genesis",
+    "5 + 5",
+    "now add 7 to that, so 10 + 7",
+    "say hello to Genesis",
+    "what did I ask you first?",
+    "what is 12.5 + 30",
+    "can you explain how you did that?",
+    "say hello to Ada",
+    "what tools do you have?",
+    "thanks, what was my name again?",
+]
+
+
+def pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def run(mode: str, history_tokens: int, turns: int, thread: str) -> Dict[str, Any]:
+    main.HISTORY_TOKENS = history_tokens
+    agent = main.get_agent(mode)
+    config = {"configurable": {"thread_id": thread}}
+    latencies: List[float] = []
+    prompt_tokens: List[int] = []
+    for turn in range(turns):
+        text = SCRIPT[turn % len(SCRIPT)]
+        started = time.perf_counter()
+        result = agent.invoke({"messages": [HumanMessage(content=text)]}, config)
+        latencies.append(time.perf_counter() - started)
+        messages = result["messages"]
+        start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        prompt_tokens.append(sum((m.usage_metadata or {}).get("input_tokens", 0) for m in messages[start:] if isinstance(m, AIMessage)))
+    return {"latencies": latencies, "prompt_tokens": prompt_tokens, "stored": len(result["messages"])}
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("turns", type=int, nargs="?", default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    main._MODELS[(main.MODEL_NAME, 0.0)] = FakeChatModel(latency_ms=args.latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "checkpoints.db")
+        cases = [
+            ("off", "off", 0),
+            ("memory, untrimmed", "memory", 10**9),
+            (f"memory, {main.HISTORY_TOKENS} tok", "memory", main.HISTORY_TOKENS),
+        ]
+        if main.SqliteSaver is not None:
+            cases.append((f"sqlite, {main.HISTORY_TOKENS} tok", "sqlite", main.HISTORY_TOKENS))
+
+        picks = [t for t in (1, 10, 25, args.turns) if t <= args.turns]
+        print(f"{args.turns} turns; prompt tokens per turn at turns {picks}")
+        print(f"{'mode':<22}{'p50 ms':>8}{'p95 ms':>8}{'total tok':>11}  per-turn tokens{'':>12}stored msgs")
+        for i, (label, mode, budget) in enumerate(cases):
+            r = run(mode, budget, args.turns, thread=f"bench-{i}")
+            growth = " ".join(f"{r['prompt_tokens'][t - 1]:>6}" for t in picks)
+            print(f"{label:<22}{pct(r['latencies'], .5) * 1e3:>8.2f}{pct(r['latencies'], .95) * 1e3:>8.2f}"
+                  f"{sum(r['prompt_tokens']):>11}  {growth}  {r['stored']:>6}")
+
+
+if __name__ == "__main__":
+    main_()
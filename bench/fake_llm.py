@@ -0,0 +1,157 @@
+"""Deterministic fake chat model for the offline replay benchmarks.
+
+Speaks just enough of each project's protocol to drive the real code paths:
+tool calls for the project-01 agent, suggestion lines for Study Buddy and
+{"cards": [...]} JSON for the flashcard generator. Same prompt in, same reply
+out; latency and reply length are configurable.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+
+WORDS = ("the", "a", "list", "value", "loop", "function", "returns", "each", "item", "python", "example",
+         "so", "you", "can", "see", "how", "it", "works", "step", "then", "variable", "call", "result", "first")
+
+_ADD = re.compile(r"(-?\d+(?:\.\d+)?)\s*\+\s*(-?\d+(?:\.\d+)?)")
+_HELLO = re.compile(r"hello to ([A-Za-z]+)", re.I)
+_CARD_COUNT = re.compile(r"Number of cards:\s*(\d+)")
+_CARD_TOPIC = re.compile(r"Topic:\s*(.+)")
+
+# OpenAI-style prompt caching: prompts of 1024+ tokens reuse a shared prefix in 128-token blocks.
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = 0.0  # before the first token
+    token_ms: float = 0.0  # between streamed tokens
+    reply_tokens: int = 60
+    model_name: str = "fake-chat"
+    _recent: List[str] = PrivateAttr(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    # -- reply planning ------------------------------------------------------
+
+    def _cached_tokens(self, prompt: str) -> int:
+        best = 0
+        for seen in self._recent:
+            n = 0
+            for a, b in zip(seen, prompt):
+                if a != b:
+                    break
+                n += 1
+            best = max(best, n)
+        self._recent = (self._recent + [prompt])[-8:]
+        tokens = best // 4
+        return tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS if tokens >= CACHE_MIN_TOKENS else 0
+
+    def _plan(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, Any]]:
+        """(content pieces, tool calls, usage metadata) for this prompt."""
+        prompt = "\n".join(f"{m.type}: {_text(m)}" for m in messages)
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        last = messages[-1]
+        last_text = _text(last)
+        names = {t["function"]["name"] for t in tools or []}
+        pieces: List[str] = []
+        calls: List[Dict[str, Any]] = []
+
+        def words(n: int) -> List[str]:
+            return [" " + rng.choice(WORDS) for _ in range(n)]
+
+        add = _ADD.search(last_text) if isinstance(last, HumanMessage) else None
+        hello = _HELLO.search(last_text) if isinstance(last, HumanMessage) else None
+        count = _CARD_COUNT.search(prompt)
+        if add and "calculator" in names:
+            calls.append({"name": "calculator", "args": {"a": float(add[1]), "b": float(add[2])}, "id": f"call_{rng.getrandbits(32):08x}"})
+        elif hello and "say_hello" in names:
+            calls.append({"name": "say_hello", "args": {"name": hello[1]}, "id": f"call_{rng.getrandbits(32):08x}"})
+        elif isinstance(last, ToolMessage):
+            pieces = [last_text] + words(max(0, self.reply_tokens // 4))
+        elif count:
+            topic = (_CARD_TOPIC.search(prompt) or [None, "topic"])[1].strip()
+            cards = [{"q": f"{topic} Q{i + 1}:" + "".join(words(8)) + "?", "a": "".join(words(14)).strip()} for i in range(int(count[1]))]
+            # Split the JSON into ~4-character pieces, like a real token stream.
+            raw = json.dumps({"cards": cards})
+            pieces = [raw[i:i + 4] for i in range(0, len(raw), 4)]
+        else:
+            pieces = ["Sure!"] + words(self.reply_tokens)
+            if "LAST_TOPIC_SUGGESTION" in prompt:
+                topic = " ".join(last_text.split()[-2:]).strip("?.!") or "python"
+                pieces += ["\n", "LAST_TOPIC", "_SUGGESTION: ", topic, "\n"]
+                if "don't get" in last_text.lower():
+                    pieces += ["STUCK_POINT_SUGGESTION: ", topic, "\n"]
+
+        input_tokens = len(prompt) // 4
+        output_tokens = len(pieces) + 20 * len(calls)
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": self._cached_tokens(prompt)},
+        }
+        return pieces, calls, usage
+
+    def _message(self, pieces: List[str], calls: List[Dict[str, Any]], usage: Dict[str, Any]) -> ChatResult:
+        msg = AIMessage(content="".join(pieces), tool_calls=calls, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _chunks(self, pieces: List[str], calls: List[Dict[str, Any]], usage: Dict[str, Any]) -> Iterator[Tuple[float, ChatGenerationChunk]]:
+        # (seconds to wait first, chunk); the final chunk carries usage like stream_usage=True.
+        for i, piece in enumerate(pieces):
+            delay = self.latency_ms if i == 0 else self.token_ms
+            yield delay / 1000, ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        tool_chunks = [
+            {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i} for i, c in enumerate(calls)
+        ]
+        delay = 0.0 if pieces else self.latency_ms
+        yield delay / 1000, ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_chunks, usage_metadata=usage))
+
+    # -- BaseChatModel hooks -------------------------------------------------
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        pieces, calls, usage = self._plan(messages, kwargs.get("tools"))
+        time.sleep((self.latency_ms + self.token_ms * max(0, len(pieces) - 1)) / 1000)
+        return self._message(pieces, calls, usage)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        pieces, calls, usage = self._plan(messages, kwargs.get("tools"))
+        await asyncio.sleep((self.latency_ms + self.token_ms * max(0, len(pieces) - 1)) / 1000)
+        return self._message(pieces, calls, usage)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for delay, chunk in self._chunks(*self._plan(messages, kwargs.get("tools"))):
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for delay, chunk in self._chunks(*self._plan(messages, kwargs.get("tools"))):
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
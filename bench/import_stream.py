@@ -0,0 +1,84 @@
+"""Flashcards bulk import: streaming importer vs reading the whole file and upserting deck by deck.
+
+Writes a synthetic CSV (default 500k rows, ~20% duplicates) and imports it into
+fresh JSON and SQLite stores. Peak memory is tracemalloc's peak during the import.
+
+Run from the repo root:  python bench/import_stream.py [rows]
+"""
+from __future__ import annotations
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-03-flashcards-ui"))
+
+import importer  # noqa: E402
+from cards import Card, pack_cards  # noqa: E402
+from storage import Deck, StorageBackend, clean_card, get_backend  # noqa: E402
+
+
+def write_csv(path: str, rows: int) -> None:
+    rng = random.Random(5)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["front", "back"])
+        for _ in range(rows):
+            k = rng.randrange(int(rows * 0.8))
+            w.writerow([f"What is term {k}, really?", f"Definition number {k}, with a longer explanation to be realistic."])
+
+
+def naive_import(backend: StorageBackend, path: str) -> int:
+    # Whole file in memory, dedupe on the cards themselves, one upsert (and fsync) per deck.
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    seen = set()
+    cards = []
+    for q, a in rows:
+        card = clean_card(q, a)
+        if card and card not in seen:
+            seen.add(card)
+            cards.append(Card(*card))
+    size = importer.IMPORT_DECK_MAX_CARDS
+    for n, i in enumerate(range(0, len(cards), size)):
+        backend.upsert_deck(Deck(f"naive_{n}", f"naive ({n + 1})", "bench", "Beginner", pack_cards(cards[i : i + size]), time.time()))
+    return len(cards)
+
+
+def measure(fn: Callable[[str], int], tmp: str, label: str) -> Tuple[float, float, int]:
+    # Timed run and traced run into separate fresh stores: tracemalloc slows allocation-heavy code.
+    started = time.perf_counter()
+    cards = fn(os.path.join(tmp, label + "-timed"))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn(os.path.join(tmp, label + "-traced"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, cards
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.csv")
+        write_csv(path, rows)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.0f} MB CSV; decks of {importer.IMPORT_DECK_MAX_CARDS} cards")
+        print(f"{'':<22}{'seconds':>9}{'rows/s':>10}{'peak MB':>9}{'cards':>9}")
+        for kind in ("json", "sqlite"):
+            os.environ["FLASHCARDS_STORAGE"] = kind  # import_file writes through get_backend()
+            for label in ("naive", "streaming"):
+                if label == "naive":
+                    run = lambda memory_dir: naive_import(get_backend(memory_dir), path)  # noqa: E731
+                else:
+                    run = lambda memory_dir: importer.import_file(memory_dir, path).cards  # noqa: E731
+                elapsed, peak, cards = measure(run, tmp, f"{kind}-{label}")
+                print(f"{kind + ', ' + label:<22}{elapsed:>9.2f}{rows / elapsed:>10.0f}{peak:>9.1f}{cards:>9}")
+
+if __name__ == "__main__":
+    main()
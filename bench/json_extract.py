@@ -0,0 +1,80 @@
+"""Micro-benchmark: regex-based vs single-pass JSON extraction on model output.
+
+Run from the repo root:  python bench/json_extract.py
+"""
+from __future__ import annotations
+
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-03-flashcards-ui"))
+
+from json_stream import extract_json_object  # noqa: E402
+
+
+def regex_extract(text: str) -> dict:
+    # The previous agent._extract_json_object, kept here as the baseline.
+    text = (text or "").strip()
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+
+    m = re.search(r"\{[\s\S]*\}", text)
+    if not m:
+        raise ValueError("No JSON object found in model output.")
+    return json.loads(m.group(0))
+
+
+def _deck(n: int) -> str:
+    return json.dumps({"cards": [{"q": f"What does {{term {i}}} mean?", "a": f"It means {i}."} for i in range(n)]})
+
+
+def cases() -> List[Tuple[str, str]]:
+    big = _deck(20_000)
+    return [
+        ("clean 1MB", big),
+        ("prose + fence 1MB", "Sure! Here you go:\n```json\n" + big + "\n```\nLet me know {if} you need more."),
+        ("prose braces first", "Use {curly} braces like {this}. " + _deck(2_000)),
+        ("prose quote + brace", 'I have a "quote {" here. ' + _deck(2_000)),
+        ("truncated 1MB", big[: len(big) // 2]),
+        ("brace, truncated 1MB", "Use {curly} braces. " + big[: len(big) // 2]),
+        ("20k unclosed '{'", "{" * 20_000),
+        ("20k '{' then deck", "{ " * 20_000 + _deck(200)),
+        # Each "{" starts a valid-looking prefix that only fails at the end (and
+        # nests past the recursion limit): quadratic if every "{" is retried.
+        ("nested 8k '{\"a\":'", '{"a":' * 8_000 + "x"),
+        ("nested 20k '{\"a\":'", '{"a":' * 20_000 + "x"),
+        ("50k bad objects", '{"q" oops} ' * 50_000 + _deck(200)),
+    ]
+
+
+def run(fn: Callable[[str], Dict[str, Any]], text: str, repeat: int = 3) -> Tuple[float, str]:
+    best = float("inf")
+    outcome = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            data = fn(text)
+            cards = data.get("cards") if isinstance(data, dict) else None
+            outcome = f"{len(cards)} cards" if isinstance(cards, list) else "object w/o cards"
+        except Exception as e:
+            outcome = type(e).__name__
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, outcome
+
+
+def main() -> None:
+    print(f"{'case':<22} {'regex ms':>10} {'result':<18} {'scanner ms':>10} {'result':<18}")
+    for name, text in cases():
+        old_ms, old_out = run(regex_extract, text)
+        new_ms, new_out = run(extract_json_object, text)
+        print(f"{name:<22} {old_ms:>10.1f} {old_out:<18} {new_ms:>10.1f} {new_out:<18}")
+
+
+if __name__ == "__main__":
+    main()
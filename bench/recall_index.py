@@ -0,0 +1,76 @@
+"""Study Buddy recall index at 100k entries: append cost, open cost, top-k search latency.
+
+Run from the repo root:  python bench/recall_index.py [entries]
+"""
+from __future__ import annotations
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-02-study-buddy"))
+
+from recall import RecallIndex  # noqa: E402
+
+
+TOPICS = ["list comprehension", "dictionary", "class", "decorator", "generator", "exception", "recursion",
+          "SQL join", "git rebase", "async await", "closure", "lambda", "tuple unpacking", "f-string"]
+VERBS = ["explain", "show an example of", "why does", "when should I use", "how do I debug", "compare"]
+
+
+def entry(rng: random.Random) -> str:
+    topic = rng.choice(TOPICS)
+    return f"Q: {rng.choice(VERBS)} {topic} in python {rng.randint(0, 9999)}\nA: A {topic} lets you {rng.choice(VERBS)} things."
+
+
+def pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / "recall"
+        index = RecallIndex(directory)
+
+        started = time.perf_counter()
+        batch = 1_000
+        for start in range(0, n, batch):
+            texts = [entry(rng) for _ in range(min(batch, n - start))]
+            index.add(texts, [{"kind": "turn", "session": str(start)} for _ in texts])
+        build_s = time.perf_counter() - started
+
+        single = []
+        for _ in range(50):
+            t = time.perf_counter()
+            index.add([entry(rng)], [{"kind": "turn", "session": "live"}])
+            single.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        index = RecallIndex(directory)
+        open_s = time.perf_counter() - t
+
+        queries = [f"I don't get {rng.choice(TOPICS)}" for _ in range(200)]
+        index.search(queries[0])  # map the matrix once
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            hits = index.search(q, k=3, exclude=lambda e: e.get("session") == "live")
+            latencies.append(time.perf_counter() - t)
+        assert len(hits) == 3
+
+        size_mb = (index.vectors_path.stat().st_size + index.entries_path.stat().st_size) / 1e6
+        print(f"{len(index)} entries, dim {index.dim}, {size_mb:.1f} MB on disk")
+        print(f"bulk append:    {build_s:.2f} s ({build_s / n * 1e6:.0f} us/entry)")
+        print(f"single append:  p50 {pct(single, .5) * 1e3:.2f} ms  p95 {pct(single, .95) * 1e3:.2f} ms")
+        print(f"open (no rebuild): {open_s * 1e3:.1f} ms")
+        print(f"top-3 search:   p50 {pct(latencies, .5) * 1e3:.2f} ms  p95 {pct(latencies, .95) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
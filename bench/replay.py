@@ -0,0 +1,345 @@
+"""Offline replay benchmark for all three projects, driven through their real code paths.
+
+project-01: scripted turns through run_chat (ReAct agent + tools).
+project-02: a scripted Study Buddy session through main() (streaming, memory, recall, exit recap).
+project-03: generate_flashcards (cold, cached, batched) and the deck storage functions.
+
+Every model call goes to bench/fake_llm.FakeChatModel, so runs are offline and
+repeatable. Each project runs in its own subprocess (the projects share module
+names) and in three passes: a warm-up, a timed one and one under tracemalloc for allocations.
+File I/O is read from /proc/self/io (Linux; 0 elsewhere).
+
+Run from the repo root:
+    python bench/replay.py                    # run, compare with bench/replay_baseline.json
+    python bench/replay.py --save-baseline    # run and store the result as the new baseline
+    python bench/replay.py --check            # exit 1 if anything regressed
+Options: --only project-02-study-buddy  --latency-ms 20 --token-ms 2 --tokens 120  --tolerance 0.5
+"""
+from __future__ import annotations
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+BASELINE = Path(__file__).resolve().parent / "replay_baseline.json"
+PROJECTS = ("project-01-ai-agent", "project-02-study-buddy", "project-03-flashcards-ui")
+
+# A metric regresses when new > old * (1 + tolerance) + slack; the slack keeps
+# sub-millisecond / few-KB jitter from tripping the check.
+TOLERANCE = {"p50_ms": 0.50, "p95_ms": 0.50, "alloc_kb": 0.10, "read_kb": 0.10, "write_kb": 0.10}
+SLACK = {"p50_ms": 0.5, "p95_ms": 1.0, "alloc_kb": 16.0, "read_kb": 4.0, "write_kb": 4.0}
+METRICS = tuple(TOLERANCE)
+
+AGENT_SCRIPT = [
+    ("agent_chat_turn", "hi im genesis"),
+    ("agent_tool_turn", "5 + 5"),
+    ("agent_tool_turn", "say hello to Genesis"),
+    ("agent_chat_turn", "what can you do?"),
+    ("agent_tool_turn", "what is 12.5 + 30"),
+]
+
+STUDY_QUESTIONS = [
+    "what is a list comprehension?",
+    "show me an example with filtering",
+    "I don't get nested list comprehensions",
+    "how are dictionaries different from lists?",
+    "when should I use a tuple?",
+    "explain python decorators",
+    "I don't get closures",
+    "what does yield do in a generator?",
+    "how do I handle exceptions?",
+    "what is recursion?",
+]
+
+STUDY_PROFILE = {
+    "name": "Genesis",
+    "learning_goal": "python",
+    "experience_level": "beginner",
+    "style": "examples_heavy",
+    "last_topic": "",
+    "stuck_points": [],
+}
+
+TOPICS = ["python lists", "sql joins", "git branches", "http status codes", "big o notation", "css flexbox"]
+
+
+# -- measuring ----------------------------------------------------------------
+
+def _io_counters() -> Tuple[int, int]:
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            fields = dict(line.strip().split(": ", 1) for line in f if ": " in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except Exception:
+        return 0, 0
+
+
+class Recorder:
+    """Per-op wall time, peak Python allocation (when tracing) and bytes read/written."""
+
+    def __init__(self, trace_alloc: bool) -> None:
+        self.trace_alloc = trace_alloc
+        self.samples: Dict[str, List[Tuple[float, int, int, int]]] = {}
+        self._open: Optional[Tuple[str, float, int, int, int]] = None
+        # Reading /proc/self/io is itself a read: measure it once and subtract it.
+        a = _io_counters()[0]
+        self._io_self = _io_counters()[0] - a
+
+    def start(self, name: str) -> None:
+        mem = 0
+        if self.trace_alloc:
+            tracemalloc.reset_peak()
+            mem = tracemalloc.get_traced_memory()[0]
+        read, written = _io_counters()
+        self._open = (name, time.perf_counter(), mem, read, written)
+
+    def stop(self) -> None:
+        if self._open is None:
+            return
+        elapsed_end = time.perf_counter()
+        read, written = _io_counters()
+        name, started, mem, read0, written0 = self._open
+        alloc = tracemalloc.get_traced_memory()[1] - mem if self.trace_alloc else 0
+        self.samples.setdefault(name, []).append(
+            (elapsed_end - started, max(0, alloc), max(0, read - read0 - self._io_self), max(0, written - written0))
+        )
+        self._open = None
+
+    def op(self, name: str, fn: Callable[[], Any]) -> Any:
+        self.start(name)
+        try:
+            return fn()
+        finally:
+            self.stop()
+
+    def scripted_input(self, script: List[Tuple[str, str]]) -> Callable[..., str]:
+        """input() replacement: each call closes the previous op and opens the next one."""
+        lines = iter(script)
+
+        def fake_input(prompt: str = "") -> str:
+            self.stop()
+            name, text = next(lines)
+            self.start(name)
+            return text
+
+        return fake_input
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _summarize(timed: Recorder, traced: Recorder) -> Dict[str, Dict[str, float]]:
+    out: Dict[str, Dict[str, float]] = {}
+    for name, samples in timed.samples.items():
+        seconds = [s[0] for s in samples]
+        allocs = [s[1] for s in traced.samples.get(name, [])] or [0]
+        out[name] = {
+            "ops": len(samples),
+            "p50_ms": round(_pct(seconds, 0.50) * 1e3, 3),
+            "p95_ms": round(_pct(seconds, 0.95) * 1e3, 3),
+            "alloc_kb": round(sum(allocs) / len(allocs) / 1024, 1),
+            "read_kb": round(sum(s[2] for s in samples) / len(samples) / 1024, 1),
+            "write_kb": round(sum(s[3] for s in samples) / len(samples) / 1024, 1),
+        }
+    return out
+
+
+# -- scenarios (each runs inside its project's subprocess) ---------------------
+
+@contextlib.contextmanager
+def _patched_input(fake: Callable[..., str]) -> Any:
+    real = builtins.input
+    builtins.input = fake
+    try:
+        yield
+    finally:
+        builtins.input = real
+
+
+def run_project_01(rec: Recorder, pass_no: int, llm: Any) -> None:
+    import main  # project-01-ai-agent/main.py
+
+    main._MODELS[(main.MODEL_NAME, 0.0)] = llm
+    script = AGENT_SCRIPT * 6 + [("quit", "quit")]
+    with _patched_input(rec.scripted_input(script)), contextlib.redirect_stdout(io.StringIO()):
+        main.run_chat(thread_id=f"bench-{pass_no}")
+    rec.stop()
+    rec.samples.pop("quit", None)
+
+
+def run_project_02(rec: Recorder, pass_no: int, llm: Any) -> None:
+    from rich.console import Console
+
+    import main  # project-02-study-buddy/main.py
+
+    main.console = Console(file=io.StringIO(), width=100)
+    main._MODELS[(main.MODEL_NAME, 0.0)] = llm
+    main.RECAP_MODE = "sync"  # time the model recap as its own op
+    user_id = f"bench-{pass_no}"
+    main.save_profile(user_id, dict(STUDY_PROFILE))
+    script = [("study_turn", q) for q in STUDY_QUESTIONS * 3] + [("exit_recap", "quit")]
+    sys.argv = ["main.py", "--user", user_id]
+    with _patched_input(rec.scripted_input(script)):
+        main.main()
+    rec.stop()
+
+
+def run_project_03(rec: Recorder, pass_no: int, llm: Any) -> None:
+    import agent
+    import storage
+    from cards import Card
+
+    rng = random.Random(7)
+    for i in range(30):
+        rec.op("generate_uncached", lambda: agent.generate_flashcards(f"{TOPICS[i % len(TOPICS)]} {i}", "Beginner", 10, llm=llm, use_cache=False))
+    agent.generate_flashcards("python lists", "Beginner", 10, llm=llm)
+    for _ in range(30):
+        rec.op("generate_cached", lambda: agent.generate_flashcards("python lists", "Beginner", 10, llm=llm))
+    for i in range(8):
+        rec.op("generate_batched_40", lambda: agent.generate_flashcards_batched(f"{TOPICS[i % len(TOPICS)]} batch {i}", "Beginner", 40, llm=llm, use_cache=False))
+
+    memory_dir = os.path.join(os.getcwd(), f"memory-{pass_no}")
+    ids: List[str] = []
+    for i in range(300):
+        cards = [Card(q=f"Question {i}-{j}?", a=f"Answer {j} for deck {i}.") for j in range(25)]
+        deck = storage.Deck(id=f"deck{i:04d}", name=f"Deck {i}", topic=TOPICS[i % len(TOPICS)], difficulty="Beginner", cards=cards, created_at=1_700_000_000.0 + i)
+        rec.op("deck_upsert", lambda: storage.upsert_deck(memory_dir, deck))
+        ids.append(deck.id)
+    for _ in range(100):
+        deck_id = rng.choice(ids)
+        rec.op("deck_load", lambda: storage.load_deck(memory_dir, deck_id))
+    for _ in range(50):
+        offset = rng.randrange(0, 280)
+        rec.op("deck_page", lambda: storage.page_decks(memory_dir, offset, 20))
+    for _ in range(20):
+        rec.op("deck_summaries", lambda: storage.load_deck_summaries(memory_dir))
+
+
+SCENARIOS: Dict[str, Callable[[Recorder, int, Any], None]] = {
+    "project-01-ai-agent": run_project_01,
+    "project-02-study-buddy": run_project_02,
+    "project-03-flashcards-ui": run_project_03,
+}
+
+
+def _worker(project: str, config: Dict[str, Any], out_path: str) -> None:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    sys.path.insert(0, str(ROOT / project))
+    from fake_llm import FakeChatModel
+
+    llm = FakeChatModel(latency_ms=config["latency_ms"], token_ms=config["token_ms"], reply_tokens=config["tokens"])
+    scenario = SCENARIOS[project]
+    scenario(Recorder(trace_alloc=False), 0, llm)  # warm-up: imports, graph compile, first-call caches
+    timed = Recorder(trace_alloc=False)
+    scenario(timed, 1, llm)
+    traced = Recorder(trace_alloc=True)
+    tracemalloc.start()
+    try:
+        scenario(traced, 2, llm)
+    finally:
+        tracemalloc.stop()
+    Path(out_path).write_text(json.dumps(_summarize(timed, traced)), encoding="utf-8")
+
+
+# -- driver -------------------------------------------------------------------
+
+def _run_project(project: str, config: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        out_path = os.path.join(tmp, "result.json")
+        env = dict(os.environ)
+        env.update({
+            "OPENAI_API_KEY": "sk-bench-offline",
+            "STUDY_BUDDY_MEMORY_DIR": os.path.join(tmp, "study-memory"),
+            "FLASHCARDS_CACHE_DIR": os.path.join(tmp, "gen_cache"),
+            "FLASHCARDS_STORAGE": "json",
+        })
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", project, "--out", out_path,
+               "--latency-ms", str(config["latency_ms"]), "--token-ms", str(config["token_ms"]), "--tokens", str(config["tokens"])]
+        subprocess.run(cmd, cwd=tmp, env=env, check=True)
+        return json.loads(Path(out_path).read_text(encoding="utf-8"))
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: Optional[float] = None) -> List[str]:
+    """Human-readable regressions of result against baseline (empty when none)."""
+    regressions = []
+    for project, ops in result["projects"].items():
+        for op, stats in ops.items():
+            old = baseline.get("projects", {}).get(project, {}).get(op)
+            if not old:
+                continue
+            for metric in METRICS:
+                tol = TOLERANCE[metric] if tolerance is None or not metric.endswith("_ms") else tolerance
+                if stats[metric] > old[metric] * (1 + tol) + SLACK[metric]:
+                    regressions.append(f"{project} {op} {metric}: {old[metric]} -> {stats[metric]}")
+    return regressions
+
+
+def _print_table(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    header = f"{'op':<22}{'ops':>5}{'p50 ms':>10}{'p95 ms':>10}{'alloc KB':>10}{'read KB':>9}{'write KB':>9}  vs baseline p50"
+    for project, ops in result["projects"].items():
+        print(f"\n{project}\n{header}")
+        for op, s in ops.items():
+            old = (baseline or {}).get("projects", {}).get(project, {}).get(op)
+            delta = f"{(s['p50_ms'] / old['p50_ms'] - 1) * 100:+.0f}%" if old and old["p50_ms"] else "-"
+            print(f"{op:<22}{s['ops']:>5}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['alloc_kb']:>10.1f}{s['read_kb']:>9.1f}{s['write_kb']:>9.1f}  {delta}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", choices=PROJECTS, action="append", help="run just this project (repeatable)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake model time to first token")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="fake model time per streamed token")
+    parser.add_argument("--tokens", type=int, default=60, help="fake model reply length in tokens")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 on any regression")
+    parser.add_argument("--tolerance", type=float, default=None, help="allowed latency slowdown ratio (default 0.5)")
+    parser.add_argument("--worker", choices=PROJECTS, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    config = {"latency_ms": args.latency_ms, "token_ms": args.token_ms, "tokens": args.tokens}
+    if args.worker:
+        _worker(args.worker, config, args.out)
+        return
+
+    result: Dict[str, Any] = {"config": config, "python": sys.version.split()[0], "projects": {}}
+    for project in args.only or PROJECTS:
+        result["projects"][project] = _run_project(project, config)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    if baseline and baseline.get("config") != config:
+        print(f"note: baseline was recorded with {baseline.get('config')}, this run uses {config}")
+    _print_table(result, baseline)
+
+    if args.save_baseline:
+        if baseline and args.only:
+            baseline["projects"].update(result["projects"])
+            result = {**baseline, "config": config, "python": result["python"]}
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+
+    regressions = compare(result, baseline) if baseline else []
+    if baseline:
+        print("\nno regressions vs baseline" if not regressions else "\nregressions:\n  " + "\n  ".join(regressions))
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
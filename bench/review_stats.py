@@ -0,0 +1,87 @@
+"""Flashcards review log at 1M answers: append cost, full stats recompute, cached rerun.
+
+"stats.json rewrite" is what every Study-page rerun used to cost: load
+stats.json, compare dates, write the whole file back.
+
+Run from the repo root:  python bench/review_stats.py [events]
+"""
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-03-flashcards-ui"))
+
+from review_log import DAY_S, REVIEW_DTYPE, REVIEWS_FILE, REVIEW_DECKS_FILE, ReviewLog  # noqa: E402
+from storage import JsonBackend  # noqa: E402
+
+
+def pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def timed(fn: Callable[[], object], rounds: int) -> List[float]:
+    out = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - started)
+    return out
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(11)
+    now = time.time()
+    decks = 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A year of history, written straight in the on-disk layout.
+        events = np.zeros(n, dtype=REVIEW_DTYPE)
+        events["ts"] = np.sort(now - rng.random(n) * 365 * DAY_S)
+        events["deck"] = rng.integers(0, decks, n)
+        events["card"] = rng.integers(0, 200, n)
+        events["grade"] = rng.choice([1, 3, 4, 5], n, p=[0.15, 0.15, 0.5, 0.2])
+        events["ms"] = rng.integers(800, 12_000, n)
+        Path(tmp, REVIEWS_FILE).write_bytes(events.tobytes())
+        Path(tmp, REVIEW_DECKS_FILE).write_text("".join(f"deck-{i}\n" for i in range(decks)), encoding="utf-8")
+
+        started = time.perf_counter()
+        log = ReviewLog(tmp)
+        open_s = time.perf_counter() - started
+
+        append_s = timed(lambda: log.append("deck-7", 3, 4, 2500), 1_000)
+        recompute_s = timed(lambda: log.summary(now + 1e-3 * len(append_s)) if not log.append("deck-7", 3, 4, 2500) else None, 5)
+        cached_s = timed(lambda: log.summary(now), 1_000)
+
+        backend = JsonBackend(tmp)
+
+        def old_rerun() -> None:
+            stats = backend.load_stats()
+            stats["last_study_date"] = time.strftime("%Y-%m-%d")
+            backend.save_stats(stats)
+
+        rewrite_s = timed(old_rerun, 200)
+        summary = log.summary(now)
+
+        print(f"{log.count} review events ({log.count * REVIEW_DTYPE.itemsize / 1e6:.1f} MB); opened in {open_s * 1e3:.2f} ms")
+        print(f"{'':<26}{'p50 us':>10}{'p95 us':>10}")
+        for label, values in (
+            ("append one answer", append_s),
+            ("append + recompute stats", recompute_s),
+            ("rerun, cached stats", cached_s),
+            ("old stats.json rewrite", rewrite_s),
+        ):
+            print(f"{label:<26}{pct(values, .5) * 1e6:>10.1f}{pct(values, .95) * 1e6:>10.1f}")
+        print(f"streak {summary.streak_days} d, recall {summary.recall_rate:.1%}, "
+              f"retention buckets {[n for _, n, _ in summary.retention]}")
+
+
+if __name__ == "__main__":
+    main()
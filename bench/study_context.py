@@ -0,0 +1,95 @@
+"""Replay a Study Buddy transcript: fixed last-10-messages window vs token-budgeted ContextWindow.
+
+Run from the repo root:  python bench/study_context.py
+"""
+from __future__ import annotations
+
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-02-study-buddy"))
+
+from context import DEFAULT_HISTORY_BUDGET, MESSAGE_OVERHEAD_TOKENS, ContextWindow, count_tokens  # noqa: E402
+
+
+PROFILE: Dict[str, Any] = {
+    "name": "Genesis",
+    "learning_goal": "python",
+    "experience_level": "beginner",
+    "style": "examples_heavy",
+    "last_topic": "",
+    "stuck_points": [],
+}
+
+
+def render(profile: Dict[str, Any]) -> str:
+    # Same shape and size as main.build_system_prompt (main.py needs langchain to import).
+    return (
+        "You are a context-aware AI Study Buddy.\nYour job is to help the user learn efficiently and kindly.\n\n"
+        f"User profile:\n- Name: {profile.get('name')}\n- Learning goal: {profile.get('learning_goal')}\n"
+        f"- Experience level: {profile.get('experience_level')}\n- Last topic: {profile.get('last_topic') or 'None'}\n"
+        f"- Stuck points: {', '.join(profile.get('stuck_points', [])) or 'None'}\n\n"
+        "Teaching style rules:\n- Use concrete examples and mini demos. Explain like I'm learning.\n\n"
+        "Behavior:\n- If the user asks for code, keep it minimal and explain what each part does.\n"
+        "- If the user seems stuck, suggest a smaller step and a quick practice prompt.\n"
+        '- If the user changes topic, update "last_topic" suggestion at the end in a single line like:\n'
+        "  LAST_TOPIC_SUGGESTION: <topic>\n"
+        '- If the user mentions a struggle (ex: "I don\'t get X"), suggest adding it to stuck points like:\n'
+        "  STUCK_POINT_SUGGESTION: <thing>"
+    )
+
+
+def transcript(turns: int = 60, seed: int = 7) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    topics = ["list comprehensions", "dictionaries", "classes", "decorators", "generators", "exceptions"]
+    out = []
+    for i in range(turns):
+        topic = topics[(i // 10) % len(topics)]
+        if rng.random() < 0.5:
+            user, paragraphs = rng.choice(["ok", "thanks!", "got it", "next?"]), 1
+        else:
+            user, paragraphs = f"Can you explain {topic} with an example? I keep mixing it up.", rng.randint(4, 14)
+        para = f"Here is how {topic} work in Python. " + "We walk through a small example line by line. " * 6
+        out.append((user, "\n\n".join([para] * paragraphs)))
+    return out
+
+
+def message_tokens(text: str) -> int:
+    return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def main() -> None:
+    turns = transcript()
+
+    # Before: system prompt rendered every turn, last 10 messages whatever their size.
+    old_tokens, old_renders, history = [], 0, []
+    for user, assistant in turns:
+        system = render(PROFILE)
+        old_renders += 1
+        old_tokens.append(message_tokens(system) + sum(message_tokens(m) for m in history) + message_tokens(user))
+        history = (history + [user, assistant])[-10:]
+
+    # After: cached system prompt + budgeted history + rolling summary.
+    window = ContextWindow(render, budget_tokens=DEFAULT_HISTORY_BUDGET)
+    new_tokens = []
+    for i, (user, assistant) in enumerate(turns):
+        if i % 10 == 0:
+            PROFILE["last_topic"] = f"topic {i // 10}"  # the profile changes now and then
+        system = window.system_prompt(PROFILE)
+        new_tokens.append(message_tokens(system) + window.history_tokens() + message_tokens(user))
+        window.add_turn(user, assistant)
+
+    def p(values: List[int], q: float) -> int:
+        return sorted(values)[int(q * (len(values) - 1))]
+
+    print(f"{len(turns)} turns, history budget {DEFAULT_HISTORY_BUDGET} tokens")
+    print(f"{'':22}{'total':>10}{'p50':>8}{'max':>8}{'prompt renders':>16}")
+    print(f"{'last 10 messages':22}{sum(old_tokens):>10}{p(old_tokens, .5):>8}{max(old_tokens):>8}{old_renders:>16}")
+    print(f"{'ContextWindow':22}{sum(new_tokens):>10}{p(new_tokens, .5):>8}{max(new_tokens):>8}{window.prompt_renders:>16}")
+    print(f"saved {1 - sum(new_tokens) / sum(old_tokens):.0%} of prompt tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Flashcards scheduler at 100k reviewed cards: open cost, next-due latency vs a full scan, review cost.
+
+The scan column is what "what's due now" costs without the heap: look at every
+card's due time and take the smallest.
+
+Run from the repo root:  python bench/study_queue.py [cards] [--decks 500]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "project-03-flashcards-ui"))
+
+from scheduler import DAY_S, GRADES, Scheduler  # noqa: E402
+
+
+def pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cards", type=int, nargs="?", default=100_000)
+    parser.add_argument("--decks", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=2_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    per_deck = max(1, args.cards // args.decks)
+    grades = list(GRADES.values())
+    now = 1_700_000_000.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sched = Scheduler(tmp)
+        started = time.perf_counter()
+        for d in range(args.decks):
+            for i in range(per_deck):
+                sched.review(f"deck-{d}", i, rng.choice(grades), now - rng.random() * 30 * DAY_S)
+        fill_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        sched = Scheduler(tmp)
+        open_s = time.perf_counter() - started
+
+        heap_s: List[float] = []
+        scan_s: List[float] = []
+        review_s: List[float] = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            key = sched.next_due(now)
+            heap_s.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            best = min(sched._states.items(), key=lambda kv: kv[1].due)
+            scan_s.append(time.perf_counter() - t0)
+            assert key is None or best[1].due == sched.state(*key).due
+
+            if key is not None:
+                t0 = time.perf_counter()
+                sched.review(key[0], key[1], rng.choice(grades), now)
+                review_s.append(time.perf_counter() - t0)
+
+        print(f"{args.decks * per_deck} reviewed cards in {args.decks} decks; log written in {fill_s:.2f}s, reopened in {open_s * 1e3:.0f} ms")
+        print(f"{'':<16}{'p50 us':>10}{'p95 us':>10}")
+        for label, values in (("next due (heap)", heap_s), ("next due (scan)", scan_s), ("review", review_s)):
+            if values:
+                print(f"{label:<16}{pct(values, .5) * 1e6:>10.1f}{pct(values, .95) * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,66 @@
+import argparse
 import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
 from dotenv import load_dotenv
 
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
 from langchain_openai import ChatOpenAI
 from langchain.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
 from langgraph.prebuilt import create_react_agent
 
+from router import ToolRouter
+from tool_exec import ToolExecutor
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver  # uv add langgraph-checkpoint-sqlite
+except ImportError:
+    SqliteSaver = None
+
 # Load environment variables from .env
 load_dotenv()
 
+MODEL_NAME = "gpt-4o-mini"
+
+# Conversation memory: "memory" (until the program exits), "sqlite" (survives
+# restarts, in AGENT_DB) or "off" (every message starts from scratch).
+MEMORY_MODES = ("memory", "sqlite", "off")
+MEMORY_MODE = (os.getenv("AGENT_MEMORY") or "memory").strip().lower()
+DB_PATH = os.getenv("AGENT_DB") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.db")
+THREAD_ID = os.getenv("AGENT_THREAD") or "default"
+# Tokens of conversation a thread keeps; older turns are dropped before each model call.
+HISTORY_TOKENS = int(os.getenv("AGENT_HISTORY_TOKENS") or 2000)
+# Answer "5 + 5" / "say hello to X" with the tool directly instead of the agent (AGENT_ROUTER=off disables).
+ROUTER_ENABLED = (os.getenv("AGENT_ROUTER") or "on").strip().lower() not in {"off", "0", "false", "no"}
+# Tool calls of one agent step run side by side, at most this many at a time.
+TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY") or 4)
+
+# One pooled client per (model, temperature) for the whole process, so every
+# turn reuses open keep-alive connections instead of a fresh TLS handshake.
+_MODELS: Dict[Tuple[str, float], ChatOpenAI] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(model: str = MODEL_NAME, temperature: float = 0) -> ChatOpenAI:
+    key = (model, float(temperature))
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            limits = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0)
+            _MODELS[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                http_client=httpx.Client(limits=limits),
+                http_async_client=httpx.AsyncClient(limits=limits),
+            )
+        return _MODELS[key]
+
 
 @tool
 def calculator(a: float, b: float) -> str:
@@ -22,7 +74,70 @@ def say_hello(name: str) -> str:
     return f"Hello {name}, I hope you are well today."
 
 
-def run_chat() -> None:
+# Both tools are pure (same args, same answer), so repeated calls come from the executor's LRU.
+EXECUTOR = ToolExecutor(max_concurrency=TOOL_CONCURRENCY, cache_size=256)
+TOOLS = EXECUTOR.wrap_all([calculator, say_hello], pure=("calculator", "say_hello"))
+
+
+def trim_history(state: Dict[str, Any]) -> Dict[str, Any]:
+    """pre_model_hook: keep the newest whole turns that fit HISTORY_TOKENS."""
+    messages = state["messages"]
+    kept = trim_messages(
+        messages,
+        max_tokens=HISTORY_TOKENS,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+        end_on=("human", "tool"),
+        include_system=True,
+    )
+    if not kept:
+        # The current turn alone is over budget: keep it whole rather than cut it.
+        last_human = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        kept = messages[last_human:]
+    if len(kept) == len(messages):
+        return {"llm_input_messages": messages}
+    # Drop the old turns from the saved thread too, so checkpoints stay small.
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]}
+
+
+def make_checkpointer(memory: str) -> Any:
+    if memory == "off":
+        return None
+    if memory == "sqlite":
+        if SqliteSaver is None:
+            raise RuntimeError(
+                "AGENT_MEMORY=sqlite needs the SQLite checkpointer:\n"
+                "uv add langgraph-checkpoint-sqlite"
+            )
+        return SqliteSaver(sqlite3.connect(DB_PATH, check_same_thread=False))
+    return InMemorySaver()
+
+
+# Compiled agents, one per memory mode, built once and reused for every turn.
+_AGENTS: Dict[str, Any] = {}
+_AGENTS_LOCK = threading.Lock()
+
+
+def build_agent(model: Any, checkpointer: Any) -> Any:
+    return create_react_agent(
+        model,
+        TOOLS,
+        checkpointer=checkpointer,
+        pre_model_hook=trim_history if checkpointer is not None else None,
+    )
+
+
+def get_agent(memory: str = MEMORY_MODE) -> Any:
+    if memory not in MEMORY_MODES:
+        raise ValueError(f"Unknown memory mode: {memory!r} (choose from {', '.join(MEMORY_MODES)})")
+    with _AGENTS_LOCK:
+        if memory not in _AGENTS:
+            _AGENTS[memory] = build_agent(get_model(), make_checkpointer(memory))
+        return _AGENTS[memory]
+
+
+def run_chat(thread_id: Optional[str] = None, memory: Optional[str] = None, use_router: Optional[bool] = None) -> None:
     # Ensure API key is present
     if not os.getenv("OPENAI_API_KEY"):
         raise RuntimeError(
@@ -30,27 +145,59 @@ def run_chat() -> None:
             "OPENAI_API_KEY=sk-..."
         )
 
-    # Create model + agent
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    tools = [calculator, say_hello]
-    agent = create_react_agent(model, tools)
+    # Same compiled agent every turn; the checkpointer carries the conversation per thread
+    memory = memory or MEMORY_MODE
+    agent = get_agent(memory)
+    config = {"configurable": {"thread_id": thread_id or THREAD_ID}, "max_concurrency": TOOL_CONCURRENCY}
+    router = ToolRouter(TOOLS) if (ROUTER_ENABLED if use_router is None else use_router) else None
 
     print("Welcome! I'm your AI assistant. Type 'quit' to exit.")
     print("Try: 'hi im genesis' or '5 + 5' or 'say hello to Genesis'")
+    if memory != "off":
+        print(f"(memory: {memory}, thread: {config['configurable']['thread_id']})")
 
     while True:
         user_input = input("\nYou: ").strip()
 
         if user_input.lower() in {"quit", "exit"}:
+            if router and router.hits:
+                st = router.stats()
+                print(
+                    f"(answered {st['hits']} of {st['messages']} messages locally ({st['hit_rate']:.0%}), "
+                    f"about {st['saved_s']:.1f}s saved)"
+                )
+            for name, ts in EXECUTOR.stats().items():
+                print(f"({name}: {ts['calls']} calls, {ts['cache_hits']} cached, p50 {ts['p50_ms']:.2f} ms, p95 {ts['p95_ms']:.2f} ms)")
             print("Bye! 👋")
             break
 
+        # Fast path: the tool answers on its own, no model call
+        started = time.perf_counter()
+        assistant_text = router.route(user_input) if router else None
+        if assistant_text is not None:
+            if memory != "off":
+                # Keep the thread complete so follow-ups ("now add 7 to that") still work
+                agent.update_state(
+                    config,
+                    {"messages": [HumanMessage(content=user_input), AIMessage(content=assistant_text)]},
+                    as_node="agent",
+                )
+            print("\nAssistant:", assistant_text)
+            continue
+
         # Output 
-        result = agent.invoke({"messages": [HumanMessage(content=user_input)]})
+        result = agent.invoke({"messages": [HumanMessage(content=user_input)]}, config)
         assistant_text = result["messages"][-1].content
+        if router:
+            router.record_agent(time.perf_counter() - started)
 
         print("\nAssistant:", assistant_text)
 
 
 if __name__ == "__main__":
-    run_chat()
+    parser = argparse.ArgumentParser(description="CLI AI agent with tools and conversation memory.")
+    parser.add_argument("--thread", default=None, help="conversation to continue (default: AGENT_THREAD or 'default')")
+    parser.add_argument("--memory", choices=MEMORY_MODES, default=None, help="where conversation state lives (default: AGENT_MEMORY or 'memory')")
+    parser.add_argument("--no-router", action="store_true", help="send every message to the agent, even '5 + 5'")
+    args = parser.parse_args()
+    run_chat(thread_id=args.thread, memory=args.memory, use_router=False if args.no_router else None)
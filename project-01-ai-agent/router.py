@@ -0,0 +1,94 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+_NUMBER = r"[-+]?\d+(?:\.\d+)?"
+
+# (tool name, pattern, args from the match). A pattern has to match the whole
+# message; anything more (other operators, extra words, two requests in one)
+# is left to the agent.
+_ROUTES: List[Tuple[str, Pattern[str], Callable[[Any], Dict[str, Any]]]] = [
+    (
+        "calculator",
+        re.compile(rf"(?:(?:what(?:'s| is)|calculate|compute)\s+)?({_NUMBER})\s*\+\s*({_NUMBER})\s*[?!.=]*", re.I),
+        lambda m: {"a": float(m[1]), "b": float(m[2])},
+    ),
+    (
+        "say_hello",
+        re.compile(r"(?:please\s+)?(?:say\s+(?:hello|hi)\s+to|greet)\s+([A-Za-z][A-Za-z'-]*)\s*[.!]*", re.I),
+        lambda m: {"name": m[1]},
+    ),
+]
+
+
+class ToolRouter:
+    """Answers messages a registered tool can handle on its own, without the LLM.
+
+    "5 + 5" through the agent is two model round trips (pick the tool, then
+    phrase the result); here it is one local function call. Everything the
+    patterns don't match exactly goes to the agent as before.
+    """
+
+    def __init__(self, tools: Sequence[Any]) -> None:
+        self.tools = {t.name: t for t in tools}
+        self.routes = [r for r in _ROUTES if r[0] in self.tools]
+        self.hits = 0
+        self.misses = 0
+        self.local_s = 0.0
+        self.agent_s = 0.0
+        self.agent_turns = 0
+        self._lock = threading.Lock()
+
+    def match(self, text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        text = text.strip()
+        for name, pattern, args in self.routes:
+            m = pattern.fullmatch(text)
+            if m:
+                return name, args(m)
+        return None
+
+    def route(self, text: str) -> Optional[str]:
+        """The tool's answer, or None when the agent should handle the message."""
+        started = time.perf_counter()
+        found = self.match(text)
+        answer: Optional[str] = None
+        if found:
+            name, args = found
+            try:
+                answer = str(self.tools[name].invoke(args))
+            except Exception:
+                log.exception("router: %s failed, falling back to the agent", name)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.local_s += elapsed
+        if answer is not None:
+            log.info("router hit: %s(%s) in %.2f ms", found[0], args, elapsed * 1e3)
+        return answer
+
+    def record_agent(self, seconds: float) -> None:
+        with self._lock:
+            self.agent_turns += 1
+            self.agent_s += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            avg_agent = self.agent_s / self.agent_turns if self.agent_turns else 0.0
+            avg_local = self.local_s / self.hits if self.hits else 0.0
+            return {
+                "messages": total,
+                "hits": self.hits,
+                "hit_rate": self.hits / total if total else 0.0,
+                "avg_local_s": avg_local,
+                "avg_agent_s": avg_agent,
+                # Estimate: each hit would have cost an average agent turn.
+                "saved_s": self.hits * max(0.0, avg_agent - avg_local),
+            }
@@ -0,0 +1,413 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.runnables import Runnable, RunnableBinding
+
+from main import (
+    DB_PATH,
+    MEMORY_MODE,
+    MEMORY_MODES,
+    ROUTER_ENABLED,
+    TOOL_CONCURRENCY,
+    TOOLS,
+    EXECUTOR,
+    build_agent,
+    get_model,
+)
+from router import ToolRouter
+from tool_exec import LatencyHistogram
+
+# Model requests allowed in flight at once, across every session.
+MAX_MODEL_CALLS = int(os.getenv("AGENT_MAX_MODEL_CALLS") or 8)
+# Turns being worked on at once; beyond that up to MAX_QUEUED wait, the rest get 503.
+MAX_ACTIVE = 64
+MAX_QUEUED = 256
+# One turn running plus one waiting per session; a third concurrent message gets 429.
+MAX_PENDING_PER_SESSION = 2
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_S = 30.0
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            429: "Too Many Requests", 431: "Request Header Fields Too Large", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class Busy(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ModelGate(Runnable):
+    """Chat model wrapper: at most `limit` async model calls reach the provider at once."""
+
+    def __init__(self, model: Any, limit: int) -> None:
+        self.model = model
+        self.limit = max(1, int(limit))
+        self._slots = asyncio.Semaphore(self.limit)
+        self.in_flight = 0
+        self.calls = 0
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> RunnableBinding:
+        # Same kwargs as the model's own bind_tools, so the agent sees the tools as bound already.
+        bound = self.model.bind_tools(tools, **kwargs)
+        return RunnableBinding(bound=self, kwargs=bound.kwargs, config=bound.config)
+
+    def invoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        async with self._slots:
+            self.in_flight += 1
+            self.calls += 1
+            try:
+                return await self.model.ainvoke(input, config, **kwargs)
+            finally:
+                self.in_flight -= 1
+
+
+class _Session:
+    __slots__ = ("lock", "pending", "last_seen", "turns")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.last_seen = time.monotonic()
+        self.turns = 0
+
+
+class ChatServer:
+    """Many chat sessions over one compiled agent; each session is a checkpointer thread.
+
+    Turns of one session run in order; turns of different sessions run side by
+    side up to max_active, with a bounded wait queue behind that. Overload is
+    answered right away (429 for a busy session, 503 for a busy server) instead
+    of piling up, and streamed replies wait for the client to drain.
+    """
+
+    def __init__(self, agent: Any, gate: Optional[ModelGate] = None, checkpointer: Any = None,
+                 router: Optional[ToolRouter] = None, max_active: int = MAX_ACTIVE, max_queued: int = MAX_QUEUED,
+                 max_sessions: int = 10_000) -> None:
+        self.agent = agent
+        self.gate = gate
+        self.checkpointer = checkpointer
+        self.router = router
+        self.max_queued = max_queued
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, _Session] = {}
+        self._active = asyncio.Semaphore(max_active)
+        self.running = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.latency = LatencyHistogram()
+
+    def _session(self, session_id: str) -> _Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                self._prune()
+            session = self.sessions[session_id] = _Session()
+        session.last_seen = time.monotonic()
+        return session
+
+    def _prune(self) -> None:
+        # Only bookkeeping is dropped; the conversation itself stays in the checkpointer.
+        idle = sorted((s.last_seen, sid) for sid, s in self.sessions.items() if not s.pending)
+        for _, sid in idle[: max(1, len(idle) // 4)]:
+            del self.sessions[sid]
+
+    async def chat(self, session_id: str, message: str, on_token: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
+        session = self._session(session_id)
+        if session.pending >= MAX_PENDING_PER_SESSION:
+            self.rejected += 1
+            raise Busy(429, "this session already has a message in progress")
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Busy(503, "server busy, try again shortly")
+
+        started = time.perf_counter()
+        session.pending += 1
+        self.waiting += 1
+        queued = True
+        try:
+            async with session.lock:
+                async with self._active:
+                    self.waiting -= 1
+                    queued = False
+                    self.running += 1
+                    try:
+                        reply, routed = await self._turn(session_id, message, on_token)
+                    finally:
+                        self.running -= 1
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            session.pending -= 1
+            if queued:
+                self.waiting -= 1
+
+        elapsed = time.perf_counter() - started
+        session.turns += 1
+        self.served += 1
+        self.latency.record(elapsed)
+        return {"session": session_id, "reply": reply, "routed": routed, "latency_ms": round(elapsed * 1e3, 2)}
+
+    async def _turn(self, session_id: str, message: str, on_token: Optional[Callable[[str], Awaitable[None]]]) -> Tuple[str, bool]:
+        config = {"configurable": {"thread_id": session_id}, "max_concurrency": TOOL_CONCURRENCY}
+        reply = self.router.route(message) if self.router else None
+        if reply is not None:
+            if self.checkpointer is not None:
+                await self.agent.aupdate_state(
+                    config, {"messages": [HumanMessage(content=message), AIMessage(content=reply)]}, as_node="agent"
+                )
+            if on_token:
+                await on_token(reply)
+            return reply, True
+
+        inputs = {"messages": [HumanMessage(content=message)]}
+        if on_token is None:
+            result = await self.agent.ainvoke(inputs, config)
+            return str(result["messages"][-1].content), False
+
+        parts: List[str] = []
+        async for chunk, meta in self.agent.astream(inputs, config, stream_mode="messages"):
+            if isinstance(chunk, ToolMessage):
+                parts = []  # the reply is what the model says after the last tool result
+            elif isinstance(chunk, AIMessageChunk) and meta.get("langgraph_node") == "agent":
+                text = chunk.content if isinstance(chunk.content, str) else ""
+                if text:
+                    parts.append(text)
+                    await on_token(text)
+        return "".join(parts), False
+
+    async def forget(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+        if self.checkpointer is not None:
+            await self.checkpointer.adelete_thread(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "running": self.running,
+            "waiting": self.waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "turn_p50_ms": self.latency.percentile_ms(0.50),
+            "turn_p95_ms": self.latency.percentile_ms(0.95),
+            "model_calls": self.gate.calls if self.gate else None,
+            "model_calls_in_flight": self.gate.in_flight if self.gate else None,
+            "router": self.router.stats() if self.router else None,
+            "tools": EXECUTOR.stats(),
+        }
+
+    # -- HTTP/1.1 (just enough for JSON requests, keep-alive and chunked streaming) --
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_S)
+                except asyncio.LimitOverrunError:
+                    await _respond(writer, 431, {"error": "headers too large"}, keep_alive=False)
+                    return
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                try:
+                    method, path, headers = _parse_head(head)
+                    length = _content_length(headers)
+                except ValueError:
+                    await _respond(writer, 400, {"error": "malformed request"}, keep_alive=False)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, 413, {"error": f"body over {MAX_BODY_BYTES} bytes"}, keep_alive=False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._dispatch(method, path, body, writer, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter, keep_alive: bool) -> None:
+        if path == "/health":
+            await _respond(writer, 200, {"ok": True}, keep_alive)
+        elif path == "/stats":
+            await _respond(writer, 200, self.stats(), keep_alive)
+        elif path.startswith("/sessions/") and method == "DELETE":
+            await self.forget(path[len("/sessions/"):])
+            await _respond(writer, 200, {"forgotten": True}, keep_alive)
+        elif path == "/chat":
+            if method != "POST":
+                await _respond(writer, 405, {"error": "use POST"}, keep_alive)
+                return
+            try:
+                data = json.loads(body or b"{}")
+                message = str(data.get("message") or "").strip()
+                session_id = str(data.get("session") or "") or uuid.uuid4().hex
+            except (ValueError, AttributeError):
+                await _respond(writer, 400, {"error": "body must be a JSON object"}, keep_alive)
+                return
+            if not message:
+                await _respond(writer, 400, {"error": "message is required"}, keep_alive)
+                return
+            if data.get("stream"):
+                await self._chat_streamed(session_id, message, writer, keep_alive)
+                return
+            try:
+                result = await self.chat(session_id, message)
+            except Busy as e:
+                await _respond(writer, e.status, {"error": str(e)}, keep_alive, retry_after=1)
+                return
+            except Exception as e:
+                await _respond(writer, 502, {"error": f"agent failed: {type(e).__name__}"}, keep_alive)
+                return
+            await _respond(writer, 200, result, keep_alive)
+        else:
+            await _respond(writer, 404, {"error": "not found"}, keep_alive)
+
+    async def _chat_streamed(self, session_id: str, message: str, writer: asyncio.StreamWriter, keep_alive: bool) -> None:
+        # NDJSON over chunked encoding: {"token": ...} lines, then one final result line.
+        started = False
+
+        async def send_line(payload: Dict[str, Any]) -> None:
+            nonlocal started
+            if not started:
+                started = True
+                writer.write(_head(200, "application/x-ndjson", keep_alive, chunked=True))
+            line = (json.dumps(payload) + "\n").encode("utf-8")
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            await writer.drain()  # a slow reader slows this turn down instead of growing a buffer
+
+        async def on_token(text: str) -> None:
+            await send_line({"token": text})
+
+        try:
+            result = await self.chat(session_id, message, on_token)
+            await send_line({"done": True, **result})
+        except Busy as e:
+            if not started:
+                await _respond(writer, e.status, {"error": str(e)}, keep_alive, retry_after=1)
+                return
+            await send_line({"error": str(e)})
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            if not started:
+                await _respond(writer, 502, {"error": f"agent failed: {type(e).__name__}"}, keep_alive)
+                return
+            await send_line({"error": f"agent failed: {type(e).__name__}"})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def _parse_head(head: bytes) -> Tuple[str, str, Dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _version = lines[0].split(" ", 2)
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target.split("?", 1)[0], headers
+
+
+def _content_length(headers: Dict[str, str]) -> int:
+    value = headers.get("content-length", "")
+    if not value:
+        return 0
+    # Digits only: int() would also take "-5", "+5", " 5" or "1_000".
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f"bad Content-Length: {value!r}")
+    return int(value)
+
+
+def _head(status: int, content_type: str, keep_alive: bool, length: Optional[int] = None, chunked: bool = False,
+          retry_after: Optional[int] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {length or 0}")
+    if retry_after is not None:
+        lines.append(f"Retry-After: {retry_after}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                   retry_after: Optional[int] = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, "application/json", keep_alive, len(body), retry_after=retry_after) + body)
+    await writer.drain()
+
+
+async def make_async_checkpointer(memory: str) -> Any:
+    if memory == "off":
+        return None
+    if memory == "sqlite":
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            raise RuntimeError("AGENT_MEMORY=sqlite needs the SQLite checkpointer:\nuv add langgraph-checkpoint-sqlite")
+        return AsyncSqliteSaver(await aiosqlite.connect(DB_PATH))
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    return InMemorySaver()
+
+
+async def create_chat_server(memory: str = MEMORY_MODE, max_model_calls: int = MAX_MODEL_CALLS,
+                             use_router: bool = ROUTER_ENABLED, **kwargs: Any) -> ChatServer:
+    """A ChatServer over the shared model client, compiled once for every session."""
+    if memory not in MEMORY_MODES:
+        raise ValueError(f"Unknown memory mode: {memory!r} (choose from {', '.join(MEMORY_MODES)})")
+    gate = ModelGate(get_model(), max_model_calls)
+    checkpointer = await make_async_checkpointer(memory)
+    agent = build_agent(gate.bind_tools(TOOLS), checkpointer)
+    return ChatServer(agent, gate, checkpointer, ToolRouter(TOOLS) if use_router else None, **kwargs)
+
+
+async def start(chat: ChatServer, host: str = "127.0.0.1", port: int = 8765, unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+    if unix_path:
+        return await asyncio.start_unix_server(chat.handle, path=unix_path, limit=MAX_HEADER_BYTES)
+    return await asyncio.start_server(chat.handle, host, port, limit=MAX_HEADER_BYTES, backlog=512)
+
+
+async def serve(host: str, port: int, unix_path: Optional[str], memory: str, max_model_calls: int, use_router: bool) -> None:
+    chat = await create_chat_server(memory, max_model_calls, use_router)
+    server = await start(chat, host, port, unix_path)
+    where = unix_path or f"http://{host}:{port}"
+    print(f"Agent server on {where} (memory: {memory}, model calls at once: {max_model_calls}). Ctrl+C to stop.")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("Missing OPENAI_API_KEY. Add it to your .env file as:\nOPENAI_API_KEY=sk-...")
+    parser = argparse.ArgumentParser(description="Serve the agent to many chat sessions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--memory", choices=MEMORY_MODES, default=MEMORY_MODE)
+    parser.add_argument("--max-model-calls", type=int, default=MAX_MODEL_CALLS, help="model requests in flight at once")
+    parser.add_argument("--no-router", action="store_true")
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port, args.unix, args.memory, args.max_model_calls, not args.no_router))
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import ChatServer  # noqa: E402
+
+
+class ContentLengthTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.chat = ChatServer(agent=None)
+        self.server = await asyncio.start_server(self.chat.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def status(self, content_length: str, body: bytes = b"") -> int:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write(
+                b"POST /health HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+                + f"Content-Length: {content_length}\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), 5)
+        finally:
+            writer.close()
+        return int(line.split()[1])
+
+    async def test_bad_values_get_400(self) -> None:
+        for value in ("abc", "-1", "+5", "1_0", "0x10", "1.5", "\u00b2"):
+            with self.subTest(value=value):
+                self.assertEqual(await self.status(value), 400)
+
+    async def test_valid_value_is_read(self) -> None:
+        self.assertEqual(await self.status("2", b"{}"), 200)
+        self.assertEqual(await self.status(""), 200)
+
+    async def test_oversized_body_gets_413(self) -> None:
+        self.assertEqual(await self.status(str(10**9)), 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+_MISS = object()
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches everything slower.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: constant memory however many calls it sees."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    @property
+    def calls(self) -> int:
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, seconds * 1e3)] += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+
+    def percentile_ms(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th call (capped at the slowest call)."""
+        n = self.calls
+        if not n:
+            return 0.0
+        rank = max(1, int(q * n + 0.999999))
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_s * 1e3)
+        return self.max_s * 1e3
+
+
+class ToolExecutor:
+    """Runs the agent's tools: bounded concurrency, LRU memo for pure tools, per-tool latency.
+
+    The graph already sends each tool call of a step to its own worker; this
+    caps how many tools run at once (max_concurrency), skips recomputing pure
+    tools for arguments seen before or already running, and gives every tool
+    an async entry point, so an I/O-bound tool can await instead of holding a
+    thread.
+    """
+
+    def __init__(self, max_concurrency: int = 4, cache_size: int = 256) -> None:
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.cache_size = int(cache_size)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.cache_hits: Dict[str, int] = {}
+
+    def _key(self, name: str, kwargs: Dict[str, Any]) -> str:
+        # The exact arguments: "Ada" vs " Ada" or 1 vs 1.0 may well give different results.
+        return name + ":" + json.dumps(kwargs, sort_keys=True, default=repr)
+
+    def _claim(self, key: str) -> Tuple[Any, Optional[Future], bool]:
+        """(cached result or _MISS, future to wait on or to fill, True if we must compute it)."""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                # The same call is already running (e.g. twice in one step): share its result.
+                return _MISS, future, False
+            future = self._inflight[key] = Future()
+            return _MISS, future, True
+
+    def _settle(self, key: str, future: Future, result: Any = _MISS, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None:
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _record(self, name: str, seconds: float, hit: bool) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, LatencyHistogram()).record(seconds)
+            if hit:
+                self.cache_hits[name] = self.cache_hits.get(name, 0) + 1
+
+    def wrap(self, tool: BaseTool, pure: bool = False) -> BaseTool:
+        """Same name, description and args as tool, executed through this executor."""
+        name = tool.name
+        memo = pure and self.cache_size > 0
+        native_async = isinstance(tool, StructuredTool) and tool.coroutine is not None
+
+        def run(**kwargs: Any) -> Any:
+            with self._slots:
+                return tool.invoke(kwargs)
+
+        def call(**kwargs: Any) -> Any:
+            started = time.perf_counter()
+            if not memo:
+                result = run(**kwargs)
+                self._record(name, time.perf_counter() - started, False)
+                return result
+            key = self._key(name, kwargs)
+            result, future, owner = self._claim(key)
+            if owner:
+                try:
+                    result = run(**kwargs)
+                except BaseException as e:
+                    self._settle(key, future, error=e)
+                    raise
+                self._settle(key, future, result)
+            elif future is not None:
+                result = future.result()
+            self._record(name, time.perf_counter() - started, not owner)
+            return result
+
+        async def acall(**kwargs: Any) -> Any:
+            if not native_async:
+                # Sync tool: run it on a worker thread so the event loop keeps going.
+                return await asyncio.to_thread(call, **kwargs)
+            async def arun() -> Any:
+                # Same slots as sync tools; waiting for one happens off the event loop.
+                acquire = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+                try:
+                    await asyncio.shield(acquire)
+                except asyncio.CancelledError:
+                    # The thread still gets the slot once one frees up: hand it straight back.
+                    acquire.add_done_callback(lambda _: self._slots.release())
+                    raise
+                try:
+                    return await tool.ainvoke(kwargs)
+                finally:
+                    self._slots.release()
+
+            started = time.perf_counter()
+            if not memo:
+                result = await arun()
+                self._record(name, time.perf_counter() - started, False)
+                return result
+            key = self._key(name, kwargs)
+            result, future, owner = self._claim(key)
+            if owner:
+                try:
+                    result = await arun()
+                except BaseException as e:
+                    self._settle(key, future, error=e)
+                    raise
+                self._settle(key, future, result)
+            elif future is not None:
+                result = await asyncio.wrap_future(future)
+            self._record(name, time.perf_counter() - started, not owner)
+            return result
+
+        return StructuredTool.from_function(
+            func=call,
+            coroutine=acall,
+            name=name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+        )
+
+    def wrap_all(self, tools: Iterable[BaseTool], pure: Sequence[str] = ()) -> List[BaseTool]:
+        return [self.wrap(t, pure=t.name in pure) for t in tools]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": h.calls,
+                    "cache_hits": self.cache_hits.get(name, 0),
+                    "p50_ms": h.percentile_ms(0.50),
+                    "p95_ms": h.percentile_ms(0.95),
+                    "max_ms": h.max_s * 1e3,
+                    "histogram": {("inf" if b == float("inf") else b): c for b, c in zip(BUCKETS_MS, h.counts) if c},
+                }
+                for name, h in self.histograms.items()
+            }
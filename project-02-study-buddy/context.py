@@ -0,0 +1,127 @@
+import re
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken  # type: ignore
+except Exception:
+    tiktoken = None  # type: ignore
+
+# Tokens of chat history (rolling summary + recent turns) sent with each message.
+DEFAULT_HISTORY_BUDGET = 1500
+SUMMARY_MAX_TOKENS = 250
+# Per-message framing the chat API adds on top of the content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Profile fields prompts.profile_prompt reads; the cached render is reused until one changes.
+PROMPT_FIELDS = ("name", "learning_goal", "experience_level", "style", "last_topic", "stuck_points")
+
+_ENCODING: Any = None
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text: exact with tiktoken installed, else ~4 characters per token."""
+    global _ENCODING
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _ENCODING is None:
+            try:
+                _ENCODING = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _ENCODING = False
+        if _ENCODING:
+            return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def gist(text: str, max_words: int) -> str:
+    # First sentence (or line), clipped: a cheap extractive stand-in for a model summary.
+    first = text.strip().splitlines()[0] if text.strip() else ""
+    first = _SENTENCE_END.split(first, 1)[0].lstrip("#*-> ").strip()
+    words = first.split()
+    return " ".join(words[:max_words]) + ("…" if len(words) > max_words else "")
+
+
+class ContextWindow:
+    """Chat history that fits a token budget instead of a fixed number of messages.
+
+    The newest turns are kept while they fit in budget_tokens; older ones are
+    folded into a short rolling summary (one extractive line per turn, oldest
+    lines dropped past summary_max_tokens). The rendered system prompt is
+    cached and only rebuilt when a profile field it uses changes.
+    """
+
+    def __init__(
+        self,
+        render_system_prompt: Callable[[Dict[str, Any]], str],
+        budget_tokens: int = DEFAULT_HISTORY_BUDGET,
+        summary_max_tokens: int = SUMMARY_MAX_TOKENS,
+    ) -> None:
+        self.render_system_prompt = render_system_prompt
+        self.budget_tokens = budget_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self._turns: Deque[Tuple[str, str, int]] = deque()  # (user, assistant, tokens)
+        self._turn_tokens = 0
+        self._summary: Deque[Tuple[str, int]] = deque()  # (line, tokens)
+        self._summary_tokens = 0
+        self._prompt_key: Optional[Tuple[Any, ...]] = None
+        self._prompt = ""
+        self.prompt_renders = 0
+
+    # -- system prompt -----------------------------------------------------
+
+    def system_prompt(self, profile: Dict[str, Any]) -> str:
+        key = tuple(
+            tuple(v) if isinstance(v, list) else v for v in (profile.get(k) for k in PROMPT_FIELDS)
+        )
+        if key != self._prompt_key:
+            self._prompt = self.render_system_prompt(profile)
+            self._prompt_key = key
+            self.prompt_renders += 1
+        return self._prompt
+
+    # -- history -----------------------------------------------------------
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        tokens = count_tokens(user) + count_tokens(assistant) + 2 * MESSAGE_OVERHEAD_TOKENS
+        self._turns.append((user, assistant, tokens))
+        self._turn_tokens += tokens
+        self._evict()
+
+    def _evict(self) -> None:
+        summary_budget = min(self.summary_max_tokens, self.budget_tokens // 4)
+        # Always keep the latest turn, even if it alone is over budget.
+        while len(self._turns) > 1 and self._turn_tokens + min(self._summary_tokens, summary_budget) > self.budget_tokens:
+            user, assistant, tokens = self._turns.popleft()
+            self._turn_tokens -= tokens
+            self._fold(user, assistant, summary_budget)
+
+    def _fold(self, user: str, assistant: str, summary_budget: int) -> None:
+        line = f"- Asked: {gist(user, 20)} | Covered: {gist(assistant, 25)}"
+        tokens = count_tokens(line) + 1
+        self._summary.append((line, tokens))
+        self._summary_tokens += tokens
+        while len(self._summary) > 1 and self._summary_tokens > summary_budget:
+            _, dropped = self._summary.popleft()
+            self._summary_tokens -= dropped
+
+    def summary(self) -> str:
+        if not self._summary:
+            return ""
+        return "Earlier in this session (summary):\n" + "\n".join(line for line, _ in self._summary)
+
+    def turns(self) -> List[Tuple[str, str]]:
+        return [(user, assistant) for user, assistant, _ in self._turns]
+
+    def history_tokens(self) -> int:
+        summary = self.summary()
+        return self._turn_tokens + (count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0)
+
+    def reset(self) -> None:
+        self._turns.clear()
+        self._turn_tokens = 0
+        self._summary.clear()
+        self._summary_tokens = 0
+        self._prompt_key = None
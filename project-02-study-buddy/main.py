@@ -1,9 +1,12 @@
+import argparse
 import os
-import json
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
@@ -11,28 +14,68 @@ from rich.panel import Panel
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from context import DEFAULT_HISTORY_BUDGET, ContextWindow, gist
+from prompts import STATIC_SYSTEM_PROMPT, PromptCacheStats, profile_prompt
+from profiles import DEFAULT_USER, UserRegistry
+from recap import offline_recap
+from stream_filter import SuggestionLineFilter
+
 # Load .env from THIS folder (project-02-study-buddy)
 load_dotenv(dotenv_path=Path(__file__).parent / ".env")
 
 console = Console()
 
-PROFILE_PATH = Path(__file__).parent / "memory" / "user_profile.json"
+# STUDY_BUDDY_MEMORY_DIR points the whole memory folder elsewhere (benchmarks, demos).
+MEMORY_DIR = Path(os.getenv("STUDY_BUDDY_MEMORY_DIR") or Path(__file__).parent / "memory")
+USERS = UserRegistry(MEMORY_DIR)
+SESSION_ID = datetime.now().strftime("%Y%m%d%H%M%S")
+
+# Past turns/recaps/stuck points pulled into the prompt when they match the question.
+RECALL_K = 3
+RECALL_MIN_SCORE = 0.25
+PROMPT_STATS = PromptCacheStats(MEMORY_DIR / "prompt_metrics.jsonl")
+
+# background (default): instant offline recap, model recap finished in the background
+# sync: wait for the model recap | offline: never call the model for a recap
+RECAP_MODE = (os.getenv("STUDY_BUDDY_RECAP") or "background").strip().lower()
+# How long quitting waits for a background recap before leaving it to the next start.
+RECAP_WAIT_S = 15.0
+
+MODEL_NAME = "gpt-4o-mini"
+
+# Tokens of chat history sent with each message (STUDY_BUDDY_HISTORY_TOKENS overrides).
+HISTORY_TOKENS = int(os.getenv("STUDY_BUDDY_HISTORY_TOKENS") or DEFAULT_HISTORY_BUDGET)
+
+# One pooled client per (model, temperature) for the whole process, so chat turns
+# and the exit recap reuse keep-alive connections instead of reconnecting.
+_MODELS: Dict[Tuple[str, float], ChatOpenAI] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(model: str = MODEL_NAME, temperature: float = 0) -> ChatOpenAI:
+    key = (model, float(temperature))
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            limits = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0)
+            _MODELS[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                stream_usage=True,
+                http_client=httpx.Client(limits=limits),
+                http_async_client=httpx.AsyncClient(limits=limits),
+            )
+        return _MODELS[key]
 
 
 
 # Profile (Memory) Helpers
-def load_profile() -> Dict[str, Any]:
-    if PROFILE_PATH.exists():
-        try:
-            return json.loads(PROFILE_PATH.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
+def load_profile(user_id: str) -> Dict[str, Any]:
+    return USERS.open(user_id).store.load()
 
 
-def save_profile(profile: Dict[str, Any]) -> None:
-    PROFILE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    PROFILE_PATH.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+def save_profile(user_id: str, profile: Dict[str, Any]) -> None:
+    USERS.open(user_id).store.save(profile)
+    USERS.register(user_id, profile.get("name") or "")
 
 
 def profile_is_complete(profile: Dict[str, Any]) -> bool:
@@ -40,7 +83,7 @@ def profile_is_complete(profile: Dict[str, Any]) -> bool:
     return all(profile.get(k) for k in required)
 
 
-def run_onboarding(existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def run_onboarding(user_id: str, existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     profile = dict(existing or {})
     console.print(Panel.fit("👋 First-time setup: Let’s personalize your Study Buddy", title="Onboarding"))
 
@@ -72,11 +115,10 @@ def run_onboarding(existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
             "created_at": profile.get("created_at") or datetime.now().isoformat(timespec="seconds"),
             "last_topic": profile.get("last_topic") or "",
             "stuck_points": profile.get("stuck_points") or [],
-            "sessions": profile.get("sessions") or [],
         }
     )
 
-    save_profile(profile)
+    save_profile(user_id, profile)
     console.print(Panel.fit("✅ Profile saved! Type /help anytime.", title="Ready"))
     return profile
 
@@ -97,58 +139,99 @@ def pretty_profile(profile: Dict[str, Any]) -> str:
 
 # LLM Prompting
 def build_system_prompt(profile: Dict[str, Any]) -> str:
-    style = profile.get("style", "examples_heavy")
-    style_instructions = {
-        "simple_short": "Keep responses short and simple. No jargon unless asked.",
-        "examples_heavy": "Use concrete examples and mini demos. Explain like I'm learning.",
-        "step_by_step": "Explain step-by-step with clear bullets and tiny checkpoints.",
-        "quiz_me": "Teach briefly, then ask me 1-2 questions to check understanding.",
-    }.get(style, "Use clear explanations with examples.")
-
-    return f"""
-You are a context-aware AI Study Buddy.
-Your job is to help the user learn efficiently and kindly.
-
-User profile:
-- Name: {profile.get('name')}
-- Learning goal: {profile.get('learning_goal')}
-- Experience level: {profile.get('experience_level')}
-- Last topic: {profile.get('last_topic') or 'None'}
-- Stuck points: {', '.join(profile.get('stuck_points', [])) or 'None'}
-
-Teaching style rules:
-- {style_instructions}
-
-Behavior:
-- If the user asks for code, keep it minimal and explain what each part does.
-- If the user seems stuck, suggest a smaller step and a quick practice prompt.
-- If the user changes topic, update "last_topic" suggestion at the end in a single line like:
-  LAST_TOPIC_SUGGESTION: <topic>
-- If the user mentions a struggle (ex: "I don't get X"), suggest adding it to stuck points like:
-  STUCK_POINT_SUGGESTION: <thing>
-""".strip()
+    # Static instructions first, user-specific block last (see prompts.py).
+    return STATIC_SYSTEM_PROMPT + "\n\n" + profile_prompt(profile)
+
+
+def _filter_full_text(text: str) -> SuggestionLineFilter:
+    flt = SuggestionLineFilter()
+    flt.feed(text)
+    flt.close()
+    return flt
 
 
 def extract_suggestions(text: str) -> Dict[str, str]:
     """Parse LAST_TOPIC_SUGGESTION and STUCK_POINT_SUGGESTION from the model output."""
-    suggestions = {}
-    for line in text.splitlines():
-        line = line.strip()
-        if line.startswith("LAST_TOPIC_SUGGESTION:"):
-            suggestions["last_topic"] = line.replace("LAST_TOPIC_SUGGESTION:", "").strip()
-        if line.startswith("STUCK_POINT_SUGGESTION:"):
-            suggestions["stuck_point"] = line.replace("STUCK_POINT_SUGGESTION:", "").strip()
-    return suggestions
+    return _filter_full_text(text).suggestions
 
 
 def clean_assistant_text(text: str) -> str:
     # Remove suggestion lines from display
-    cleaned = []
-    for line in text.splitlines():
-        if line.strip().startswith(("LAST_TOPIC_SUGGESTION:", "STUCK_POINT_SUGGESTION:")):
-            continue
-        cleaned.append(line)
-    return "\n".join(cleaned).strip()
+    return _filter_full_text(text).text()
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return str(content or "")
+
+
+def stream_reply(model: Any, messages: List[Any]) -> Tuple[str, Dict[str, str]]:
+    """Print the reply token by token; returns (shown text, suggestions).
+
+    Suggestion marker lines are filtered out as they stream, so they never
+    reach the console but their values are still captured.
+    """
+    flt = SuggestionLineFilter()
+    console.print("\nAssistant:")
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    usage_chunk: Any = None
+    for chunk in model.stream(messages):
+        if getattr(chunk, "usage_metadata", None):
+            usage_chunk = chunk  # with stream_usage=True the last chunk carries token usage
+        text = _chunk_text(chunk)
+        if text and first_token is None:
+            first_token = time.perf_counter() - started
+        shown = flt.feed(text)
+        if shown:
+            console.print(shown, end="", markup=False, highlight=False, soft_wrap=True)
+    console.print(flt.close(), markup=False, highlight=False, soft_wrap=True)
+    PROMPT_STATS.record(usage_chunk, time.perf_counter() - started, first_token)
+    return flt.text(), flt.suggestions
+
+
+def remember(user_id: str, text: str, kind: str) -> None:
+    USERS.open(user_id).recall.add([text], [{"kind": kind, "session": SESSION_ID, "date": datetime.now().strftime("%Y-%m-%d")}])
+
+
+def backfill_recall(user_id: str, profile: Dict[str, Any]) -> None:
+    # First run with an empty index: seed it with what the store already knows.
+    mem = USERS.open(user_id)
+    if len(mem.recall):
+        return
+    texts = [f"Session recap ({s.get('date')}): {s.get('summary')}" for s in mem.store.sessions()]
+    texts += [f"Stuck point: {sp}" for sp in profile.get("stuck_points", [])]
+    mem.recall.add(texts, [{"kind": "backfill", "session": ""} for _ in texts])
+
+
+def recall_notes(user_id: str, user_input: str) -> List[str]:
+    # Entries from this session are already in the window or its summary.
+    hits = USERS.open(user_id).recall.search(user_input, k=RECALL_K, min_score=RECALL_MIN_SCORE, exclude=lambda e: e.get("session") == SESSION_ID)
+    return [entry["text"] for _, entry in hits]
+
+
+def build_messages(
+    window: ContextWindow, profile: Dict[str, Any], user_input: str, recalled: Optional[List[str]] = None
+) -> List[Any]:
+    # Same-every-turn parts first (static instructions, then the append-only history),
+    # so the provider can reuse the cached prefix; profile + summary go right before the question.
+    messages: List[Any] = [SystemMessage(content=STATIC_SYSTEM_PROMPT)]
+    for user_text, assistant_text in window.turns():
+        messages.append(HumanMessage(content=user_text))
+        messages.append(AIMessage(content=assistant_text))
+    volatile = window.system_prompt(profile)
+    summary = window.summary()
+    if summary:
+        volatile += "\n\n" + summary
+    if recalled:
+        volatile += "\n\nRelevant notes from past sessions:\n" + "\n".join(f"- {note}" for note in recalled)
+    messages.append(SystemMessage(content=volatile))
+    messages.append(HumanMessage(content=user_input))
+    return messages
 
 
 # Commands
@@ -166,6 +249,7 @@ def print_help() -> None:
                     "  /add stuck <text>     Add a stuck point",
                     "  /forget              Clear memory (profile)",
                     "  /progress            Show recent session notes",
+                    "  /cache               Show prompt-cache hits this session",
                     "  quit                 Exit (prints a study recap)",
                 ]
             ),
@@ -190,7 +274,7 @@ def normalize_style(value: str) -> Optional[str]:
     return mapping.get(v)
 
 
-def cmd_set(profile: Dict[str, Any], args: str) -> Dict[str, Any]:
+def cmd_set(user_id: str, profile: Dict[str, Any], args: str) -> Dict[str, Any]:
     parts = args.split(" ", 2)
     if len(parts) < 2:
         console.print("[red]Usage:[/red] /set goal <text> OR /set level <text> OR /set style <simple|examples|steps|quiz>")
@@ -216,11 +300,11 @@ def cmd_set(profile: Dict[str, Any], args: str) -> Dict[str, Any]:
         console.print("[red]Unknown setting.[/red] Use goal, level, or style.")
         return profile
 
-    save_profile(profile)
+    save_profile(user_id, profile)
     return profile
 
 
-def cmd_add_stuck(profile: Dict[str, Any], text: str) -> Dict[str, Any]:
+def cmd_add_stuck(user_id: str, profile: Dict[str, Any], text: str) -> Dict[str, Any]:
     t = text.strip()
     if not t:
         console.print("[red]Usage:[/red] /add stuck <text>")
@@ -229,34 +313,68 @@ def cmd_add_stuck(profile: Dict[str, Any], text: str) -> Dict[str, Any]:
     if t not in stuck:
         stuck.append(t)
         profile["stuck_points"] = stuck
-        save_profile(profile)
+        save_profile(user_id, profile)
+        remember(user_id, f"Stuck point: {t}", "stuck")
         console.print(f"✅ Added stuck point: {t}")
     else:
         console.print("ℹ️ That stuck point is already saved.")
     return profile
 
 
-def cmd_forget() -> Dict[str, Any]:
-    if PROFILE_PATH.exists():
-        PROFILE_PATH.unlink()
+def cmd_forget(user_id: str) -> Dict[str, Any]:
+    USERS.forget(user_id)
     console.print(Panel.fit("🧼 Memory cleared. Restarting onboarding…", title="Forgotten"))
-    return run_onboarding({})
+    return run_onboarding(user_id, {})
 
 
-def cmd_progress(profile: Dict[str, Any]) -> None:
-    sessions = profile.get("sessions", [])
-    if not sessions:
+def cmd_progress(user_id: str) -> None:
+    # Only the tail of the event log is read, however long the history gets.
+    last = USERS.open(user_id).store.recent_sessions(5)
+    if not last:
         console.print("No progress yet. Study with me and I’ll record recaps 🙂")
         return
-    last = sessions[-5:]
     lines = []
     for s in last:
         lines.append(f"- {s.get('date')}: {s.get('summary')}")
     console.print(Panel("\n".join(lines), title="Recent Progress (last 5)"))
 
 
+def cmd_cache() -> None:
+    st = PROMPT_STATS.summary()
+    console.print(
+        Panel(
+            f"Model calls: {st['calls']}\n"
+            f"Prompt tokens: {st['prompt_tokens']} ({st['cached_tokens']} cached, {st['cached_ratio']:.0%})\n"
+            f"Avg reply time: {st['avg_latency_s']:.2f}s",
+            title="Prompt Cache",
+        )
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Study Buddy: an AI tutor that remembers you.")
+    parser.add_argument("--user", default=os.getenv("STUDY_BUDDY_USER", DEFAULT_USER), help="who is studying (one memory per user)")
+    parser.add_argument("--list-users", nargs="?", const="", metavar="PREFIX", help="list known users (by id or name prefix) and exit")
+    return parser.parse_args()
+
+
+def cmd_list_users(prefix: str) -> None:
+    users = USERS.find(prefix, limit=50)
+    if not users:
+        console.print("No users yet.")
+        return
+    lines = [f"- {uid}" + (f" ({name})" if name else "") for uid, name in users]
+    console.print(Panel("\n".join(lines), title=f"Users ({USERS.count()} total)"))
+
+
 # Main Chat Loop
 def main() -> None:
+    args = parse_args()
+    if args.list_users is not None:
+        cmd_list_users(args.list_users)
+        return
+    user_id = args.user.strip() or DEFAULT_USER
+
     if not os.getenv("OPENAI_API_KEY"):
         raise RuntimeError(
             "Missing OPENAI_API_KEY.\n"
@@ -264,15 +382,22 @@ def main() -> None:
             "OPENAI_API_KEY=YOUR_KEY_HERE"
         )
 
-    profile = load_profile()
+    mem = USERS.open(user_id)
+    profile = load_profile(user_id)
     if not profile_is_complete(profile):
-        profile = run_onboarding(profile)
+        profile = run_onboarding(user_id, profile)
+    elif not USERS.exists(user_id):
+        # Profiles from before the user index (e.g. the migrated single-user memory).
+        USERS.register(user_id, profile.get("name") or "")
 
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    model = get_model()
+    backfill_recall(user_id, profile)
+    # Recaps left unfinished by an earlier run (quit too early, crash, model error).
+    mem.spool.finish_pending_in_background(None if RECAP_MODE == "offline" else model)
 
     console.print(Panel.fit("📚 Study Buddy is ready! Type /help for commands. Type quit to exit.", title="Project 02"))
 
-    session_messages: List[Any] = []
+    window = ContextWindow(profile_prompt, budget_tokens=HISTORY_TOKENS)
 
     while True:
         user_input = input("\nYou: ").strip()
@@ -289,88 +414,61 @@ def main() -> None:
                 console.print(Panel(pretty_profile(profile), title="Your Profile (Memory)"))
                 continue
             if user_input.startswith("/set "):
-                profile = cmd_set(profile, user_input.replace("/set ", "", 1))
+                profile = cmd_set(user_id, profile, user_input.replace("/set ", "", 1))
                 continue
             if user_input.startswith("/add stuck "):
-                profile = cmd_add_stuck(profile, user_input.replace("/add stuck ", "", 1))
+                profile = cmd_add_stuck(user_id, profile, user_input.replace("/add stuck ", "", 1))
                 continue
             if user_input == "/forget":
-                profile = cmd_forget()
-                session_messages = []
+                profile = cmd_forget(user_id)
+                mem = USERS.open(user_id)
+                window.reset()
                 continue
             if user_input == "/progress":
-                cmd_progress(profile)
+                cmd_progress(user_id)
+                continue
+            if user_input == "/cache":
+                cmd_cache()
                 continue
 
             console.print("[red]Unknown command.[/red] Type /help")
             continue
 
         # Normal chat
-        system_prompt = build_system_prompt(profile)
-        messages = [SystemMessage(content=system_prompt)] + session_messages + [HumanMessage(content=user_input)]
-
-        response = model.invoke(messages)
-        raw_text = response.content if isinstance(response.content, str) else str(response.content)
-
-        suggestions = extract_suggestions(raw_text)
-        assistant_text = clean_assistant_text(raw_text)
-
-        console.print(f"\nAssistant:\n{assistant_text}")
-
-        # Update memory suggestions if present
-        if suggestions.get("last_topic"):
-            profile["last_topic"] = suggestions["last_topic"]
-        if suggestions.get("stuck_point"):
-            sp = suggestions["stuck_point"]
-            if sp:
-                stuck = profile.get("stuck_points", [])
-                if sp not in stuck:
-                    stuck.append(sp)
-                    profile["stuck_points"] = stuck
-
-        save_profile(profile)
-
-        # Keep a short session buffer
-        session_messages.append(HumanMessage(content=user_input))
-        session_messages.append(AIMessage(content=assistant_text))
-        session_messages = session_messages[-10:]  # last 5 turns
-
-
-    # Study recap on exit
-    console.print("\n📝 Generating your study recap…")
-
-    recap_prompt = f"""
-Make a short study recap for {profile.get('name')}.
-
-Include:
-1) What we covered today (2-4 bullets)
-2) The next best step (1-2 bullets)
-3) One quick practice question
-
-Keep it aligned to:
-- Goal: {profile.get('learning_goal')}
-- Level: {profile.get('experience_level')}
-- Style: {profile.get('style')}
-""".strip()
-
-    recap_messages = [
-        SystemMessage(content=build_system_prompt(profile)),
-        HumanMessage(content=recap_prompt),
-    ]
-    recap = model.invoke(recap_messages).content
-
-    # Save recap to profile sessions
-    session_entry = {
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "summary": (recap[:180] + "…") if isinstance(recap, str) and len(recap) > 180 else recap,
-    }
-    sessions = profile.get("sessions", [])
-    sessions.append(session_entry)
-    profile["sessions"] = sessions
-    save_profile(profile)
+        messages = build_messages(window, profile, user_input, recall_notes(user_id, user_input))
 
-    console.print(Panel(str(recap), title="✅ Study Recap"))
+        assistant_text, suggestions = stream_reply(model, messages)
+
+        # Update memory suggestions if present (one small log append each, no rewrite)
+        topic = suggestions.get("last_topic")
+        if topic and topic != profile.get("last_topic"):
+            mem.store.record(profile, "last_topic", topic)
+        sp = suggestions.get("stuck_point")
+        if sp and sp not in profile.get("stuck_points", []):
+            mem.store.record(profile, "stuck_point", sp)
+            remember(user_id, f"Stuck point: {sp}", "stuck")
+
+        # Keep as many recent turns as fit the token budget; older ones get summarized
+        window.add_turn(user_input, assistant_text)
+        remember(user_id, f"Q: {user_input}\nA: {gist(assistant_text, 40)}", "turn")
+
+
+    # Study recap on exit: queue a durable job first, so nothing is lost if we quit early
+    if not window.turns():
+        return
+    job = mem.spool.enqueue(profile, build_system_prompt(profile), window.turns(), window.summary())
+
+    if RECAP_MODE == "sync":
+        console.print("\n📝 Generating your study recap…")
+        console.print(Panel(mem.spool.run(job["id"], model) or "", title="✅ Study Recap"))
+        return
+    if RECAP_MODE == "offline":
+        console.print(Panel(mem.spool.run(job["id"]) or "", title="✅ Study Recap"))
+        return
 
+    console.print(Panel(offline_recap(job), title="✅ Session saved — quick recap"))
+    console.print("📝 Writing a fuller recap in the background (see /progress next time)…")
+    mem.spool.run_in_background(job["id"], model).join(RECAP_WAIT_S)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,152 @@
+import hashlib
+import re
+import shutil
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from recall import RecallIndex
+from recap import RecapSpool
+from store import ProfileStore
+
+DEFAULT_USER = "default"
+
+# Per-user files that lived directly in memory/ before profiles were sharded.
+_LEGACY_FILES = ("user_profile.json", "events.jsonl", "recall", "recap_jobs")
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _shard(user_id: str) -> str:
+    return hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:2]
+
+
+def _dir_name(user_id: str) -> str:
+    safe = _UNSAFE.sub("_", user_id)[:64].lstrip(".")
+    if safe != user_id or not safe:
+        # Two ids that sanitize alike still get different directories.
+        safe += "-" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:8]
+    return safe
+
+
+@dataclass
+class UserMemory:
+    user_id: str
+    directory: Path
+    store: ProfileStore
+    recall: RecallIndex
+    spool: RecapSpool
+
+
+class UserRegistry:
+    """Many learners in one memory/ folder, one directory per user.
+
+    A user's files live in memory/users/<2 hex of sha1(id)>/<id>/, so finding
+    them is a path computation, never a directory listing, and no folder holds
+    more than a few hundred users even at tens of thousands. users.db (SQLite)
+    indexes ids and names for listing and lookup; each user's own files are
+    guarded by file locks, so several processes can serve the same user. The
+    lock files live apart, in memory/locks/<2 hex>/, so forgetting a user (which
+    deletes the user's directory) never pulls a lock out from under a waiter.
+    """
+
+    def __init__(self, memory_dir: Path) -> None:
+        self.memory_dir = memory_dir
+        self.users_dir = memory_dir / "users"
+        self.locks_dir = memory_dir / "locks"
+        memory_dir.mkdir(parents=True, exist_ok=True)
+        self._open: Dict[str, UserMemory] = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(memory_dir / "users.db", check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id          TEXT PRIMARY KEY,
+                name        TEXT NOT NULL DEFAULT '',
+                created_at  TEXT NOT NULL,
+                updated_at  TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_users_name ON users(name COLLATE NOCASE);
+            """
+        )
+
+    def user_dir(self, user_id: str) -> Path:
+        return self.users_dir / _shard(user_id) / _dir_name(user_id)
+
+    def _lock_path(self, user_id: str, name: str) -> Path:
+        return self.locks_dir / _shard(user_id) / f"{_dir_name(user_id)}.{name}.lock"
+
+    def open(self, user_id: str) -> UserMemory:
+        with self._lock:
+            mem = self._open.get(user_id)
+            if mem is None:
+                directory = self.user_dir(user_id)
+                if user_id == DEFAULT_USER:
+                    self._migrate_legacy(directory)
+                store = ProfileStore(directory, self._lock_path(user_id, "store"))
+                recall = RecallIndex(directory / "recall", lock_path=self._lock_path(user_id, "recall"))
+                mem = UserMemory(user_id, directory, store, recall, RecapSpool(directory / "recap_jobs", store, recall))
+                self._open[user_id] = mem
+            return mem
+
+    def _migrate_legacy(self, directory: Path) -> None:
+        # The single-user layout becomes the "default" user.
+        if directory.exists() or not (self.memory_dir / "user_profile.json").exists():
+            return
+        directory.mkdir(parents=True)
+        for name in _LEGACY_FILES:
+            src = self.memory_dir / name
+            if src.exists():
+                shutil.move(str(src), str(directory / name))
+
+    # -- index -------------------------------------------------------------
+
+    def register(self, user_id: str, name: str = "") -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO users (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at
+                """,
+                (user_id, name or "", now, now),
+            )
+
+    def find(self, query: str = "", limit: int = 20) -> List[Tuple[str, str]]:
+        """(id, name) of users whose id or name starts with query."""
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT id, name FROM users
+                WHERE id LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\'
+                ORDER BY updated_at DESC LIMIT ?
+                """,
+                (pattern, pattern, int(limit)),
+            ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0])
+
+    def exists(self, user_id: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is not None
+
+    def forget(self, user_id: str) -> None:
+        mem = self.open(user_id)
+        # Hold both locks so no other thread or process is mid-write while the files go.
+        with mem.store._lock, mem.recall._lock:
+            mem.store.clear()
+            with self._lock:
+                self._open.pop(user_id, None)
+                self.conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            shutil.rmtree(mem.directory, ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Prompt layout: providers cache the longest prompt prefix they have seen before
+# (OpenAI from 1024 tokens on), so everything that is the same for every user and
+# every turn goes first, then the chat history, and the per-user profile block last.
+
+STYLE_INSTRUCTIONS = {
+    "simple_short": "Keep responses short and simple. No jargon unless asked.",
+    "examples_heavy": "Use concrete examples and mini demos. Explain like I'm learning.",
+    "step_by_step": "Explain step-by-step with clear bullets and tiny checkpoints.",
+    "quiz_me": "Teach briefly, then ask me 1-2 questions to check understanding.",
+}
+DEFAULT_STYLE_INSTRUCTION = "Use clear explanations with examples."
+
+STATIC_SYSTEM_PROMPT = (
+    """
+You are a context-aware AI Study Buddy.
+Your job is to help the user learn efficiently and kindly.
+The user's profile and teaching style come in a later system message; follow them.
+
+Teaching styles:
+"""
+    + "\n".join(f"- {name}: {text}" for name, text in STYLE_INSTRUCTIONS.items())
+    + """
+
+Behavior:
+- If the user asks for code, keep it minimal and explain what each part does.
+- If the user seems stuck, suggest a smaller step and a quick practice prompt.
+- If the user changes topic, update "last_topic" suggestion at the end in a single line like:
+  LAST_TOPIC_SUGGESTION: <topic>
+- If the user mentions a struggle (ex: "I don't get X"), suggest adding it to stuck points like:
+  STUCK_POINT_SUGGESTION: <thing>
+"""
+).strip()
+
+PREFIX_HASH = hashlib.sha256(STATIC_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+def profile_prompt(profile: Dict[str, Any]) -> str:
+    """The per-user block; sent after the chat history so it never breaks the cached prefix."""
+    style = profile.get("style", "examples_heavy")
+    instruction = STYLE_INSTRUCTIONS.get(style, DEFAULT_STYLE_INSTRUCTION)
+    return f"""
+User profile:
+- Name: {profile.get('name')}
+- Learning goal: {profile.get('learning_goal')}
+- Experience level: {profile.get('experience_level')}
+- Last topic: {profile.get('last_topic') or 'None'}
+- Stuck points: {', '.join(profile.get('stuck_points', [])) or 'None'}
+- Teaching style: {style} ({instruction})
+""".strip()
+
+
+def usage_tokens(message: Any) -> Tuple[int, int]:
+    """(prompt tokens, cached prompt tokens) from a LangChain response or last stream chunk."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return int(usage.get("input_tokens") or 0), int(details.get("cache_read") or 0)
+
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return int(token_usage.get("prompt_tokens") or 0), int(details.get("cached_tokens") or 0)
+
+
+class PromptCacheStats:
+    """Cached vs uncached prompt tokens and latency per model call.
+
+    Each call is also appended to a JSONL file (if given), so the effect of the
+    prefix layout can be compared across runs.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.latency_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, message: Any, latency_s: float, first_token_s: Optional[float] = None, prefix: str = PREFIX_HASH) -> None:
+        prompt, cached = usage_tokens(message)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.cached_tokens += cached
+            self.latency_s += latency_s
+            if self.path is None:
+                return
+            entry = {
+                "ts": round(time.time(), 3),
+                "prefix": prefix,
+                "prompt_tokens": prompt,
+                "cached_tokens": cached,
+                "latency_s": round(latency_s, 3),
+                "first_token_s": None if first_token_s is None else round(first_token_s, 3),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": (self.cached_tokens / self.prompt_tokens) if self.prompt_tokens else 0.0,
+                "avg_latency_s": (self.latency_s / self.calls) if self.calls else 0.0,
+            }
@@ -0,0 +1,212 @@
+import json
+import math
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from locks import FileLock
+
+# An embedder maps texts to an (n, dim) float32 matrix of L2-normalized rows.
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+DEFAULT_DIM = 256
+_WORD = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does don for from get got how i in is it its me my of on or so "
+    "still t that the this to was what when where which why will with you your q".split()
+)
+
+
+def _terms(text: str) -> List[str]:
+    # Lowercased words minus stopwords, with a crude suffix strip so "joins"/"joining" meet "join".
+    out = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        for suffix in ("ing", "es", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        out.append(word)
+    return out
+
+
+class HashingEmbedder:
+    """Offline embedder: hashed bag of terms + half-weight bigrams (no model, no network).
+
+    Deterministic across runs (crc32, not Python's salted hash), so vectors
+    written by one process can be searched by the next.
+    """
+
+    name = "hashing-v2"
+
+    def __init__(self, dim: int = DEFAULT_DIM) -> None:
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _terms(text)
+            counts: Dict[int, float] = {}
+            features = [(w, 1.0) for w in words] + [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+            for feature, weight in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                idx = h % self.dim
+                counts[idx] = counts.get(idx, 0.0) + (weight if h & 0x80000000 else -weight)
+            for idx, value in counts.items():
+                out[row, idx] = math.copysign(math.log1p(abs(value)), value)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class LangChainEmbedder:
+    """Adapter for any LangChain Embeddings object (e.g. OpenAIEmbeddings)."""
+
+    def __init__(self, embeddings: Any, dim: int, name: str = "") -> None:
+        self.embeddings = embeddings
+        self.dim = dim
+        self.name = name or type(embeddings).__name__
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.asarray(self.embeddings.embed_documents(list(texts)), dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class RecallIndex:
+    """Append-only vector index of past turns, recaps and stuck points.
+
+    vectors.f32 holds the embedding matrix as raw float32 rows and is searched
+    through a read-only memmap; entries.jsonl holds one metadata line per row.
+    add() appends to both files (no rebuild), search() scores every row with a
+    single matrix-vector product and keeps the top k with argpartition.
+    """
+
+    def __init__(self, directory: Path, embedder: Optional[Embedder] = None, lock_path: Optional[Path] = None) -> None:
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = int(getattr(self.embedder, "dim", DEFAULT_DIM))
+        self.vectors_path = directory / "vectors.f32"
+        self.entries_path = directory / "entries.jsonl"
+        self.meta_path = directory / "meta.json"
+        self._lock = FileLock(lock_path or directory / ".lock")
+        self._offsets: List[int] = []  # byte offset of each row's line in entries.jsonl
+        self._matrix: Optional[np.ndarray] = None
+        with self._lock:
+            self._open()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {"dim": self.dim, "embedder": getattr(self.embedder, "name", type(self.embedder).__name__)}
+        if self.meta_path.exists():
+            try:
+                stored = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            except Exception:
+                stored = None
+            if stored != meta:
+                # Vectors from another embedder can't be compared with ours: start over.
+                for path in (self.vectors_path, self.entries_path):
+                    if path.exists():
+                        path.unlink()
+        self.meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        self._scan()
+
+    def _scan(self) -> None:
+        offsets: List[int] = []
+        end = 0
+        if self.entries_path.exists():
+            with open(self.entries_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    offsets.append(end)
+                    end += len(line)
+
+        # A crash between the two appends leaves one file ahead of the other: trim both to match.
+        row_bytes = self.dim * 4
+        rows = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+        n = min(rows, len(offsets))
+        entries_end = offsets[n] if n < len(offsets) else end
+        for path, size in ((self.vectors_path, n * row_bytes), (self.entries_path, entries_end)):
+            if path.exists() and path.stat().st_size != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self._offsets = offsets[:n]
+
+    def _sync(self) -> None:
+        # Another process may have appended since we last looked.
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        if size != len(self._offsets) * self.dim * 4:
+            self._scan()
+
+    def _view(self) -> np.ndarray:
+        n = len(self._offsets)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    def add(self, texts: Sequence[str], metas: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        if not texts:
+            return
+        vectors = np.ascontiguousarray(self.embedder(texts), dtype=np.float32)
+        metas = metas or [{} for _ in texts]
+        lines = [(json.dumps({**meta, "text": text}, ensure_ascii=False) + "\n").encode("utf-8") for text, meta in zip(texts, metas)]
+        with self._lock:
+            self._sync()
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.entries_path, "ab") as f:
+                pos = f.tell()
+                for line in lines:
+                    self._offsets.append(pos)
+                    pos += len(line)
+                f.write(b"".join(lines))
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0, exclude: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k entries by cosine similarity to query, best first."""
+        if k <= 0:
+            return []
+        q = self.embedder([query])[0]
+        with self._lock:
+            self._sync()
+            matrix = self._view()
+            if not len(matrix):
+                return []
+            scores = matrix @ q
+
+            results: List[Tuple[float, Dict[str, Any]]] = []
+            remaining = len(scores)
+            # Over-fetch a little so excluded entries rarely need another round.
+            want = k * 4 if exclude else k
+            with open(self.entries_path, "rb") as f:
+                while len(results) < k and remaining:
+                    want = min(want, remaining)
+                    top = np.argpartition(-scores, want - 1)[:want]
+                    top = top[np.argsort(-scores[top])]
+                    for row in top:
+                        score = float(scores[row])
+                        if score < min_score:
+                            return results
+                        f.seek(self._offsets[row])
+                        entry = json.loads(f.readline())
+                        if exclude and exclude(entry):
+                            continue
+                        results.append((score, entry))
+                        if len(results) >= k:
+                            return results
+                    # Everything seen is masked out, so the next round ranks only
+                    # rows below it; excluded rows can't leave the result short.
+                    scores[top] = -np.inf
+                    remaining -= want
+                    want *= 2
+            return results
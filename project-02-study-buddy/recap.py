@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from context import gist
+from recall import RecallIndex
+from store import ProfileStore
+
+# A claimed job untouched for this long is treated as abandoned by a crashed run.
+STALE_CLAIM_S = 10 * 60
+SUMMARY_MAX_CHARS = 180
+RECALL_MAX_CHARS = 500
+
+_SMALL_TALK = {"ok", "okay", "thanks", "thank you", "got it", "next", "cool", "yes", "no", "sure"}
+
+
+def recap_prompt(job: Dict[str, Any]) -> str:
+    profile = job["profile"]
+    lines = [f"User: {u}\nAssistant: {gist(a, 40)}" for u, a in job.get("turns", [])]
+    session = "\n\n".join(lines) or "(no messages)"
+    earlier = job.get("summary") or ""
+    return f"""
+Make a short study recap for {profile.get('name')}.
+
+Include:
+1) What we covered today (2-4 bullets)
+2) The next best step (1-2 bullets)
+3) One quick practice question
+
+Keep it aligned to:
+- Goal: {profile.get('learning_goal')}
+- Level: {profile.get('experience_level')}
+- Style: {profile.get('style')}
+
+{earlier}
+
+Today's session:
+{session}
+""".strip()
+
+
+def offline_recap(job: Dict[str, Any]) -> str:
+    """Extractive recap from the session buffer alone: no model call."""
+    profile = job["profile"]
+    covered: List[str] = []
+    for user, _ in job.get("turns", []):
+        line = gist(user, 14)
+        if line.lower().strip("!.? ") in _SMALL_TALK or line in covered:
+            continue
+        covered.append(line)
+    covered = covered[-4:] or ["A quick check-in (no questions asked yet)"]
+
+    topic = profile.get("last_topic") or profile.get("learning_goal") or "today's topic"
+    stuck = profile.get("stuck_points") or []
+    next_step = f"Review {stuck[-1]} with one small example" if stuck else f"Practice {topic} with one small exercise"
+
+    return "\n".join(
+        ["### Study Recap", "", "1) **What we covered today:**"]
+        + [f"   - {c}" for c in covered]
+        + ["", "2) **Next best step:**", f"   - {next_step}"]
+        + ["", "3) **Quick practice question:**", f"   - Can you explain {topic} in your own words, with an example?"]
+    )
+
+
+def _summary(recap: Any) -> Any:
+    if isinstance(recap, str) and len(recap) > SUMMARY_MAX_CHARS:
+        return recap[:SUMMARY_MAX_CHARS] + "…"
+    return recap
+
+
+class RecapSpool:
+    """Durable queue of recap jobs: one JSON file per finished session in a spool directory.
+
+    A job is written (atomically) before anything else happens on exit, so a
+    recap that doesn't finish in the background, because the process exited or
+    the model call failed, is picked up again by finish_pending() on a later start.
+    """
+
+    def __init__(self, directory: Path, store: ProfileStore, recall: Optional[RecallIndex] = None) -> None:
+        self.directory = directory
+        self.store = store
+        self.recall = recall
+
+    def enqueue(self, profile: Dict[str, Any], system_prompt: str, turns: List[Tuple[str, str]], summary: str) -> Dict[str, Any]:
+        job = {
+            "id": f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}",
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "profile": {k: profile.get(k) for k in ("name", "learning_goal", "experience_level", "style", "last_topic", "stuck_points")},
+            "system_prompt": system_prompt,
+            "turns": [list(t) for t in turns],
+            "summary": summary,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{job['id']}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return job
+
+    def pending(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        now = time.time()
+        paths = sorted(self.directory.glob("*.json"))
+        paths += [p for p in sorted(self.directory.glob("*.work")) if now - p.stat().st_mtime > STALE_CLAIM_S]
+        return paths
+
+    def run(self, job_id: str, model: Any = None) -> Optional[str]:
+        """Write the recap for one job (model if given, else offline) and remove the job."""
+        return self._run_path(self.directory / f"{job_id}.json", model)
+
+    def _run_path(self, path: Path, model: Any) -> Optional[str]:
+        work = path.with_suffix(".work")
+        try:
+            if path.suffix == ".work":
+                os.utime(work)  # re-claim a job abandoned by a crashed run
+            else:
+                os.replace(path, work)  # claim it; another run may have taken it already
+            job = json.loads(work.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+
+        recap: Any = None
+        if model is not None:
+            try:
+                recap = model.invoke([("system", job.get("system_prompt") or ""), ("user", recap_prompt(job))]).content
+            except Exception:
+                recap = None
+        if not recap:
+            recap = offline_recap(job)
+
+        # The job id goes into the log entry, so a crash right after this append
+        # doesn't record the same recap twice on the next start.
+        if not any(s.get("job") == job["id"] for s in self.store.recent_sessions(20)):
+            self.store.add_session(date=job["date"], summary=_summary(recap), job=job["id"])
+            if self.recall is not None:
+                text = f"Session recap ({job['date']}): {recap}"[:RECALL_MAX_CHARS]
+                self.recall.add([text], [{"kind": "recap", "session": job["id"], "date": job["date"]}])
+        work.unlink(missing_ok=True)
+        return recap if isinstance(recap, str) else str(recap)
+
+    def finish_pending(self, model: Any = None) -> int:
+        done = 0
+        for path in self.pending():
+            if self._run_path(path, model) is not None:
+                done += 1
+        return done
+
+    def run_in_background(self, job_id: str, model: Any = None) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(job_id, model), name="study-recap", daemon=True)
+        thread.start()
+        return thread
+
+    def finish_pending_in_background(self, model: Any = None) -> threading.Thread:
+        thread = threading.Thread(target=self.finish_pending, args=(model,), name="study-recap-resume", daemon=True)
+        thread.start()
+        return thread
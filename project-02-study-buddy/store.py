@@ -0,0 +1,236 @@
+import functools
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from locks import FileLock
+
+# Fold profile updates from the log into user_profile.json once this many pile up.
+COMPACT_EVERY = 50
+
+# Events that change the profile document (everything else, e.g. "session", is history).
+PROFILE_EVENTS = {"last_topic", "stuck_point"}
+
+
+def _atomic_write_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _apply(profile: Dict[str, Any], event: Dict[str, Any]) -> None:
+    kind = event.get("type")
+    value = event.get("value")
+    if kind == "last_topic" and value:
+        profile["last_topic"] = value
+    elif kind == "stuck_point" and value:
+        stuck = profile.setdefault("stuck_points", [])
+        if value not in stuck:
+            stuck.append(value)
+
+
+def _locked(method: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(method)
+    def wrapper(self: "ProfileStore", *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class ProfileStore:
+    """Study Buddy memory split in two files.
+
+    user_profile.json is the small profile document, always replaced atomically.
+    events.jsonl is an append-only log of per-turn updates and session recaps,
+    so a chat turn costs one short append instead of rewriting everything.
+    Profile updates in the log are folded back into the document every
+    COMPACT_EVERY events; session recaps stay in the log.
+    """
+
+    def __init__(self, memory_dir: Path, lock_path: Optional[Path] = None) -> None:
+        self.profile_path = memory_dir / "user_profile.json"
+        self.events_path = memory_dir / "events.jsonl"
+        self._pending = 0  # profile events in the log not yet folded into the document
+        # Background recaps append from another thread, other processes may serve the same user.
+        self._lock = FileLock(lock_path or memory_dir / ".lock")
+
+    # -- profile -----------------------------------------------------------
+
+    @_locked
+    def load(self) -> Dict[str, Any]:
+        profile = self._read_profile()
+
+        # Older profiles kept every session recap inside the document.
+        legacy_sessions = profile.pop("sessions", None)
+        if legacy_sessions:
+            for s in legacy_sessions:
+                self.append({"type": "session", **s})
+        if legacy_sessions is not None:
+            _atomic_write_json(self.profile_path, profile)
+
+        self._pending = 0
+        for event in self._read_events():
+            if event.get("type") in PROFILE_EVENTS:
+                _apply(profile, event)
+                self._pending += 1
+
+        if self._pending >= COMPACT_EVERY:
+            self.compact(profile)
+        return profile
+
+    @_locked
+    def save(self, profile: Dict[str, Any]) -> None:
+        doc = {k: v for k, v in profile.items() if k != "sessions"}
+        _atomic_write_json(self.profile_path, doc)
+
+    @_locked
+    def clear(self) -> None:
+        for path in (self.profile_path, self.events_path):
+            if path.exists():
+                path.unlink()
+        self._pending = 0
+
+    # -- event log ---------------------------------------------------------
+
+    @_locked
+    def append(self, event: Dict[str, Any]) -> None:
+        event = {"ts": datetime.now().isoformat(timespec="seconds"), **event}
+        self.events_path.parent.mkdir(parents=True, exist_ok=True)
+        self._repair_tail()
+        with open(self.events_path, "ab") as f:
+            f.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @_locked
+    def record(self, profile: Dict[str, Any], kind: str, value: str) -> None:
+        """Apply a profile update in memory and log it (compacting now and then)."""
+        _apply(profile, {"type": kind, "value": value})
+        self.append({"type": kind, "value": value})
+        self._pending += 1
+        if self._pending >= COMPACT_EVERY:
+            self.compact(profile)
+
+    def add_session(self, date: str, summary: Any, **fields: Any) -> None:
+        self.append({"type": "session", "date": date, "summary": summary, **fields})
+
+    def _read_profile(self) -> Dict[str, Any]:
+        if self.profile_path.exists():
+            try:
+                profile = json.loads(self.profile_path.read_text(encoding="utf-8"))
+                if isinstance(profile, dict):
+                    return profile
+            except Exception:
+                pass
+        return {}
+
+    def _read_events(self) -> List[Dict[str, Any]]:
+        # Read-only: a bad line is skipped, a last line without its newline is a
+        # write still in progress (or torn by a crash) and isn't an event yet.
+        if not self.events_path.exists():
+            return []
+        events: List[Dict[str, Any]] = []
+        with open(self.events_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                event = _parse_line(line)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _repair_tail(self) -> None:
+        # Under the lock, before appending: cut a torn last line so the new one starts on a boundary.
+        if not self.events_path.exists():
+            return
+        with open(self.events_path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                step = min(8192, pos)
+                pos -= step
+                f.seek(pos)
+                cut = f.read(step).rfind(b"\n")
+                if cut >= 0:
+                    f.truncate(pos + cut + 1)
+                    return
+            f.truncate(0)
+
+    @_locked
+    def sessions(self) -> List[Dict[str, Any]]:
+        return [e for e in self._read_events() if e.get("type") == "session"]
+
+    @_locked
+    def recent_sessions(self, n: int = 5) -> List[Dict[str, Any]]:
+        """Last n session recaps, read backwards from the end of the log."""
+        if n <= 0 or not self.events_path.exists():
+            return []
+        found: List[Dict[str, Any]] = []
+        with open(self.events_path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b""
+            while pos > 0 and len(found) < n:
+                step = min(8192, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + tail).split(b"\n")
+                # The first piece may be a partial line unless we reached the start.
+                tail = lines.pop(0) if pos > 0 else b""
+                for line in reversed(lines):
+                    event = _parse_line(line)
+                    if event and event.get("type") == "session":
+                        found.append(event)
+                        if len(found) >= n:
+                            break
+        found.reverse()
+        return found
+
+    @_locked
+    def compact(self, profile: Optional[Dict[str, Any]] = None) -> None:
+        """Fold profile events into the document and keep only session history in the log.
+
+        Works from what is on disk, so events other processes logged since this
+        one loaded are folded in too; a profile passed in is refreshed in place.
+        """
+        doc = self._read_profile()
+        doc.pop("sessions", None)
+        events = self._read_events()
+        for event in events:
+            if event.get("type") in PROFILE_EVENTS:
+                _apply(doc, event)
+        self.save(doc)
+
+        kept = [e for e in events if e.get("type") not in PROFILE_EVENTS]
+        tmp = self.events_path.with_suffix(".jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for event in kept:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.events_path)
+        self._pending = 0
+        if profile is not None:
+            profile.clear()
+            profile.update(doc)
+
+def _parse_line(line: bytes) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+    except Exception:
+        return None
+    return event if isinstance(event, dict) else None
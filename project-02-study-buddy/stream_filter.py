@@ -0,0 +1,95 @@
+from typing import Dict, List
+
+# Marker lines the model adds at the end of a reply; they update memory and are never shown.
+SUGGESTION_MARKERS = {
+    "LAST_TOPIC_SUGGESTION:": "last_topic",
+    "STUCK_POINT_SUGGESTION:": "stuck_point",
+}
+
+
+class SuggestionLineFilter:
+    """Strips suggestion marker lines from streamed text while keeping their values.
+
+    feed() returns the text that is safe to show right away. A line is only
+    held back while it could still turn out to be a marker line (it is blank
+    or a prefix of a marker); as soon as it can't, it streams through. Blank
+    lines are delayed until more text follows, so markers at the end of a reply
+    don't leave trailing empty lines. The result matches running the old
+    extract_suggestions / clean_assistant_text on the full text.
+    """
+
+    def __init__(self) -> None:
+        self.suggestions: Dict[str, str] = {}
+        self._line = ""  # held part of the current line
+        self._passing = False  # current line is known not to be a marker
+        self._newlines = 0  # line breaks not shown yet
+        self._shown: List[str] = []
+        self._cr = False  # chunk ended in "\r": a line break, maybe the first half of "\r\n"
+
+    def feed(self, chunk: str) -> str:
+        # "\r\n" and a lone "\r" break lines too, as they do for str.splitlines().
+        if self._cr:
+            chunk = "\r" + chunk
+        self._cr = chunk.endswith("\r")
+        if self._cr:
+            chunk = chunk[:-1]
+        chunk = chunk.replace("\r\n", "\n").replace("\r", "\n")
+
+        out: List[str] = []
+        while chunk:
+            nl = chunk.find("\n")
+            piece, chunk = (chunk, "") if nl < 0 else (chunk[:nl], chunk[nl + 1 :])
+
+            if self._passing:
+                out.append(self._emit(piece))
+            else:
+                self._line += piece
+                if not _could_be_marker(self._line):
+                    out.append(self._emit(self._line))
+                    self._line = ""
+                    self._passing = True
+
+            if nl >= 0:
+                out.append(self._end_line())
+        return "".join(out)
+
+    def close(self) -> str:
+        """Flush the last line; trailing line breaks are dropped."""
+        out = self.feed("\n") if self._cr else ""
+        out += "" if self._passing else self._end_line()
+        self._passing = False
+        self._newlines = 0
+        return out
+
+    def text(self) -> str:
+        return "".join(self._shown)
+
+    def _end_line(self) -> str:
+        out = ""
+        if not self._passing:
+            line, self._line = self._line, ""
+            stripped = line.strip()
+            for marker, key in SUGGESTION_MARKERS.items():
+                if stripped.startswith(marker):
+                    self.suggestions[key] = stripped[len(marker) :].strip()
+                    return ""  # the whole line, including its line break, disappears
+            out = self._emit(line if stripped else "")
+        self._passing = False
+        self._newlines += 1
+        return out
+
+    def _emit(self, text: str) -> str:
+        if not self._shown:
+            text = text.lstrip()
+        if not text:
+            return ""
+        if self._shown:
+            text = "\n" * self._newlines + text
+        self._newlines = 0
+        self._shown.append(text)
+        return text
+
+
+def _could_be_marker(line: str) -> bool:
+    s = line.lstrip()
+    return any(marker.startswith(s) or s.startswith(marker) for marker in SUGGESTION_MARKERS)
@@ -1,45 +1,62 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import queue
 import random
-import json
-import re
-from dataclasses import dataclass
-from typing import List, Dict
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
 
 from dotenv import load_dotenv
 
+from cards import Card
+from gen_cache import cache_key, get_response_cache
+from json_stream import CardStreamParser, extract_json_object
+from prompts import PROMPT_HASH, PROMPT_STATS, card_messages
+
 try:
     from langchain_openai import ChatOpenAI  # type: ignore
 except Exception:
     ChatOpenAI = None  # type: ignore
 
+try:
+    import httpx  # type: ignore
+except Exception:
+    httpx = None  # type: ignore
+
 load_dotenv()
 
+T = TypeVar("T")
+
 
-@dataclass
-class Flashcard:
-    q: str
-    a: str
+# Kept for older imports; cards are the shared slotted Card type now.
+Flashcard = Card
 
 
-SYSTEM_STYLE = """You are a friendly, focused flashcard generator.
-Rules:
-- Keep questions short and specific.
-- Keep answers short and correct.
-- Avoid fluff.
-- Use simple language if the user is a beginner.
-Return JSON only in this schema:
-{"cards":[{"q":"...","a":"..."}]}
-"""
+MODEL_NAME = "gpt-4o-mini"
+MODEL_TEMPERATURE = 0.4
 
+# Connection pool shared by every request a model client makes.
+LLM_MAX_CONNECTIONS = 20
+LLM_MAX_KEEPALIVE = 10
+LLM_KEEPALIVE_S = 60.0
 
-def _fallback_cards(topic: str, difficulty: str, n: int) -> List[Flashcard]:
+# One model call returns at most MAX_CARDS_PER_CALL cards; bigger decks are
+# split into chunks of BATCH_CHUNK_SIZE by generate_flashcards_batched.
+MAX_CARDS_PER_CALL = 50
+MAX_BATCH_CARDS = 500
+BATCH_CHUNK_SIZE = 10
+BATCH_MAX_CONCURRENCY = 4
+BATCH_CHUNK_TIMEOUT_S = 60.0
+
+
+def _fallback_cards(topic: str, difficulty: str, n: int) -> List[Card]:
     topic_clean = topic.strip() or "your topic"
-    cards: List[Flashcard] = []
+    cards: List[Card] = []
     for i in range(1, n + 1):
         cards.append(
-            Flashcard(
+            Card(
                 q=f"What is {topic_clean}? (Q{i} • {difficulty})",
                 a=f"A short definition/idea for {topic_clean}.",
             )
@@ -48,59 +65,301 @@ def _fallback_cards(topic: str, difficulty: str, n: int) -> List[Flashcard]:
 
 
 def _extract_json_object(text: str) -> dict:
-    text = (text or "").strip()
+    return extract_json_object(text)
+
+
+_LLM_CLIENTS: Dict[Tuple[str, float], Any] = {}
+_LLM_LOCK = threading.Lock()
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http_clients() -> Dict[str, Any]:
+    if httpx is None:
+        return {}
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_S,
+    )
+    return {"http_client": httpx.Client(limits=limits), "http_async_client": httpx.AsyncClient(limits=limits)}
+
+
+def get_llm(model: str = MODEL_NAME, temperature: float = MODEL_TEMPERATURE) -> Any:
+    """Process-wide chat model for (model, temperature), or None without an API key.
+
+    The client is built once with keep-alive HTTP pools, so later calls reuse
+    open connections instead of paying a new TLS handshake each time.
+    """
+    api_key = os.getenv("OPENAI_API_KEY", "").strip()
+    if not api_key or ChatOpenAI is None:
+        return None
+    key = (model, float(temperature))
+    with _LLM_LOCK:
+        llm = _LLM_CLIENTS.get(key)
+        if llm is None:
+            llm = ChatOpenAI(model=model, temperature=temperature, stream_usage=True, **_http_clients())
+            _LLM_CLIENTS[key] = llm
+        return llm
+
+
+def _make_llm() -> Any:
+    return get_llm()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    # The async connection pool belongs to the loop that opened it, so every
+    # async generation runs on this one long-lived loop instead of asyncio.run().
+    global _LOOP
+    with _LLM_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="flashcards-llm", daemon=True).start()
+        return _LOOP
+
+
+def _run(coro: Awaitable[T]) -> T:
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def _card_messages(topic: str, difficulty: str, n: int, part: str = "") -> List[Tuple[str, str]]:
+    return card_messages(topic, difficulty, n, part)
+
+
+def _parse_cards(text: str) -> List[Card]:
+    data = _extract_json_object(text)
+    raw_cards = data.get("cards", [])
+    if not isinstance(raw_cards, list):
+        return []
+    return [card for card in map(_card_from_raw, raw_cards) if card is not None]
+
+
+def _request_key(topic: str, difficulty: str, n: int, llm: Any) -> str:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return cache_key(" ".join(topic.casefold().split()), difficulty.casefold(), n, str(model), PROMPT_HASH)
+
+
+def generate_flashcards(topic: str, difficulty: str, n: int, llm: Any = None, use_cache: bool = True) -> List[Card]:
+    topic = (topic or "").strip()
+    difficulty = (difficulty or "Beginner").strip()
+    n = max(1, min(int(n), MAX_CARDS_PER_CALL))
+
+    llm = llm or _make_llm()
+    if llm is None:
+        return _fallback_cards(topic, difficulty, n)
+
+    cache = get_response_cache() if use_cache else None
+    key = _request_key(topic, difficulty, n, llm)
+    cached = cache.get(key) if cache else None
+    if cached:
+        return cached[:n]
+
     try:
-        return json.loads(text)
+        started = time.perf_counter()
+        msg = llm.invoke(_card_messages(topic, difficulty, n))
+        PROMPT_STATS.record(msg, time.perf_counter() - started)
+        cards = _parse_cards(getattr(msg, "content", "") or "")[:n]
     except Exception:
-        pass
+        cards = []
+
+    if not cards:
+        return _fallback_cards(topic, difficulty, n)
+    if cache and len(cards) == n:
+        # A short deck is still returned, but not cached: the next request tries again.
+        cache.put(key, cards)
+    return cards
+
+
+def _question_key(q: str) -> str:
+    return " ".join(q.casefold().split()).rstrip("?.! ")
+
+
+def _card_from_raw(c: Any) -> Optional[Card]:
+    if not isinstance(c, dict):
+        return None
+    q = str(c.get("q", "")).strip()
+    a = str(c.get("a", "")).strip()
+    return Card(q=q, a=a) if q and a else None
 
-    m = re.search(r"\{[\s\S]*\}", text)
-    if not m:
-        raise ValueError("No JSON object found in model output.")
-    return json.loads(m.group(0))
 
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return str(content or "")
 
-def generate_flashcards(topic: str, difficulty: str, n: int) -> List[Flashcard]:
+
+async def _ainvoke(llm: Any, messages: List[Tuple[str, str]]) -> Any:
+    if hasattr(llm, "ainvoke"):
+        return await llm.ainvoke(messages)
+    return await asyncio.to_thread(llm.invoke, messages)
+
+
+async def _astream_text(llm: Any, messages: List[Tuple[str, str]]) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    if hasattr(llm, "astream"):
+        usage_chunk = None
+        try:
+            async for chunk in llm.astream(messages):
+                if getattr(chunk, "usage_metadata", None):
+                    usage_chunk = chunk  # the final chunk carries token usage (stream_usage=True)
+                yield _chunk_text(chunk)
+        finally:
+            PROMPT_STATS.record(usage_chunk, time.perf_counter() - started)
+    else:
+        msg = await _ainvoke(llm, messages)
+        PROMPT_STATS.record(msg, time.perf_counter() - started)
+        yield _chunk_text(msg)
+
+
+async def astream_flashcards(
+    topic: str,
+    difficulty: str,
+    n: int,
+    llm: Any = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    chunk_timeout: float = BATCH_CHUNK_TIMEOUT_S,
+    use_cache: bool = True,
+) -> AsyncIterator[Card]:
+    """Yield cards as the model streams them, splitting big decks into concurrent chunks.
+
+    Each chunk is one streamed model call parsed with CardStreamParser; at most
+    max_concurrency run at once and each gets chunk_timeout seconds, plus one
+    retry for whatever it failed to deliver. Cards come out in chunk order (the
+    first chunk streams live, later ones as soon as the earlier chunks are
+    done) and questions repeated across chunks are dropped.
+    """
     topic = (topic or "").strip()
     difficulty = (difficulty or "Beginner").strip()
-    n = max(1, min(int(n), 50))
+    n = max(1, min(int(n), MAX_BATCH_CARDS))
+    chunk_size = max(1, min(int(chunk_size), MAX_CARDS_PER_CALL))
 
-    api_key = os.getenv("OPENAI_API_KEY", "").strip()
-    if not api_key or ChatOpenAI is None:
-        return _fallback_cards(topic, difficulty, n)
+    llm = llm or _make_llm()
+    if llm is None:
+        for card in _fallback_cards(topic, difficulty, n):
+            yield card
+        return
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.4)
+    cache = get_response_cache() if use_cache else None
+    key = _request_key(topic, difficulty, n, llm)
+    cached = cache.get(key) if cache else None
+    if cached:
+        for card in cached[:n]:
+            yield card
+        return
 
-    prompt = f"""
-Create {n} flashcards about: {topic}
-Difficulty: {difficulty}
-Return valid JSON only:
-{{"cards":[{{"q":"...","a":"..."}}]}}
-""".strip()
+    sizes = [min(chunk_size, n - start) for start in range(0, n, chunk_size)]
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+    queues: List[asyncio.Queue] = [asyncio.Queue() for _ in sizes]
 
-    try:
-        msg = llm.invoke([("system", SYSTEM_STYLE), ("user", prompt)])
-        text = getattr(msg, "content", "") or ""
-        data = _extract_json_object(text)
+    async def run_chunk(i: int, size: int) -> None:
+        part = ""
+        if len(sizes) > 1:
+            part = f"This is part {i + 1} of {len(sizes)} of a bigger deck."
+
+        got = 0
 
-        raw_cards = data.get("cards", [])
-        cards: List[Flashcard] = []
+        async def produce(want: int) -> None:
+            nonlocal got
+            parser = CardStreamParser()
+            count = 0
+            async for text in _astream_text(llm, _card_messages(topic, difficulty, want, part)):
+                # Past `want` cards keep reading (not queueing): the usage report comes last.
+                for raw in parser.feed(text) if count < want else ():
+                    card = _card_from_raw(raw)
+                    if card is None:
+                        continue
+                    await queues[i].put(card)
+                    count += 1
+                    got += 1
+                    if count >= want:
+                        break
 
-        if isinstance(raw_cards, list):
-            for c in raw_cards:
-                if not isinstance(c, dict):
+        async with semaphore:
+            try:
+                # A chunk that fails, times out or comes up short asks once more for the rest.
+                for _ in range(2):
+                    try:
+                        await asyncio.wait_for(produce(size - got), chunk_timeout)
+                    except Exception:
+                        pass  # keep whatever this chunk produced before failing
+                    if got >= size:
+                        break
+            finally:
+                queues[i].put_nowait(None)
+
+    tasks = [asyncio.create_task(run_chunk(i, size)) for i, size in enumerate(sizes)]
+    seen = set()
+    cards: List[Card] = []
+    try:
+        for chunk_queue in queues:
+            while len(cards) < n:
+                card = await chunk_queue.get()
+                if card is None:
+                    break
+                q_key = _question_key(card.q)
+                if q_key in seen:
                     continue
-                q = str(c.get("q", "")).strip()
-                a = str(c.get("a", "")).strip()
-                if q and a:
-                    cards.append(Flashcard(q=q, a=a))
+                seen.add(q_key)
+                cards.append(card)
+                yield card
+            if len(cards) >= n:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
 
-        return cards[:n] if cards else _fallback_cards(topic, difficulty, n)
-    except Exception:
-        return _fallback_cards(topic, difficulty, n)
+    if not cards:
+        for card in _fallback_cards(topic, difficulty, n):
+            yield card
+    elif cache and len(cards) == n:
+        # Short after the retries (failed chunks, duplicate questions): not cached.
+        cache.put(key, cards)
+
+
+def stream_flashcards(topic: str, difficulty: str, n: int, **kwargs: Any) -> Iterator[Card]:
+    """Blocking iterator over astream_flashcards, for callers without an event loop (Streamlit).
+
+    The stream runs on the shared background loop; cards are handed over through a queue.
+    """
+    items: queue.Queue = queue.Queue()
+    done = object()
+
+    async def pump() -> None:
+        try:
+            async for card in astream_flashcards(topic, difficulty, n, **kwargs):
+                items.put(card)
+        except BaseException as e:  # re-raised on the caller's thread
+            items.put(e)
+        finally:
+            items.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        future.cancel()
+
+
+async def agenerate_flashcards_batched(topic: str, difficulty: str, n: int, **kwargs: Any) -> List[Card]:
+    """All of astream_flashcards collected into a list (same chunking/dedupe/timeouts)."""
+    return [card async for card in astream_flashcards(topic, difficulty, n, **kwargs)]
+
+
+def generate_flashcards_batched(topic: str, difficulty: str, n: int, **kwargs: Any) -> List[Card]:
+    """Blocking wrapper around agenerate_flashcards_batched."""
+    return _run(agenerate_flashcards_batched(topic, difficulty, n, **kwargs))
 
 
-def shuffle_cards(cards: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def shuffle_cards(cards: Sequence[Card]) -> List[Card]:
     out = list(cards)
     random.shuffle(out)
     return out
@@ -2,18 +2,32 @@ from __future__ import annotations
 
 import csv
 import time
-from datetime import date, datetime, timedelta
+from datetime import timedelta
 from io import StringIO
 from typing import Any
 
 import streamlit as st
 
-from agent import generate_flashcards, shuffle_cards
-from storage import Deck, delete_deck, load_decks, load_stats, save_stats, upsert_deck
+from agent import MAX_BATCH_CARDS, MODEL_NAME, get_llm, shuffle_cards, stream_flashcards
+from gen_cache import get_response_cache
+from importer import ImportStats, import_file
+from prompts import PROMPT_STATS
+from review_log import ReviewSummary, get_review_log
+from scheduler import GRADES, get_scheduler
+from storage import (
+    Deck,
+    count_decks,
+    delete_deck,
+    load_deck,
+    load_stats,
+    page_decks,
+    upsert_deck,
+)
 
 
 APP_TITLE = "Project 03 — Flashcards UI"
 MEMORY_DIR = "memory"
+DECKS_PAGE_SIZE = 20
 
 QUICK_TOPICS = [
     "SQL joins",
@@ -104,6 +118,13 @@ div:has(#flashcard-anchor) + div button:active{
     )
 
 
+@st.cache_resource(show_spinner=False)
+def shared_llm(model: str = MODEL_NAME) -> Any:
+    # One pooled client for every session in this Streamlit process (None without a key;
+    # stream_flashcards then checks the key again itself).
+    return get_llm(model)
+
+
 def cute_deck_name(topic: str) -> str:
     t = (topic or "").strip()
     return t if t else "Flashcards"
@@ -116,53 +137,35 @@ def set_page(page: str) -> None:
 def ensure_state() -> None:
     st.session_state.setdefault("page", "Create")
     st.session_state.setdefault("selected_deck_id", None)
+    st.session_state.setdefault("decks_page", 0)
+    st.session_state.setdefault("export_deck_id", None)
 
-    st.session_state.setdefault("study_index", 0)
     st.session_state.setdefault("study_revealed", False)
-    st.session_state.setdefault("study_mastered_ids", set())
+    st.session_state.setdefault("study_card", None)
+    st.session_state.setdefault("study_shown_at", None)
 
     st.session_state.setdefault("create_topic", "")
     st.session_state.setdefault("create_difficulty", "Intermediate")
     st.session_state.setdefault("create_n", 5)
 
 
-def update_streak_on_study(memory_dir: str) -> None:
-    stats = load_stats(memory_dir)
-    last = stats.get("last_study_date")
-    streak = int(stats.get("streak_days", 0) or 0)
-
-    today = date.today().isoformat()
-    if last == today:
-        return
-
-    last_dt = None
-    if last:
-        try:
-            last_dt = datetime.fromisoformat(last).date()
-        except Exception:
-            last_dt = None
-
-    if last_dt is None:
-        streak = 1
-    else:
-        streak = streak + 1 if (date.today() - last_dt == timedelta(days=1)) else 1
-
-    stats["streak_days"] = streak
-    stats["last_study_date"] = today
-    save_stats(memory_dir, stats)
+def review_summary(memory_dir: str) -> ReviewSummary:
+    # Cached by the review log until the next answer is logged.
+    legacy = load_stats(memory_dir)
+    carry = (int(legacy.get("streak_days", 0) or 0), legacy.get("last_study_date"))
+    return get_review_log(memory_dir).summary(carry=carry)
 
 
 def anki_csv_bytes(deck: Deck) -> bytes:
     output = StringIO()
     writer = csv.writer(output)
     for c in deck.cards:
-        writer.writerow([c.get("q", ""), c.get("a", "")])
+        writer.writerow([c.q, c.a])
     return output.getvalue().encode("utf-8")
 
 
 def render_header(memory_dir: str) -> None:
-    stats = load_stats(memory_dir)
-    streak_days = int(stats.get("streak_days", 0) or 0)
+    summary = review_summary(memory_dir)
 
     st.markdown(
         f"""
@@ -174,15 +177,17 @@ def render_header(memory_dir: str) -> None:
         unsafe_allow_html=True,
     )
 
-    st.markdown(f"🔥 **Streak:** {streak_days} day(s)")
+    st.markdown(f"🔥 **Streak:** {summary.streak_days} day(s) • 📚 **Today:** {summary.reviews_today} review(s)")
 
-    c1, c2, c3 = st.columns(3)
+    c1, c2, c3, c4 = st.columns(4)
     with c1:
         st.button("✨ Create", use_container_width=True, on_click=set_page, args=("Create",), key="nav_create")
     with c2:
         st.button("📁 My Decks", use_container_width=True, on_click=set_page, args=("My Decks",), key="nav_decks")
     with c3:
         st.button("🧠 Study", use_container_width=True, on_click=set_page, args=("Study",), key="nav_study")
+    with c4:
+        st.button("📥 Import", use_container_width=True, on_click=set_page, args=("Import",), key="nav_import")
 
     st.divider()
 
@@ -201,7 +206,14 @@ def render_create(memory_dir: str) -> None:
 
     st.text_input("Topic", key="create_topic", placeholder="e.g. SQL LEFT JOIN vs INNER JOIN")
     st.selectbox("Difficulty", ["Beginner", "Intermediate", "Advanced"], key="create_difficulty")
-    st.number_input("Number of cards", min_value=1, max_value=50, step=1, key="create_n")
+    st.number_input("Number of cards", min_value=1, max_value=MAX_BATCH_CARDS, step=1, key="create_n")
+
+    cache_stats = get_response_cache().stats()
+    prompt_stats = PROMPT_STATS.stats()
+    st.caption(
+        f"⚡ Generation cache: {cache_stats['hits']} hit(s) • {cache_stats['misses']} miss(es) • "
+        f"prompt cache: {prompt_stats['cached_ratio']:.0%} of {prompt_stats['prompt_tokens']} prompt tokens"
+    )
 
     if st.button("💖 Generate & Save", use_container_width=True, key="btn_generate_save"):
         topic = (st.session_state.create_topic or "").strip()
@@ -213,8 +225,15 @@ def render_create(memory_dir: str) -> None:
         difficulty = st.session_state.create_difficulty
         n = int(st.session_state.create_n)
 
-        cards = generate_flashcards(topic=topic, difficulty=difficulty, n=n)
-        card_dicts = [{"q": c.q, "a": c.a} for c in cards]
+        # Show each card as soon as the model finishes writing it.
+        progress = st.progress(0.0, text="Generating…")
+        live = st.container()
+        cards = []
+        for card in stream_flashcards(topic=topic, difficulty=difficulty, n=n, llm=shared_llm()):
+            cards.append(card)
+            with live:
+                st.markdown(f"**{len(cards)}.** {card.q}")
+            progress.progress(min(len(cards) / n, 1.0), text=f"Generating… {len(cards)}/{n}")
 
         deck_id = f"deck_{int(time.time() * 1000)}"
         deck = Deck(
@@ -222,7 +241,7 @@ def render_create(memory_dir: str) -> None:
             name=deck_name,
             topic=topic,
             difficulty=difficulty,
-            cards=card_dicts,
+            cards=cards,
             created_at=time.time(),
         )
         upsert_deck(memory_dir, deck)
@@ -232,70 +251,182 @@ def render_create(memory_dir: str) -> None:
         st.rerun()  # <-- this is the one rerun we actually want
 
 
+def render_import(memory_dir: str) -> None:
+    st.markdown("### 📥 Import decks")
+    st.caption("CSV / TSV (front, back) or an Anki .apkg export. Big files are split into decks of a few thousand cards.")
+
+    upload = st.file_uploader("File", type=["csv", "tsv", "txt", "apkg", "colpkg"], key="import_file")
+    name = st.text_input("Deck name", placeholder="(file name)", key="import_name")
+    difficulty = st.selectbox("Difficulty", ["Beginner", "Intermediate", "Advanced"], index=1, key="import_difficulty")
+
+    if upload is None or not st.button("📥 Import", use_container_width=True, key="btn_import"):
+        return
+
+    bar = st.progress(0.0, text="Importing…")
+    status = st.empty()
+
+    def report(stats: ImportStats) -> None:
+        bar.progress(stats.fraction, text=f"Importing… {stats.fraction:.0%}")
+        status.caption(f"{stats.rows} rows • {stats.cards} cards • {stats.duplicates} duplicates • {stats.decks} deck(s)")
+
+    try:
+        stats = import_file(memory_dir, upload, filename=upload.name, name=name, difficulty=difficulty, progress=report)
+    except Exception as e:
+        bar.empty()
+        st.error(f"Import failed, nothing was saved: {e}")
+        return
+
+    bar.progress(1.0, text="Done")
+    st.success(
+        f"Imported {stats.cards} cards into {stats.decks} deck(s) in {stats.seconds:.1f}s "
+        f"({stats.duplicates} duplicates, {stats.skipped} empty rows skipped)."
+    )
+    if stats.deck_ids:
+        st.session_state.selected_deck_id = stats.deck_ids[0]
+        st.session_state.decks_page = 0
+        st.button("📁 Go to My Decks", use_container_width=True, on_click=set_page, args=("My Decks",), key="import_done")
+
+
+def render_review_stats(summary: ReviewSummary) -> None:
+    if not summary.reviews:
+        return
+    with st.expander(f"📊 Review stats • {summary.reviews} review(s) • {summary.recall_rate:.0%} recalled"):
+        st.caption(f"Median answer time: {summary.median_response_ms / 1000:.1f}s")
+
+        # Heatmap: one column per week, one row per weekday.
+        peak = max(int(summary.heatmap.max()), 1)
+        cells = []
+        for weekday in range(7):
+            row = "".join(
+                f"<span title='{summary.heatmap_start + timedelta(days=week * 7 + weekday)}: {n}' "
+                f"style='display:inline-block;width:14px;height:14px;margin:1px;border-radius:3px;"
+                f"background:rgba(236,72,153,{0.08 + 0.92 * n / peak if n else 0.08:.2f});'></span>"
+                for week, n in enumerate(summary.heatmap[weekday].tolist())
+            )
+            cells.append(f"<div style='line-height:0;'>{row}</div>")
+        st.markdown("".join(cells), unsafe_allow_html=True)
+
+        retention = [(label, n, rate) for label, n, rate in summary.retention if n]
+        if retention:
+            st.caption("Recall by time since the previous review")
+            st.bar_chart({"recalled %": {label: round(rate * 100, 1) for label, _, rate in retention}})
+
+
 def render_decks(memory_dir: str) -> None:
     st.markdown("### 📁 My Decks")
 
-    decks = load_decks(memory_dir)
-    if not decks:
+    total = count_decks(memory_dir)
+    if not total:
         st.info("No decks yet. Go to **Create** to make one.")
         return
 
-    ordered = sorted(decks.values(), key=lambda d: d.created_at, reverse=True)
+    pages = (total + DECKS_PAGE_SIZE - 1) // DECKS_PAGE_SIZE
+    page = min(max(int(st.session_state.get("decks_page", 0)), 0), pages - 1)
+    st.session_state.decks_page = page
 
-    for deck in ordered:
-        st.markdown(f"#### {deck.name}")
-        st.caption(f"{deck.topic} • {deck.difficulty} • {len(deck.cards)} cards")
+    summaries = page_decks(memory_dir, offset=page * DECKS_PAGE_SIZE, limit=DECKS_PAGE_SIZE)
+    reviews = review_summary(memory_dir)
+    render_review_stats(reviews)
+
+    for summary in summaries:
+        st.markdown(f"#### {summary.name}")
+        recall = ""
+        if summary.id in reviews.decks:
+            n, rate = reviews.decks[summary.id]
+            recall = f" • {rate:.0%} recalled over {n} review(s)"
+        st.caption(f"{summary.topic} • {summary.difficulty} • {summary.card_count} cards{recall}")
 
         left, mid, right = st.columns([3, 2, 3])
 
         with left:
-            if st.button("🧠 Study", key=f"study_{deck.id}", use_container_width=True):
-                st.session_state.selected_deck_id = deck.id
-                st.session_state.study_index = 0
+            if st.button("🧠 Study", key=f"study_{summary.id}", use_container_width=True):
+                st.session_state.selected_deck_id = summary.id
                 st.session_state.study_revealed = False
-                st.session_state.study_mastered_ids = set()
                 st.session_state.page = "Study"
                 st.rerun()
 
         with mid:
-            st.download_button(
-                "📥 Export Anki CSV",
-                data=anki_csv_bytes(deck),
-                file_name=f"{deck.name}.csv",
-                mime="text/csv",
-                key=f"anki_{deck.id}",
-                use_container_width=True,
-            )
+            # Cards are only read for the deck being exported, so the list stays
+            # cheap no matter how big the decks are.
+            if st.session_state.get("export_deck_id") == summary.id:
+                deck = load_deck(memory_dir, summary.id)
+                st.download_button(
+                    "📥 Download CSV",
+                    data=anki_csv_bytes(deck) if deck else b"",
+                    file_name=f"{summary.name}.csv",
+                    mime="text/csv",
+                    key=f"anki_{summary.id}",
+                    use_container_width=True,
+                )
+            elif st.button("📥 Export Anki CSV", key=f"export_{summary.id}", use_container_width=True):
+                st.session_state.export_deck_id = summary.id
+                st.rerun()
 
         with right:
-            if st.button("🗑️ Delete", key=f"del_{deck.id}", use_container_width=True):
-                if delete_deck(memory_dir, deck.id):
-                    if st.session_state.get("selected_deck_id") == deck.id:
+            if st.button("🗑️ Delete", key=f"del_{summary.id}", use_container_width=True):
+                if delete_deck(memory_dir, summary.id):
+                    get_scheduler(memory_dir).forget_deck(summary.id)
+                    if st.session_state.get("selected_deck_id") == summary.id:
                         st.session_state.selected_deck_id = None
                     st.rerun()
 
         st.divider()
 
+    if pages > 1:
+        prev_col, info_col, next_col = st.columns([2, 3, 2])
+        with prev_col:
+            if st.button("← Newer", key="decks_prev", disabled=page == 0, use_container_width=True):
+                st.session_state.decks_page = page - 1
+                st.rerun()
+        with info_col:
+            st.caption(f"Page {page + 1}/{pages} • {total} decks")
+        with next_col:
+            if st.button("Older →", key="decks_next", disabled=page >= pages - 1, use_container_width=True):
+                st.session_state.decks_page = page + 1
+                st.rerun()
+
+
+def _due_in(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min"
+    if seconds < 2 * 86400:
+        return f"{round(seconds / 3600)} h"
+    return f"{round(seconds / 86400)} days"
+
 
 def render_study(memory_dir: str) -> None:
-    decks = load_decks(memory_dir)
+    sched = get_scheduler(memory_dir)
+    now = time.time()
+
     deck_id = st.session_state.get("selected_deck_id")
+    if deck_id:
+        deck = load_deck(memory_dir, deck_id)
+        idx = sched.next_card(deck_id, len(deck.cards), now) if deck and deck.cards else None
+    else:
+        # No deck picked: review whatever is due across all decks.
+        def card_count(due_deck_id: str) -> Any:
+            # Decks come from the backend cache, so asking twice is cheap.
+            due_deck = load_deck(memory_dir, due_deck_id)
+            return len(due_deck.cards or []) if due_deck else None
+
+        due = sched.next_due(now, card_count)
+        deck = load_deck(memory_dir, due[0]) if due else None
+        idx = due[1] if due else None
+        if deck is None or idx is None or idx >= len(deck.cards or []):
+            st.info("Nothing due right now. Pick a deck from **My Decks** to learn new cards.")
+            return
 
-    if not deck_id or deck_id not in decks:
+    if deck is None:
         st.info("Pick a deck from **My Decks** first.")
         return
 
-    deck = decks[deck_id]
     cards = deck.cards or []
     if not cards:
         st.warning("This deck has no cards.")
         return
 
-    update_streak_on_study(memory_dir)
-
     total = len(cards)
-    idx = int(st.session_state.get("study_index", 0)) % total
-    st.session_state.study_index = idx
+    counts = sched.counts(deck.id, total, now)
 
     st.markdown("### 🧠 Study mode")
 
@@ -305,21 +436,31 @@ def render_study(memory_dir: str) -> None:
     with right_info:
         st.markdown(
             f"<div style='text-align:right; opacity:0.75; font-size:14px;'>"
-            f"{deck.difficulty} • Card {idx+1}/{total}"
+            f"{deck.difficulty} • {counts['due']} due • {counts['new']} new"
             f"</div>",
             unsafe_allow_html=True,
         )
 
-    mastered_set = st.session_state.get("study_mastered_ids", set())
-    if not isinstance(mastered_set, set):
-        mastered_set = set()
-        st.session_state.study_mastered_ids = mastered_set
+    st.progress(counts["seen"] / total)
+    st.caption(f"✅ Seen: {counts['seen']}/{total}")
 
-    st.progress((idx + 1) / total)
-    st.caption(f"✅ Mastered: {len(mastered_set)}/{total}")
+    if idx is None:
+        next_at = sched.next_due_at(deck.id, total)
+        wait = f" Next card is due in {_due_in(next_at - now)}." if next_at else ""
+        st.success(f"🎉 All caught up on this deck.{wait}")
+        if st.button("❌ Exit", key=f"exit_{deck.id}_done", use_container_width=True):
+            st.session_state.page = "My Decks"
+            st.rerun()
+        return
+
+    if st.session_state.get("study_card") != (deck.id, idx):
+        # First time this card is on screen: start timing the answer.
+        st.session_state.study_card = (deck.id, idx)
+        st.session_state.study_shown_at = time.time()
 
-    q = (cards[idx].get("q", "") or "").strip()
-    a = (cards[idx].get("a", "") or "").strip()
+    card = cards[idx]
+    q = card.q.strip()
+    a = card.a.strip()
     revealed = bool(st.session_state.get("study_revealed", False))
 
     st.markdown('<div id="flashcard-anchor"></div>', unsafe_allow_html=True)
@@ -327,29 +468,24 @@ def render_study(memory_dir: str) -> None:
     card_text = a if revealed else q
     if st.button(f"{card_text}\n\n✨ Tap to flip", key=f"card_{deck.id}_{idx}_{'a' if revealed else 'q'}", use_container_width=True):
         st.session_state.study_revealed = not revealed
+        st.rerun()
 
     st.markdown("")
 
-    c1, c2, c3, c4 = st.columns([2, 3, 2, 2])
+    c1, c2, c3, c4, c5 = st.columns([2, 2, 3, 2, 2])
+    answers = [(c1, "🔁 Again", "again"), (c2, "😅 Hard", "hard"), (c3, "✅ Got it", "good"), (c4, "🌟 Easy", "easy")]
 
-    with c1:
-        if st.button("← Prev", key=f"prev_{deck.id}_{idx}", use_container_width=True):
-            st.session_state.study_index = (idx - 1) % total
-            st.session_state.study_revealed = False
-
-    with c2:
-        if st.button("✅ Got it", key=f"master_{deck.id}_{idx}", use_container_width=True):
-            mastered_set.add(idx)
-            st.session_state.study_mastered_ids = mastered_set
-            st.session_state.study_revealed = False
-            st.session_state.study_index = (idx + 1) % total
-
-    with c3:
-        if st.button("Next →", key=f"next_{deck.id}_{idx}", use_container_width=True):
-            st.session_state.study_index = (idx + 1) % total
-            st.session_state.study_revealed = False
+    for col, label, grade in answers:
+        with col:
+            if st.button(label, key=f"{grade}_{deck.id}_{idx}", use_container_width=True):
+                sched.review(deck.id, idx, GRADES[grade])
+                shown_at = float(st.session_state.get("study_shown_at") or time.time())
+                get_review_log(memory_dir).append(deck.id, idx, GRADES[grade], (time.time() - shown_at) * 1000)
+                st.session_state.study_card = None
+                st.session_state.study_revealed = False
+                st.rerun()
 
-    with c4:
+    with c5:
         if st.button("❌ Exit", key=f"exit_{deck.id}_{idx}", use_container_width=True):
             st.session_state.study_revealed = False
             st.session_state.page = "My Decks"
@@ -370,6 +506,8 @@ def main() -> None:
         render_create(MEMORY_DIR)
     elif page == "My Decks":
         render_decks(MEMORY_DIR)
+    elif page == "Import":
+        render_import(MEMORY_DIR)
     else:
         render_study(MEMORY_DIR)
 
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Sequence, Union, overload
+
+
+# Decks at least this big are kept as CardColumns once loaded from storage.
+COLUMNAR_MIN_CARDS = 1_000
+
+
+@dataclass(frozen=True, slots=True)
+class Card:
+    q: str
+    a: str
+
+
+class CardColumns(Sequence[Card]):
+    """Cards kept as two parallel lists of strings.
+
+    Indexing builds a Card on the fly, so a big deck costs two list slots per
+    card instead of one object per card.
+    """
+
+    __slots__ = ("questions", "answers")
+
+    def __init__(self, questions: List[str], answers: List[str]) -> None:
+        if len(questions) != len(answers):
+            raise ValueError("questions and answers must have the same length.")
+        self.questions = questions
+        self.answers = answers
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[Card]) -> "CardColumns":
+        questions: List[str] = []
+        answers: List[str] = []
+        for c in cards:
+            questions.append(c.q)
+            answers.append(c.a)
+        return cls(questions, answers)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    @overload
+    def __getitem__(self, index: int) -> Card: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "CardColumns": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CardColumns(self.questions[index], self.answers[index])
+        return Card(self.questions[index], self.answers[index])
+
+    def __iter__(self) -> Iterator[Card]:
+        return map(Card, self.questions, self.answers)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CardColumns):
+            return self.questions == other.questions and self.answers == other.answers
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CardColumns({len(self)} cards)"
+
+
+Cards = Union[List[Card], CardColumns]
+
+
+def pack_cards(cards: Sequence[Card]) -> Cards:
+    """Switch to the columnar layout for big decks; small ones stay a plain list."""
+    if isinstance(cards, CardColumns) or len(cards) < COLUMNAR_MIN_CARDS:
+        return cards if isinstance(cards, (list, CardColumns)) else list(cards)
+    return CardColumns.from_cards(cards)
+
+
+def cards_to_raw(cards: Iterable[Card]) -> List[Dict[str, str]]:
+    """Serialization boundary: Card objects -> [{"q": ..., "a": ...}]."""
+    if isinstance(cards, CardColumns):
+        return [{"q": q, "a": a} for q, a in zip(cards.questions, cards.answers)]
+    return [{"q": c.q, "a": c.a} for c in cards]
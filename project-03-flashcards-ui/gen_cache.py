@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cards import Card, cards_to_raw
+
+
+DEFAULT_CACHE_DIR = os.path.join("memory", "gen_cache")
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1_000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(*parts: Any) -> str:
+    """Content address for a request: sha256 over the JSON-encoded parts."""
+    blob = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Generated decks on disk, one JSON file per request key.
+
+    Entries older than ttl_s are ignored (and removed). When the cache holds
+    more than max_entries files or max_bytes, the least recently used ones are
+    deleted; a hit bumps the file's mtime. Eviction works from a listing of the
+    directory, so it also counts entries other processes wrote.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        # key -> (mtime, size) of every entry on disk, whoever wrote it.
+        entries: Dict[str, Tuple[float, int]] = {}
+        if os.path.isdir(self.directory):
+            for sub in os.scandir(self.directory):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".json"):
+                        try:
+                            st = entry.stat()
+                        except FileNotFoundError:
+                            continue  # evicted by another process meanwhile
+                        entries[entry.name[:-5]] = (st.st_mtime, st.st_size)
+        return entries
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[List[Card]]:
+        with self._lock:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                created_at = float(payload["created_at"])
+                cards = [Card(q=str(c["q"]), a=str(c["a"])) for c in payload["cards"]]
+            except Exception:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            if self.ttl_s and now - created_at > self.ttl_s:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            self.hits += 1
+            return cards
+
+    def put(self, key: str, cards: List[Card]) -> None:
+        with self._lock:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temp name: another process may be writing the same key.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{key}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"created_at": time.time(), "cards": cards_to_raw(cards)}, f, ensure_ascii=False)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = self._scan()
+        total = sum(size for _, size in entries.values())
+        if len(entries) <= self.max_entries and total <= self.max_bytes:
+            return
+        count = len(entries)
+        for key, (_, size) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._remove(key)
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in self._scan():
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._scan()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size in entries.values()),
+            }
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache; FLASHCARDS_CACHE_DIR / FLASHCARDS_CACHE_TTL override the defaults."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            ttl = os.getenv("FLASHCARDS_CACHE_TTL", "").strip()
+            _CACHE = ResponseCache(
+                directory=os.getenv("FLASHCARDS_CACHE_DIR", "").strip() or DEFAULT_CACHE_DIR,
+                ttl_s=float(ttl) if ttl else DEFAULT_TTL_S,
+            )
+        return _CACHE
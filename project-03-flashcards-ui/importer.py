@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import html
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from cards import Card, pack_cards
+from storage import Deck, clean_card, upsert_decks
+
+
+# Imported decks are cut into parts of at most this many cards ("Name",
+# "Name (2)", ...), so only one part is ever held in memory and Study mode
+# never has to load a 100k-card deck.
+IMPORT_DECK_MAX_CARDS = int(os.getenv("FLASHCARDS_IMPORT_DECK_CARDS", "2000"))
+PROGRESS_EVERY = 2_000
+COPY_CHUNK = 1 << 20
+
+FORMATS = ("csv", "tsv", "apkg")
+
+# (deck name or None for the default, front, back)
+Row = Tuple[Optional[str], str, str]
+
+_TAG = re.compile(r"<[^>]+>")
+_LINE_BREAK = re.compile(r"<br\s*/?>|</div>|</p>", re.I)
+_SOUND = re.compile(r"\[sound:[^\]]*\]")
+_HEADER_NAMES = {"front", "back", "question", "answer", "q", "a", "term", "definition"}
+_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "colon": ":", "space": " "}
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    cards: int = 0
+    duplicates: int = 0
+    skipped: int = 0  # rows with nothing on either side
+    decks: int = 0
+    deck_ids: List[str] = field(default_factory=list)
+    position: int = 0  # bytes read (CSV/TSV) or notes read (.apkg)
+    total: int = 0  # same unit; 0 when unknown
+    seconds: float = 0.0
+
+    @property
+    def fraction(self) -> float:
+        return min(self.position / self.total, 1.0) if self.total else 0.0
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".apkg", ".colpkg"):
+        return "apkg"
+    if ext in (".tsv", ".txt"):
+        return "tsv"
+    return "csv"
+
+
+def strip_html(text: str) -> str:
+    text = _LINE_BREAK.sub("\n", text)
+    text = _SOUND.sub("", _TAG.sub("", text))
+    return html.unescape(text).replace("\xa0", " ")
+
+
+# ----- CSV / TSV -----
+
+def iter_delimited_rows(stream: BinaryIO, delimiter: Optional[str] = None) -> Iterator[Row]:
+    """Rows of a CSV/TSV file, read lazily (quoted fields may span lines).
+
+    Understands the header lines of Anki's "Notes in Plain Text" export
+    (#separator:, #html:, #deck column:, #tags column:, ...); without them the
+    first two columns are front and back.
+    """
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        is_html = False
+        skip_cols: Set[int] = set()
+        deck_col: Optional[int] = None
+
+        line = text.readline()
+        while line.startswith("#") and ":" in line:
+            key, _, value = line[1:].strip().partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "separator":
+                delimiter = _SEPARATORS.get(value.lower(), value[:1] or None)
+            elif key == "html":
+                is_html = value.lower() == "true"
+            elif key.endswith(" column") and value.isdigit():
+                skip_cols.add(int(value) - 1)
+                if key == "deck column":
+                    deck_col = int(value) - 1
+            line = text.readline()
+
+        if delimiter is None:
+            delimiter = "\t" if "\t" in line else ";" if line.count(";") > line.count(",") else ","
+
+        for n, record in enumerate(csv.reader(itertools.chain([line], text), delimiter=delimiter)):
+            fields = [v for i, v in enumerate(record) if i not in skip_cols]
+            if not fields or (n == 0 and {f.strip().lower() for f in fields[:2]} <= _HEADER_NAMES):
+                continue
+            front = fields[0]
+            back = fields[1] if len(fields) > 1 else ""
+            if is_html:
+                front, back = strip_html(front), strip_html(back)
+            deck = record[deck_col].strip() if deck_col is not None and deck_col < len(record) else None
+            yield deck or None, front, back
+    finally:
+        # The wrapper would close the caller's stream when it's garbage-collected.
+        text.detach()
+
+
+# ----- Anki .apkg -----
+
+def _deck_names(conn: sqlite3.Connection) -> Dict[int, str]:
+    try:
+        # Schema 18+ (Anki 2.1.28+): a decks table, path parts separated by \x1f.
+        return {int(i): str(n).replace("\x1f", "::") for i, n in conn.execute("SELECT id, name FROM decks")}
+    except sqlite3.Error:
+        raw = conn.execute("SELECT decks FROM col").fetchone()[0]
+        return {int(i): str(d.get("name", "")) for i, d in json.loads(raw or "{}").items()}
+
+
+def open_apkg(source: Union[str, BinaryIO], workdir: str) -> sqlite3.Connection:
+    """Extract the collection inside an .apkg/.colpkg to workdir and open it read-only."""
+    with zipfile.ZipFile(source) as z:
+        names = set(z.namelist())
+        member = next((n for n in ("collection.anki21", "collection.anki2") if n in names), None)
+        if member is None:
+            raise ValueError(
+                "This .apkg only has the new compressed collection format; re-export it from Anki "
+                "with \"Support older Anki versions\" ticked."
+            )
+        path = os.path.join(workdir, "collection.sqlite")
+        with z.open(member) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def iter_apkg_rows(conn: sqlite3.Connection) -> Iterator[Row]:
+    """One row per note (first two fields), grouped by deck; rows come off a cursor."""
+    decks = _deck_names(conn)
+    cursor = conn.execute(
+        """
+        SELECT n.flds, MIN(c.did) AS did
+        FROM notes n JOIN cards c ON c.nid = n.id
+        GROUP BY n.id
+        ORDER BY did, n.id
+        """
+    )
+    for flds, did in cursor:
+        fields = str(flds).split("\x1f")
+        front = strip_html(fields[0])
+        back = strip_html(fields[1]) if len(fields) > 1 else ""
+        yield decks.get(int(did)) or None, front, back
+
+
+# ----- pipeline -----
+
+def _deck_stream(
+    rows: Iterator[Row],
+    stats: ImportStats,
+    name: str,
+    topic: Optional[str],
+    difficulty: str,
+    position: Callable[[], int],
+    progress: Optional[Callable[[ImportStats], None]],
+) -> Iterator[Deck]:
+    # Dedupe on the normalized (front, back): one hash per distinct card, not the card itself.
+    seen: Set[int] = set()
+    parts: Dict[str, int] = {}
+    started = time.time()
+    stamp = int(started * 1000)
+    current: Optional[str] = None
+    cards: List[Card] = []
+
+    def flush() -> Deck:
+        parts[current] = parts.get(current, 0) + 1
+        n = parts[current]
+        stats.decks += 1
+        deck = Deck(
+            id=f"deck_{stamp}_{stats.decks}",
+            name=current if n == 1 else f"{current} ({n})",
+            topic=topic or current.split("::")[-1],
+            difficulty=difficulty,
+            cards=pack_cards(cards),
+            # Newest first on My Decks, so count down to keep parts in file order.
+            created_at=started - stats.decks * 1e-3,
+        )
+        stats.deck_ids.append(deck.id)
+        return deck
+
+    for deck_name, front, back in rows:
+        stats.rows += 1
+        card = clean_card(front, back)
+        if card is None:
+            stats.skipped += 1
+        else:
+            key = hash(card)
+            if key in seen:
+                stats.duplicates += 1
+            else:
+                seen.add(key)
+                deck_name = deck_name or name
+                if cards and (deck_name != current or len(cards) >= IMPORT_DECK_MAX_CARDS):
+                    yield flush()
+                    cards = []
+                current = deck_name
+                cards.append(Card(*card))
+                stats.cards += 1
+        if progress is not None and stats.rows % PROGRESS_EVERY == 0:
+            stats.position = position()
+            stats.seconds = time.time() - started
+            progress(stats)
+
+    if cards:
+        yield flush()
+
+
+def import_file(
+    memory_dir: str,
+    source: Union[str, BinaryIO],
+    filename: Optional[str] = None,
+    fmt: Optional[str] = None,
+    name: Optional[str] = None,
+    topic: Optional[str] = None,
+    difficulty: str = "Intermediate",
+    progress: Optional[Callable[[ImportStats], None]] = None,
+) -> ImportStats:
+    """Stream a CSV/TSV/.apkg file into new decks, written in short batches (see storage.upsert_decks).
+
+    source is a path or a binary file object (e.g. a Streamlit upload). Rows are
+    parsed lazily and at most one deck part is built at a time; duplicates are
+    tracked by hash, so memory still grows by one int per distinct card.
+    """
+    filename = filename or (source if isinstance(source, str) else getattr(source, "name", "import.csv"))
+    fmt = fmt or detect_format(filename)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format: {fmt!r} (choose from {', '.join(FORMATS)})")
+    name = (name or "").strip() or os.path.splitext(os.path.basename(filename))[0] or "Imported"
+
+    started = time.time()
+    stats = ImportStats()
+    stream = open(source, "rb") if isinstance(source, str) else source
+    try:
+        if fmt == "apkg":
+            with tempfile.TemporaryDirectory() as workdir:
+                conn = open_apkg(stream, workdir)
+                try:
+                    stats.total = int(conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0])
+                    rows = iter_apkg_rows(conn)
+                    upsert_decks(memory_dir, _deck_stream(rows, stats, name, topic, difficulty, lambda: stats.rows, progress))
+                finally:
+                    conn.close()
+        else:
+            here = stream.tell() if stream.seekable() else 0
+            if stream.seekable():
+                stats.total = stream.seek(0, io.SEEK_END) - here
+                stream.seek(here)
+            rows = iter_delimited_rows(stream, "\t" if fmt == "tsv" else None)
+            upsert_decks(memory_dir, _deck_stream(rows, stats, name, topic, difficulty, lambda: stream.tell() - here, progress))
+    finally:
+        if isinstance(source, str):
+            stream.close()
+
+    stats.position = stats.total
+    stats.seconds = time.time() - started
+    if progress is not None:
+        progress(stats)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import flashcards from CSV/TSV or an Anki .apkg export.")
+    parser.add_argument("path")
+    parser.add_argument("--memory-dir", default="memory")
+    parser.add_argument("--name", default=None, help="Deck name for rows without one (default: file name)")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--difficulty", default="Intermediate")
+    args = parser.parse_args()
+
+    def report(s: ImportStats) -> None:
+        print(f"\r{s.fraction:6.1%}  {s.rows} rows • {s.cards} cards • {s.duplicates} duplicates", end="", flush=True)
+
+    stats = import_file(
+        args.memory_dir, args.path, fmt=args.format, name=args.name, difficulty=args.difficulty, progress=report
+    )
+    print(f"\nImported {stats.cards} cards into {stats.decks} deck(s) in {stats.seconds:.1f}s "
+          f"({stats.duplicates} duplicates, {stats.skipped} empty rows skipped).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+# The only characters that change parser state; everything else is skipped in bulk.
+_TOKEN = re.compile(r'[{}\[\]"\\]')
+_DECODER = json.JSONDecoder()
+# Where an object can start: "{" then a key or "}". Skips prose braces like
+# "{this}" without a (costly) failed decode each.
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+class CardStreamParser:
+    """Resumable parser for a JSON document that arrives in pieces.
+
+    feed() takes the next chunk of model output and returns every object that
+    was completed inside an array, e.g. each {"q": ..., "a": ...} of
+    {"cards": [...]}, as soon as its closing brace arrives. Only the text of
+    the object currently being read is buffered.
+    """
+
+    def __init__(self) -> None:
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False  # previous chunk ended on a backslash inside a string
+        self._capture_depth: Optional[int] = None
+        self._pending: List[str] = []
+
+    def feed(self, text: str) -> List[Any]:
+        out: List[Any] = []
+        start = 0 if self._capture_depth is not None else -1
+        skip_until = 0
+
+        if self._escape and text:
+            self._escape = False
+            skip_until = 1
+
+        for m in _TOKEN.finditer(text):
+            i = m.start()
+            if i < skip_until:
+                continue
+            ch = m.group()
+
+            if self._in_string:
+                if ch == "\\":
+                    if i + 1 < len(text):
+                        skip_until = i + 2
+                    else:
+                        self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                # Quotes in prose around the JSON are not strings we care about.
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                if ch == "{" and self._capture_depth is None and self._stack and self._stack[-1] == "[":
+                    self._capture_depth = len(self._stack)
+                    start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if self._capture_depth is not None and len(self._stack) == self._capture_depth:
+                    piece = "".join(self._pending) + text[start : i + 1]
+                    self._pending = []
+                    self._capture_depth = None
+                    start = -1
+                    try:
+                        out.append(json.loads(piece))
+                    except ValueError:
+                        pass
+
+        if self._capture_depth is not None and start >= 0:
+            self._pending.append(text[start:])
+        return out
+
+
+_WS = re.compile(r"[ \t\n\r]*")
+# Bounds on the recovery paths, so adversarial output stays linear.
+_MAX_RESYNCS = 8
+_MAX_SALVAGE_DEPTH = 8
+_MAX_SALVAGE_CUTS = 8
+
+
+def _truncated(err: json.JSONDecodeError, text: str) -> bool:
+    # The decoder ran out of text rather than hitting a bad character.
+    return err.pos >= len(text) or err.msg.startswith("Unterminated string")
+
+
+def _object_end(text: str, start: int) -> Optional[int]:
+    """End of the object at start (None if it never closes): one pass counting braces outside strings."""
+    depth = 0
+    in_string = False
+    skip_until = 0
+    for m in _TOKEN.finditer(text, start):
+        i = m.start()
+        if i < skip_until:
+            continue
+        ch = m.group()
+        if in_string:
+            if ch == "\\":
+                skip_until = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _salvage(text: str, pos: int) -> List[Dict[str, Any]]:
+    """Complete objects of the outermost array that was cut off, walking down from pos.
+
+    Every complete value is skipped or read with one C-speed raw_decode; only
+    the container that runs off the end is walked into.
+    """
+    for _ in range(_MAX_SALVAGE_DEPTH):
+        if text.startswith("[", pos):
+            # Usually the array closed off after one of its last few "}" decodes in one go.
+            cut = len(text)
+            for _ in range(_MAX_SALVAGE_CUTS):
+                cut = text.rfind("}", pos, cut)
+                if cut < 0:
+                    break
+                try:
+                    whole = json.loads(text[pos : cut + 1] + "]")
+                except (ValueError, RecursionError):
+                    continue
+                dicts = [item for item in whole if isinstance(item, dict)]
+                if dicts:
+                    return dicts
+                break
+            items: List[Dict[str, Any]] = []
+            pos = _WS.match(text, pos + 1).end()
+            while True:
+                try:
+                    item, after = _DECODER.raw_decode(text, pos)
+                except (ValueError, RecursionError):
+                    break  # pos is the element that was cut off
+                if isinstance(item, dict):
+                    items.append(item)
+                pos = _WS.match(text, after).end()
+                if not text.startswith(",", pos):
+                    return items
+                pos = _WS.match(text, pos + 1).end()
+            if items:
+                return items
+        elif text.startswith("{", pos):
+            pos = _WS.match(text, pos + 1).end()
+            while True:
+                try:
+                    key, after = _DECODER.raw_decode(text, pos)
+                except (ValueError, RecursionError):
+                    return []
+                pos = _WS.match(text, after).end()
+                if not isinstance(key, str) or not text.startswith(":", pos):
+                    return []
+                pos = _WS.match(text, pos + 1).end()
+                try:
+                    _, after = _DECODER.raw_decode(text, pos)
+                except (ValueError, RecursionError):
+                    break  # this member's value was cut off
+                pos = _WS.match(text, after).end()
+                if not text.startswith(",", pos):
+                    return []
+                pos = _WS.match(text, pos + 1).end()
+        else:
+            return []
+    return []
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """The JSON object in model output, tolerating prose, code fences and truncation.
+
+    Tries the whole text, then each top-level "{" in turn: one C-speed
+    raw_decode per object, and a complete object is skipped as a whole. A
+    failed decode (a quote or brace in the prose) looks again from the next
+    "{", a bounded number of times; after that, failing objects are scanned
+    (braces and string state) and skipped as a whole. The first
+    (outermost) object with a "cards" key wins, else the first object. If
+    the output was cut off mid-array, the complete elements seen so far are
+    salvaged as {"cards": [...]} rather than returning one of the inner
+    objects. Linear in the length of the text, whatever it contains.
+    """
+    text = (text or "").strip()
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError as e:
+        if text.startswith("{") and _truncated(e, text):
+            # The usual cut-off reply: no need to decode it a second time to find that out.
+            salvaged = _salvage(text, 0)
+            if salvaged:
+                return {"cards": salvaged}
+    except RecursionError:
+        pass
+
+    fallback: Optional[Dict[str, Any]] = None
+    resyncs = 0
+    # Once the resyncs are used up, scan each candidate first and decode just
+    # its own span: a failing raw_decode on the full text costs O(position).
+    scan = False
+    pos = text.find("{")
+    while pos >= 0:
+        if not _OBJECT_START.match(text, pos):
+            pos = text.find("{", pos + 1)  # "{this}" in prose: can't be an object
+            continue
+        end = _object_end(text, pos) if scan else None
+        truncated = False
+        try:
+            if end is None:
+                data, stop = _DECODER.raw_decode(text, pos)
+            else:
+                data, stop = _DECODER.raw_decode(text[pos:end])
+                stop += pos
+        except json.JSONDecodeError as e:
+            truncated = end is None and _truncated(e, text)
+        except RecursionError:
+            pass  # nested far deeper than any deck
+        else:
+            if isinstance(data, dict):
+                if "cards" in data:
+                    return data
+                if fallback is None:
+                    fallback = data
+            # Nothing inside a complete object can be more outer than it.
+            pos = text.find("{", stop)
+            continue
+
+        if truncated:
+            salvaged = _salvage(text, pos)
+            if salvaged:
+                return {"cards": salvaged}
+        if resyncs < _MAX_RESYNCS:
+            # Probably prose that happens to start like an object: the real one
+            # may begin inside it.
+            resyncs += 1
+            pos = text.find("{", pos + 1)
+        else:
+            scan = True
+            end = end or _object_end(text, pos)
+            pos = text.find("{", end) if end is not None else -1
+
+    if fallback is not None:
+        return fallback
+    raise ValueError("No JSON object found in model output.")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Any, Dict, List, Tuple
+
+
+# Everything identical across requests lives in the system message, so the
+# provider can serve it from its prompt-prefix cache; the user message only
+# carries what changes per call (topic, difficulty, count, chunk note).
+SYSTEM_STYLE = """You are a friendly, focused flashcard generator.
+Rules:
+- Keep questions short and specific.
+- Keep answers short and correct.
+- Avoid fluff.
+- Use simple language if the user is a beginner.
+- Make exactly the number of cards asked for, all about the given topic.
+- When a request says it is one part of a bigger deck, cover a different angle than the other parts.
+Return valid JSON only, in this schema:
+{"cards":[{"q":"...","a":"..."}]}
+"""
+
+REQUEST_TEMPLATE = """Topic: {topic}
+Difficulty: {difficulty}
+Number of cards: {n}
+{part}"""
+
+# Part of every response-cache key, so editing either half of the prompt invalidates old entries.
+PROMPT_HASH = hashlib.sha256((SYSTEM_STYLE + REQUEST_TEMPLATE).encode("utf-8")).hexdigest()[:16]
+
+
+def card_messages(topic: str, difficulty: str, n: int, part: str = "") -> List[Tuple[str, str]]:
+    request = REQUEST_TEMPLATE.format(topic=topic, difficulty=difficulty, n=n, part=part).strip()
+    return [("system", SYSTEM_STYLE), ("user", request)]
+
+
+def usage_tokens(message: Any) -> Tuple[int, int]:
+    """(prompt tokens, cached prompt tokens) reported on a response or final stream chunk."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return int(usage.get("input_tokens") or 0), int(details.get("cache_read") or 0)
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return int(token_usage.get("prompt_tokens") or 0), int(details.get("cached_tokens") or 0)
+
+
+class PromptCacheStats:
+    """Process-wide counters of cached vs uncached prompt tokens and call latency."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.latency_s = 0.0
+        self.cached_call_latency_s = 0.0
+        self.cached_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, message: Any, latency_s: float) -> None:
+        prompt, cached = usage_tokens(message)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.cached_tokens += cached
+            self.latency_s += latency_s
+            if cached:
+                self.cached_calls += 1
+                self.cached_call_latency_s += latency_s
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uncached_calls = self.calls - self.cached_calls
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": (self.cached_tokens / self.prompt_tokens) if self.prompt_tokens else 0.0,
+                "avg_latency_cached_s": (self.cached_call_latency_s / self.cached_calls) if self.cached_calls else 0.0,
+                "avg_latency_uncached_s": (
+                    (self.latency_s - self.cached_call_latency_s) / uncached_calls if uncached_calls else 0.0
+                ),
+            }
+
+
+PROMPT_STATS = PromptCacheStats()
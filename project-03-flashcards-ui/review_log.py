@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from locks import FileLock
+
+
+# Every answer in Study mode is one fixed-size record in memory/reviews.bin
+# (raw little-endian rows, read back through a memmap). Deck ids are interned:
+# reviews.decks lists them one per line and a record stores the line number.
+REVIEWS_FILE = "reviews.bin"
+REVIEW_DECKS_FILE = "reviews.decks"
+REVIEWS_LOCK_FILE = "reviews.lock"
+REVIEW_DTYPE = np.dtype([("ts", "<f8"), ("deck", "<u4"), ("card", "<u4"), ("grade", "u1"), ("ms", "<u4")])
+
+DAY_S = 24 * 3600
+RECALLED_MIN_GRADE = 3  # SM-2: below 3 is a lapse
+HEATMAP_WEEKS = 12
+# Retention curve: recall rate by days since the card's previous review.
+RETENTION_BINS = (1, 2, 4, 8, 15, 31, 61)
+RETENTION_LABELS = ("<1d", "1d", "2-3d", "4-7d", "1-2w", "2-4w", "1-2mo", "2mo+")
+
+
+def _day(ts: Any, offset_s: float) -> Any:
+    # Local calendar day number (days since 1970-01-01), using today's UTC offset.
+    return np.floor((np.asarray(ts, dtype=np.float64) + offset_s) / DAY_S).astype(np.int64)
+
+
+def _utc_offset(now: float) -> float:
+    return float(time.localtime(now).tm_gmtoff)
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+@dataclass
+class ReviewSummary:
+    reviews: int = 0
+    reviews_today: int = 0
+    streak_days: int = 0
+    last_study_date: Optional[date] = None
+    recall_rate: float = 0.0
+    median_response_ms: float = 0.0
+    # deck id -> (reviews, recall rate)
+    decks: Dict[str, Tuple[int, float]] = field(default_factory=dict)
+    # (label, reviews, recall rate) per RETENTION_LABELS bucket, repeat reviews only
+    retention: List[Tuple[str, int, float]] = field(default_factory=list)
+    # 7 x HEATMAP_WEEKS review counts: rows Monday..Sunday, last column is this week
+    heatmap: Any = None
+    heatmap_start: Optional[date] = None
+
+
+def summarize(events: np.ndarray, deck_ids: List[str], now: float, carry: Tuple[int, Optional[str]] = (0, None)) -> ReviewSummary:
+    """Aggregate review records (REVIEW_DTYPE) in a handful of vectorized passes.
+
+    carry is a streak kept before reviews were logged (streak_days, ISO date of
+    its last day); it extends the logged streak when the two meet.
+    """
+    offset = _utc_offset(now)
+    today = int(_day(now, offset))
+    out = ReviewSummary(heatmap=np.zeros((7, HEATMAP_WEEKS), dtype=np.int64))
+    out.heatmap_start = date.fromordinal(date(1970, 1, 1).toordinal() + today - (today + 3) % 7 - (HEATMAP_WEEKS - 1) * 7)
+
+    carry_days, carry_last = carry
+    carry_day: Optional[int] = None
+    if carry_days and carry_last:
+        try:
+            carry_day = (date.fromisoformat(str(carry_last)) - date(1970, 1, 1)).days
+        except ValueError:
+            carry_day = None
+
+    n = len(events)
+    if n:
+        ts = events["ts"]
+        day = _day(ts, offset)
+        recalled = events["grade"] >= RECALLED_MIN_GRADE
+        out.reviews = n
+        out.reviews_today = int(np.count_nonzero(day == today))
+        out.recall_rate = float(recalled.mean())
+        out.median_response_ms = float(np.median(events["ms"]))
+
+        # Streak: the run of consecutive study days ending today (or yesterday).
+        days = np.unique(day)
+        if carry_day is not None and carry_day > days[0]:
+            carry_day = None  # stale: the log already covers that day
+        if carry_day is not None and carry_day < days[0]:
+            days = np.concatenate(([carry_day], days))
+        out.last_study_date = date(1970, 1, 1) + timedelta(days=int(days[-1]))
+        if days[-1] >= today - 1:
+            breaks = np.flatnonzero(np.diff(days) != 1)
+            start = int(days[breaks[-1] + 1]) if breaks.size else int(days[0])
+            out.streak_days = int(days[-1]) - start + 1
+            if carry_day is not None and start == carry_day:
+                out.streak_days += carry_days - 1
+
+        # Per-deck recall.
+        deck = events["deck"].astype(np.int64)
+        totals = np.bincount(deck, minlength=len(deck_ids))
+        hits = np.bincount(deck, weights=recalled, minlength=len(deck_ids))
+        for i in np.flatnonzero(totals):
+            if i < len(deck_ids):
+                out.decks[deck_ids[i]] = (int(totals[i]), float(hits[i] / totals[i]))
+
+        # Retention: group by card, pair each review with the card's previous one.
+        # Records are in append (= time) order, so a stable sort on the card key
+        # keeps each card's reviews in time order (and is ~2x faster than lexsort).
+        card_key = (deck << 32) | events["card"].astype(np.int64)
+        order = np.argsort(card_key, kind="stable")
+        k, t, r = card_key[order], ts[order], recalled[order]
+        repeat = k[1:] == k[:-1]
+        gap_days = (t[1:] - t[:-1])[repeat] / DAY_S
+        bucket = np.digitize(gap_days, RETENTION_BINS)
+        b_totals = np.bincount(bucket, minlength=len(RETENTION_LABELS))
+        b_hits = np.bincount(bucket, weights=r[1:][repeat], minlength=len(RETENTION_LABELS))
+        out.retention = [
+            (label, int(b_totals[i]), float(b_hits[i] / b_totals[i]) if b_totals[i] else 0.0)
+            for i, label in enumerate(RETENTION_LABELS)
+        ]
+
+        # Heatmap: reviews per day over the last HEATMAP_WEEKS calendar weeks.
+        start = (out.heatmap_start - date(1970, 1, 1)).days
+        cell = day - start
+        cell = cell[(cell >= 0) & (cell < HEATMAP_WEEKS * 7)]
+        out.heatmap = np.bincount(cell, minlength=HEATMAP_WEEKS * 7).reshape(HEATMAP_WEEKS, 7).T
+    elif carry_day is not None and carry_day >= today - 1:
+        out.streak_days = carry_days
+        out.last_study_date = date(1970, 1, 1) + timedelta(days=carry_day)
+
+    return out
+
+
+class ReviewLog:
+    """Append-only columnar log of study answers, with cached summaries.
+
+    A summary is recomputed only after new events have been appended (or the
+    day changes); every other rerun gets the cached one.
+
+    Other processes may append to the same files: appends hold the file lock
+    reviews.lock, reads only ever look at complete records and deck lines.
+    A torn tail left by a crash is cut off by the next append, not by a read.
+    """
+
+    def __init__(self, memory_dir: str) -> None:
+        os.makedirs(memory_dir, exist_ok=True)
+        self.path = os.path.join(memory_dir, REVIEWS_FILE)
+        self.decks_path = os.path.join(memory_dir, REVIEW_DECKS_FILE)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(Path(memory_dir) / REVIEWS_LOCK_FILE)
+        self._deck_ids: List[str] = []
+        self._deck_index: Dict[str, int] = {}
+        self._decks_size = 0  # bytes of reviews.decks read so far (whole lines only)
+        self._events: Optional[np.ndarray] = None
+        self._summary: Optional[ReviewSummary] = None
+        self._summary_key: Any = None
+        self.count = 0
+        self._load()
+
+    def _load(self) -> None:
+        # Read-only: picks up deck lines and records written since the last call.
+        if _size(self.decks_path) > self._decks_size:
+            with open(self.decks_path, "rb") as f:
+                f.seek(self._decks_size)
+                raw = f.read()
+            end = raw.rfind(b"\n") + 1  # a last line without its newline isn't complete yet
+            for deck_id in raw[:end].decode("utf-8").split("\n")[:-1]:
+                self._deck_index.setdefault(deck_id, len(self._deck_ids))
+                self._deck_ids.append(deck_id)
+            self._decks_size += end
+        self.count = _size(self.path) // REVIEW_DTYPE.itemsize
+
+    def _repair(self) -> None:
+        # Under the file lock: cut off torn tails so new data starts on a boundary.
+        self._load()
+        for path, keep in ((self.decks_path, self._decks_size), (self.path, self.count * REVIEW_DTYPE.itemsize)):
+            if _size(path) > keep:
+                with open(path, "r+b") as f:
+                    f.truncate(keep)
+
+    def _deck_no(self, deck_id: str) -> int:
+        no = self._deck_index.get(deck_id)
+        if no is None:
+            line = (deck_id.replace("\n", " ") + "\n").encode("utf-8")
+            with open(self.decks_path, "ab") as f:
+                f.write(line)
+            self._decks_size += len(line)
+            no = self._deck_index[deck_id] = len(self._deck_ids)
+            self._deck_ids.append(deck_id)
+        return no
+
+    def append(self, deck_id: str, card: int, grade: int, response_ms: float = 0.0, ts: Optional[float] = None) -> None:
+        with self._lock, self._file_lock:
+            self._repair()
+            rec = np.zeros(1, dtype=REVIEW_DTYPE)
+            rec["ts"] = time.time() if ts is None else ts
+            rec["deck"] = self._deck_no(deck_id)
+            rec["card"] = max(0, int(card))
+            rec["grade"] = min(max(int(grade), 0), 255)
+            rec["ms"] = min(max(int(response_ms), 0), 2**32 - 1)
+            with open(self.path, "ab") as f:
+                f.write(rec.tobytes())
+            self.count += 1
+            self._events = None
+
+    def events(self) -> np.ndarray:
+        """All records as a read-only structured array (memory-mapped)."""
+        with self._lock:
+            self._load()
+            return self._read()
+
+    def _read(self) -> np.ndarray:
+        if self._events is None or len(self._events) != self.count:
+            if self.count:
+                self._events = np.memmap(self.path, dtype=REVIEW_DTYPE, mode="r", shape=(self.count,))
+            else:
+                self._events = np.zeros(0, dtype=REVIEW_DTYPE)
+        return self._events
+
+    def summary(self, now: Optional[float] = None, carry: Tuple[int, Optional[str]] = (0, None)) -> ReviewSummary:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()  # two stat calls when nothing changed
+            key = (self.count, int(_day(now, _utc_offset(now))), tuple(carry))
+            if self._summary is None or key != self._summary_key:
+                self._summary = summarize(self._read(), list(self._deck_ids), now, carry)
+                self._summary_key = key
+            return self._summary
+
+
+_LOGS: Dict[str, ReviewLog] = {}
+_LOGS_LOCK = threading.Lock()
+
+
+def get_review_log(memory_dir: str) -> ReviewLog:
+    """Process-wide (cached) review log for memory_dir, shared by every Streamlit session."""
+    key = os.path.abspath(memory_dir)
+    with _LOGS_LOCK:
+        log = _LOGS.get(key)
+        if log is None:
+            log = _LOGS[key] = ReviewLog(memory_dir)
+        return log
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from locks import FileLock
+
+
+# Review state lives beside decks.json:
+#   schedule.jsonl  append-only, one line per review: {"d": deck id, "i": card index, ...}
+#                   or {"d": deck id, "del": true} when a deck is deleted
+# The last line for a card wins. Once the log holds more than twice as many
+# lines as there are reviewed cards it is rewritten with one line per card.
+SCHEDULE_FILE = "schedule.jsonl"
+SCHEDULE_LOCK_FILE = "schedule.lock"
+COMPACT_MIN_LINES = 256
+
+DAY_S = 24 * 3600
+RELEARN_S = 10 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# Study buttons -> SM-2 answer quality (0-5, below 3 is a lapse).
+GRADES = {"again": 1, "hard": 3, "good": 4, "easy": 5}
+
+CardKey = Tuple[str, int]
+
+
+@dataclass(slots=True)
+class CardState:
+    ease: float = DEFAULT_EASE
+    interval_days: float = 0.0
+    reps: int = 0
+    lapses: int = 0
+    due: float = 0.0
+    reviewed_at: float = 0.0
+
+
+def sm2(state: CardState, quality: int, now: float) -> CardState:
+    """Next state after answering with quality 0-5 (SuperMemo-2)."""
+    quality = min(max(int(quality), 0), 5)
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        # Lapse: start over, and see the card again in a few minutes.
+        return CardState(ease, 0.0, 0, state.lapses + 1, now + RELEARN_S, now)
+
+    reps = state.reps + 1
+    if reps == 1:
+        interval = 1.0
+    elif reps == 2:
+        interval = 6.0
+    else:
+        interval = round(state.interval_days * ease, 2)
+    return CardState(ease, interval, reps, state.lapses, now + interval * DAY_S, now)
+
+
+def _to_line(key: CardKey, s: CardState) -> str:
+    return json.dumps(
+        {"d": key[0], "i": key[1], "e": round(s.ease, 4), "n": s.interval_days, "r": s.reps,
+         "l": s.lapses, "due": round(s.due, 3), "t": round(s.reviewed_at, 3)},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+class Scheduler:
+    """SM-2 review state for every card, plus heap due-queues over it.
+
+    There is one min-heap of (due, index) per deck and one of (due, deck, index)
+    across all decks. A review pushes the card's new due time instead of moving
+    the old entry; entries whose due no longer matches the card's state are
+    dropped when they reach the top. So the next due card is a peek, and a
+    review is one O(log n) push, whatever the number of cards.
+
+    Cards never reviewed have no state: next_card() hands them out in deck
+    order once nothing reviewed is due.
+
+    Other processes may share schedule.jsonl: writes hold schedule.lock and
+    first read what others appended, every call picks up new lines, and a
+    rewritten (compacted) file is reloaded. A torn tail is cut by the next
+    append, never by a read.
+    """
+
+    def __init__(self, memory_dir: str) -> None:
+        os.makedirs(memory_dir, exist_ok=True)
+        self.path = os.path.join(memory_dir, SCHEDULE_FILE)
+        self._states: Dict[CardKey, CardState] = {}
+        self._per_deck: Dict[str, int] = {}
+        self._heaps: Dict[str, List[Tuple[float, int]]] = {}
+        self._global: List[Tuple[float, str, int]] = []
+        self._new_ptr: Dict[str, int] = {}
+        self._lines = 0
+        self._size = 0  # bytes of schedule.jsonl read so far (whole lines only)
+        self._ino: Optional[int] = None
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(Path(memory_dir) / SCHEDULE_LOCK_FILE)
+        self._refresh()
+
+    # ----- persistence -----
+
+    def _refresh(self) -> None:
+        # Read-only: applies lines appended since the last call, reloads a replaced file.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._ino or st.st_size < self._size:
+            self._states, self._per_deck, self._new_ptr = {}, {}, {}
+            self._lines = self._size = 0
+            self._ino = st.st_ino
+            reload = True
+        elif st.st_size > self._size:
+            reload = False
+        else:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._size)
+            raw = f.read()
+        end = raw.rfind(b"\n") + 1  # a last line without its newline isn't complete yet
+        for line in raw[:end].split(b"\n")[:-1]:
+            self._apply(line, push=not reload)
+        self._size += end
+        if reload:
+            self._rebuild_heaps()
+
+    def _apply(self, line: bytes, push: bool) -> None:
+        try:
+            rec = json.loads(line)
+            deck_id = str(rec["d"])
+            if rec.get("del"):
+                self._drop_deck(deck_id)
+            else:
+                key = (deck_id, int(rec["i"]))
+                state = CardState(
+                    float(rec["e"]), float(rec["n"]), int(rec["r"]),
+                    int(rec["l"]), float(rec["due"]), float(rec["t"]),
+                )
+                if key not in self._states:
+                    self._per_deck[deck_id] = self._per_deck.get(deck_id, 0) + 1
+                self._states[key] = state
+                if push:
+                    heapq.heappush(self._heaps.setdefault(deck_id, []), (state.due, key[1]))
+                    heapq.heappush(self._global, (state.due, deck_id, key[1]))
+        except Exception:
+            # A hand-edited or otherwise bad line: skip it.
+            return
+        self._lines += 1
+
+    def _rebuild_heaps(self) -> None:
+        # O(n) heapify; also how stale entries that never reach the top get dropped.
+        self._heaps = {}
+        self._global = []
+        for (deck_id, idx), s in self._states.items():
+            self._heaps.setdefault(deck_id, []).append((s.due, idx))
+            self._global.append((s.due, deck_id, idx))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        heapq.heapify(self._global)
+
+    def _append(self, line: str) -> None:
+        # Callers hold the file lock and have just refreshed, so _size is the end
+        # of the last whole line and anything past it is a torn write.
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self._size:
+            with open(self.path, "r+b") as f:
+                f.truncate(self._size)
+        data = (line + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+        if self._ino is None:
+            self._ino = os.stat(self.path).st_ino
+        self._size += len(data)
+        self._lines += 1
+        if self._lines > max(COMPACT_MIN_LINES, 2 * len(self._states)):
+            self._compact()
+
+    def _compact(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=SCHEDULE_FILE + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for key, s in self._states.items():
+                    f.write((_to_line(key, s) + "\n").encode("utf-8"))
+                size = f.tell()
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self._ino = os.stat(self.path).st_ino
+        self._size = size
+        self._lines = len(self._states)
+
+    def _drop_deck(self, deck_id: str) -> None:
+        for key in [k for k in self._states if k[0] == deck_id]:
+            del self._states[key]
+        self._per_deck.pop(deck_id, None)
+        self._heaps.pop(deck_id, None)
+        self._new_ptr.pop(deck_id, None)
+        self._global = [e for e in self._global if e[1] != deck_id]
+        heapq.heapify(self._global)
+
+    # ----- queue -----
+
+    def _live(self, deck_id: str, idx: int, due: float) -> bool:
+        s = self._states.get((deck_id, idx))
+        return s is not None and s.due == due
+
+    def _top(self, deck_id: str, card_count: int) -> Optional[Tuple[float, int]]:
+        heap = self._heaps.get(deck_id)
+        while heap:
+            due, idx = heap[0]
+            if idx < card_count and self._live(deck_id, idx, due):
+                return due, idx
+            heapq.heappop(heap)
+        return None
+
+    def _next_new(self, deck_id: str, card_count: int) -> Optional[int]:
+        ptr = self._new_ptr.get(deck_id, 0)
+        while ptr < card_count and (deck_id, ptr) in self._states:
+            ptr += 1
+        self._new_ptr[deck_id] = ptr
+        return ptr if ptr < card_count else None
+
+    def next_card(self, deck_id: str, card_count: int, now: Optional[float] = None) -> Optional[int]:
+        """Index of the card to study next in a deck: the most overdue one, else the
+        first new one. None when everything has been seen and nothing is due yet."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._refresh()
+            top = self._top(deck_id, card_count)
+            if top is not None and top[0] <= now:
+                return top[1]
+            return self._next_new(deck_id, card_count)
+
+    def next_due(
+        self, now: Optional[float] = None, card_count: Optional[Callable[[str], Optional[int]]] = None
+    ) -> Optional[CardKey]:
+        """(deck id, card index) of the most overdue card across all decks, if any is due.
+
+        card_count(deck id) gives a deck's current size, or None once the deck is
+        gone: entries past the end of their deck are skipped, a gone deck is forgotten.
+        """
+        now = time.time() if now is None else now
+        sizes: Dict[str, Optional[int]] = {}
+        with self._lock:
+            self._refresh()
+            while self._global:
+                due, deck_id, idx = self._global[0]
+                if self._live(deck_id, idx, due):
+                    if due > now:
+                        return None
+                    if card_count is None:
+                        return deck_id, idx
+                    if deck_id not in sizes:
+                        sizes[deck_id] = card_count(deck_id)
+                    if sizes[deck_id] is None:
+                        self._forget(deck_id)
+                        continue
+                    if idx < sizes[deck_id]:
+                        return deck_id, idx
+                heapq.heappop(self._global)
+            return None
+
+    def next_due_at(self, deck_id: str, card_count: int) -> Optional[float]:
+        """When the next reviewed card of the deck comes due."""
+        with self._lock:
+            self._refresh()
+            top = self._top(deck_id, card_count)
+            return top[0] if top else None
+
+    def review(self, deck_id: str, idx: int, quality: int, now: Optional[float] = None) -> CardState:
+        """Record an answer (see GRADES) and reschedule the card."""
+        now = time.time() if now is None else now
+        key = (deck_id, int(idx))
+        with self._lock, self._file_lock:
+            self._refresh()
+            old = self._states.get(key)
+            new = sm2(old or CardState(), quality, now)
+            if old is None:
+                self._per_deck[deck_id] = self._per_deck.get(deck_id, 0) + 1
+            self._states[key] = new
+            heapq.heappush(self._heaps.setdefault(deck_id, []), (new.due, key[1]))
+            heapq.heappush(self._global, (new.due, deck_id, key[1]))
+            if len(self._global) > 2 * len(self._states) + COMPACT_MIN_LINES:
+                self._rebuild_heaps()
+            self._append(_to_line(key, new))
+            return new
+
+    def forget_deck(self, deck_id: str) -> None:
+        with self._lock:
+            self._forget(deck_id)
+
+    def _forget(self, deck_id: str) -> None:
+        with self._file_lock:
+            self._refresh()
+            if deck_id not in self._per_deck:
+                return
+            self._drop_deck(deck_id)
+            self._append(json.dumps({"d": deck_id, "del": True}, separators=(",", ":")))
+
+    # ----- progress -----
+
+    def state(self, deck_id: str, idx: int) -> Optional[CardState]:
+        with self._lock:
+            self._refresh()
+            return self._states.get((deck_id, int(idx)))
+
+    def counts(self, deck_id: str, card_count: int, now: Optional[float] = None) -> Dict[str, int]:
+        """{"due", "new", "seen"} for a deck. Walks only the due part of the heap."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._refresh()
+            heap = self._heaps.get(deck_id, [])
+            due = 0
+            stack = [0] if heap else []
+            while stack:
+                i = stack.pop()
+                d, idx = heap[i]
+                if d > now:
+                    continue  # children are due even later
+                if idx < card_count and self._live(deck_id, idx, d):
+                    due += 1
+                stack.extend(c for c in (2 * i + 1, 2 * i + 2) if c < len(heap))
+            seen = min(self._per_deck.get(deck_id, 0), card_count)
+            return {"due": due, "new": card_count - seen, "seen": seen}
+
+
+_SCHEDULERS: Dict[str, Scheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(memory_dir: str) -> Scheduler:
+    """Process-wide (cached) scheduler for memory_dir, shared by every Streamlit session."""
+    key = os.path.abspath(memory_dir)
+    with _SCHEDULERS_LOCK:
+        sched = _SCHEDULERS.get(key)
+        if sched is None:
+            sched = _SCHEDULERS[key] = Scheduler(memory_dir)
+        return sched
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cards import Card, pack_cards
+from storage import Deck, DeckSummary, JsonBackend, StorageBackend, clean_card, iter_batches
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    topic       TEXT NOT NULL,
+    difficulty  TEXT NOT NULL,
+    card_count  INTEGER NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decks_created_at ON decks(created_at);
+CREATE INDEX IF NOT EXISTS idx_decks_topic ON decks(topic);
+
+CREATE TABLE IF NOT EXISTS cards (
+    deck_id   TEXT NOT NULL REFERENCES decks(id) ON DELETE CASCADE,
+    position  INTEGER NOT NULL,
+    q         TEXT NOT NULL,
+    a         TEXT NOT NULL,
+    PRIMARY KEY (deck_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS stats (
+    key    TEXT PRIMARY KEY,
+    value  TEXT NOT NULL
+);
+"""
+
+DEFAULT_STATS: Dict[str, Any] = {"streak_days": 0, "last_study_date": None}
+
+
+def _db_path(memory_dir: str) -> str:
+    os.makedirs(memory_dir, exist_ok=True)
+    return os.path.join(memory_dir, "flashcards.db")
+
+
+class SqliteBackend(StorageBackend):
+    """Decks, cards and stats in memory/flashcards.db (WAL mode)."""
+
+    def __init__(self, memory_dir: str, db_path: Optional[str] = None) -> None:
+        self.memory_dir = memory_dir
+        self.db_path = db_path or _db_path(memory_dir)
+        # Streamlit serves sessions from several threads; one connection + a lock
+        # keeps writes serialized while WAL lets other processes keep reading.
+        self.lock = threading.RLock()
+        self._writes = 0
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                # Also on KeyboardInterrupt / GeneratorExit, or the connection stays mid-transaction.
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            self._writes += 1
+
+    # -- decks -------------------------------------------------------------
+
+    def _write_deck(self, deck: Deck) -> None:
+        # Same rule as the JSON backend applies on read, so both report the same cards and counts.
+        cards = [card for card in (clean_card(c.q, c.a) for c in deck.cards) if card]
+        self.conn.execute(
+            """
+            INSERT INTO decks (id, name, topic, difficulty, card_count, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name,
+                topic = excluded.topic,
+                difficulty = excluded.difficulty,
+                card_count = excluded.card_count,
+                created_at = excluded.created_at
+            """,
+            (deck.id, deck.name, deck.topic, deck.difficulty, len(cards), deck.created_at),
+        )
+        self.conn.execute("DELETE FROM cards WHERE deck_id = ?", (deck.id,))
+        self.conn.executemany(
+            "INSERT INTO cards (deck_id, position, q, a) VALUES (?, ?, ?, ?)",
+            ((deck.id, i, q, a) for i, (q, a) in enumerate(cards)),
+        )
+
+    def load_decks(self) -> Dict[str, Deck]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, name, topic, difficulty, created_at FROM decks ORDER BY created_at"
+            ).fetchall()
+            decks: Dict[str, Deck] = {
+                r[0]: Deck(id=r[0], name=r[1], topic=r[2], difficulty=r[3], cards=[], created_at=r[4])
+                for r in rows
+            }
+            for deck_id, q, a in self.conn.execute("SELECT deck_id, q, a FROM cards ORDER BY deck_id, position"):
+                deck = decks.get(deck_id)
+                if deck is not None:
+                    deck.cards.append(Card(q, a))
+        for deck in decks.values():
+            deck.cards = pack_cards(deck.cards)
+        return decks
+
+    def load_deck(self, deck_id: str) -> Optional[Deck]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, name, topic, difficulty, created_at FROM decks WHERE id = ?", (deck_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            cards = [
+                Card(q, a)
+                for q, a in self.conn.execute(
+                    "SELECT q, a FROM cards WHERE deck_id = ? ORDER BY position", (deck_id,)
+                )
+            ]
+        return Deck(id=row[0], name=row[1], topic=row[2], difficulty=row[3], cards=pack_cards(cards), created_at=row[4])
+
+    def save_decks(self, decks: Dict[str, Deck]) -> None:
+        with self.transaction():
+            self.conn.execute("DELETE FROM decks")
+            for deck in decks.values():
+                self._write_deck(deck)
+
+    def upsert_deck(self, deck: Deck) -> None:
+        with self.transaction():
+            self._write_deck(deck)
+
+    def upsert_decks(self, decks: Iterable[Deck]) -> int:
+        # One short transaction per batch: the write lock isn't held while the
+        # stream is being produced, so other connections can write in between.
+        n = 0
+        for batch in iter_batches(decks):
+            with self.transaction():
+                for deck in batch:
+                    self._write_deck(deck)
+            n += len(batch)
+        return n
+
+    def delete_deck(self, deck_id: str) -> bool:
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
+            self._writes += 1
+            return cur.rowcount > 0
+
+    def count_decks(self) -> int:
+        with self.lock:
+            return int(self.conn.execute("SELECT COUNT(*) FROM decks").fetchone()[0])
+
+    def page_decks(self, offset: int = 0, limit: Optional[int] = None) -> List[DeckSummary]:
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT id, name, topic, difficulty, card_count, created_at
+                FROM decks
+                ORDER BY created_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (-1 if limit is None else int(limit), int(offset)),
+            ).fetchall()
+        return [DeckSummary(*r) for r in rows]
+
+    # -- stats -------------------------------------------------------------
+
+    def load_stats(self) -> Dict[str, Any]:
+        stats = dict(DEFAULT_STATS)
+        with self.lock:
+            for key, value in self.conn.execute("SELECT key, value FROM stats"):
+                try:
+                    stats[key] = json.loads(value)
+                except Exception:
+                    continue
+        return stats
+
+    def save_stats(self, stats: Dict[str, Any]) -> None:
+        with self.transaction():
+            self.conn.execute("DELETE FROM stats")
+            self.conn.executemany(
+                "INSERT INTO stats (key, value) VALUES (?, ?)",
+                ((str(k), json.dumps(v, ensure_ascii=False)) for k, v in stats.items()),
+            )
+
+    def compact(self) -> None:
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def deck_version(self) -> Any:
+        # data_version moves when another connection commits; _writes covers our own.
+        with self.lock:
+            return (self.conn.execute("PRAGMA data_version").fetchone()[0], self._writes)
+
+    def stats_version(self) -> Any:
+        return self.deck_version()
+
+
+def migrate_from_json(memory_dir: str, db_path: Optional[str] = None) -> Tuple[int, int]:
+    """Import decks.json (+ decks.log) and stats.json into the SQLite database.
+
+    Existing decks with the same id are overwritten; returns (decks, cards) imported.
+    """
+    source = JsonBackend(memory_dir)
+    target = SqliteBackend(memory_dir, db_path)
+    try:
+        decks = source.load_decks()
+        with target.transaction():
+            for deck in decks.values():
+                target._write_deck(deck)
+
+        if os.path.exists(os.path.join(memory_dir, "stats.json")):
+            target.save_stats(source.load_stats())
+    finally:
+        target.close()
+
+    return len(decks), sum(len(d.cards) for d in decks.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import JSON decks/stats into the SQLite storage backend.")
+    parser.add_argument("--memory-dir", default="memory")
+    parser.add_argument("--db", default=None, help="Database path (default: <memory-dir>/flashcards.db)")
+    args = parser.parse_args()
+
+    n_decks, n_cards = migrate_from_json(args.memory_dir, args.db)
+    print(f"Imported {n_decks} decks ({n_cards} cards). Set FLASHCARDS_STORAGE=sqlite to use them.")
+
+
+if __name__ == "__main__":
+    main()
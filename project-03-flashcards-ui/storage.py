@@ -1,10 +1,42 @@
 from __future__ import annotations
 
+import itertools
 import json
+import logging
 import os
+import shutil
+import sys
+import tempfile
+import threading
 import time
-from dataclasses import asdict, dataclass
-from typing import Any, Dict, List
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cards import COLUMNAR_MIN_CARDS, Card, CardColumns, Cards, cards_to_raw
+from locks import FileLock
+
+log = logging.getLogger(__name__)
+
+
+# Decks are kept in two files inside memory_dir:
+#   decks.json  snapshot, one deck per line (still a plain JSON object)
+#   decks.log   append-only JSONL of {"op": "put"|"del", "id": ...} since the snapshot
+# A write appends one line to the log, so it costs O(deck size). Once the log
+# grows past the snapshot it is folded back in (compaction).
+COMPACT_MIN_OPS = 64
+
+# Parsed decks kept in memory per backend, counted in cards (LRU beyond that).
+CACHE_MAX_CARDS = 100_000
+CACHE_MAX_PAGES = 32
+
+# upsert_decks writes a stream in batches of this many decks, each one short write.
+UPSERT_BATCH_DECKS = 16
+
+_SNAPSHOT = 0
+_LOG = 1
 
 
 @dataclass
@@ -13,10 +45,26 @@ class Deck:
     name: str
     topic: str
     difficulty: str
-    cards: List[Dict[str, str]]  # [{"q": "...", "a": "..."}]
+    cards: Cards  # List[Card], or CardColumns for big decks
+    created_at: float
+
+
+@dataclass
+class DeckSummary:
+    id: str
+    name: str
+    topic: str
+    difficulty: str
+    card_count: int
     created_at: float
 
 
+class _Loc(NamedTuple):
+    source: int  # _SNAPSHOT or _LOG
+    offset: int
+    length: int
+
+
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
@@ -26,102 +74,1041 @@ def _decks_path(memory_dir: str) -> str:
     return os.path.join(memory_dir, "decks.json")
 
 
+def _decks_log_path(memory_dir: str) -> str:
+    _ensure_dir(memory_dir)
+    return os.path.join(memory_dir, "decks.log")
+
+
+def _decks_index_path(memory_dir: str) -> str:
+    _ensure_dir(memory_dir)
+    return os.path.join(memory_dir, "decks.index")
+
+
 def _stats_path(memory_dir: str) -> str:
     _ensure_dir(memory_dir)
     return os.path.join(memory_dir, "stats.json")
 
 
+def _temp_file(path: str) -> Tuple[Any, str]:
+    # A uniquely named sibling of path, so concurrent writers never share a temp file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    return os.fdopen(fd, "wb"), tmp
+
+
+def _discard(tmp: str) -> None:
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+
+
 def _atomic_write_json(path: str, payload: Any) -> None:
-    tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, path)  # atomic on most OSes
+    f, tmp = _temp_file(path)
+    try:
+        with f:
+            f.write(json.dumps(payload, indent=2, ensure_ascii=False).encode("utf-8"))
+        os.replace(tmp, path)  # atomic on most OSes
+    except BaseException:
+        _discard(tmp)
+        raise
+
+
+def _repair_tail(path: str, size: int) -> None:
+    """Cut path back to size (bytes past it are a torn write). Writers only, under the lock."""
+    if _file_size(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def iter_batches(items: Iterable[Any], size: int = UPSERT_BATCH_DECKS) -> Iterator[List[Any]]:
+    """Lists of up to size consecutive items, pulled from items lazily."""
+    it = iter(items)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
 
 
-def _normalize_cards(raw_cards: Any) -> List[Dict[str, str]]:
+def clean_card(q: Any, a: Any) -> Optional[Tuple[str, str]]:
+    """The one rule for what counts as a card: stripped text, not both sides empty."""
+    q = str(q).strip()
+    a = str(a).strip()
+    return (q, a) if q or a else None
+
+
+def _normalize_cards(raw_cards: Any) -> Cards:
     if not isinstance(raw_cards, list):
         return []
-    out: List[Dict[str, str]] = []
+    questions: List[str] = []
+    answers: List[str] = []
     for item in raw_cards:
         if not isinstance(item, dict):
             continue
-        q = str(item.get("q", "")).strip()
-        a = str(item.get("a", "")).strip()
-        if q or a:
-            out.append({"q": q, "a": a})
-    return out
+        card = clean_card(item.get("q", ""), item.get("a", ""))
+        if card:
+            questions.append(card[0])
+            answers.append(card[1])
+    if len(questions) >= COLUMNAR_MIN_CARDS:
+        return CardColumns(questions, answers)
+    return [Card(q, a) for q, a in zip(questions, answers)]
 
 
-def load_decks(memory_dir: str) -> Dict[str, Deck]:
-    path = _decks_path(memory_dir)
-    if not os.path.exists(path):
-        return {}
+def _deck_from_raw(deck_id: str, d: Dict[str, Any]) -> Deck:
+    created_at = d.get("created_at", time.time())
+    try:
+        created_at_f = float(created_at)
+    except Exception:
+        created_at_f = time.time()
 
-    with open(path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    return Deck(
+        id=str(d.get("id", deck_id)),
+        name=str(d.get("name", "Untitled Deck")),
+        topic=sys.intern(str(d.get("topic", ""))),
+        difficulty=sys.intern(str(d.get("difficulty", "Beginner"))),
+        cards=_normalize_cards(d.get("cards")),
+        created_at=created_at_f,
+    )
 
-    if not isinstance(raw, dict):
-        return {}
 
-    decks: Dict[str, Deck] = {}
-    for deck_id, d in raw.items():
-        if not isinstance(d, dict):
-            continue
+def _deck_to_raw(deck: Deck) -> Dict[str, Any]:
+    return {
+        "id": deck.id,
+        "name": deck.name,
+        "topic": deck.topic,
+        "difficulty": deck.difficulty,
+        "cards": cards_to_raw(deck.cards),
+        "created_at": deck.created_at,
+    }
+
+
+def _summary_from_raw(deck_id: str, d: Dict[str, Any]) -> DeckSummary:
+    # Same defaults as _deck_from_raw, but only counts cards instead of building them.
+    created_at = d.get("created_at", time.time())
+    try:
+        created_at_f = float(created_at)
+    except Exception:
+        created_at_f = time.time()
+
+    raw_cards = d.get("cards")
+    card_count = 0
+    if isinstance(raw_cards, list):
+        for item in raw_cards:
+            if isinstance(item, dict) and clean_card(item.get("q", ""), item.get("a", "")):
+                card_count += 1
+
+    return DeckSummary(
+        id=str(d.get("id", deck_id)),
+        name=str(d.get("name", "Untitled Deck")),
+        topic=sys.intern(str(d.get("topic", ""))),
+        difficulty=sys.intern(str(d.get("difficulty", "Beginner"))),
+        card_count=card_count,
+        created_at=created_at_f,
+    )
+
+
+def _sidecar_record(deck_id: str, loc: _Loc, summary: DeckSummary, end: int) -> Dict[str, Any]:
+    return {
+        "id": deck_id,
+        "deck_id": summary.id,
+        "name": summary.name,
+        "topic": summary.topic,
+        "difficulty": summary.difficulty,
+        "card_count": summary.card_count,
+        "created_at": summary.created_at,
+        "src": loc.source,
+        "off": loc.offset,
+        "len": loc.length,
+        "end": end,
+    }
+
+
+def _parse_snapshot_line(line: bytes) -> Tuple[str, Any]:
+    # '"deck_1": {...}' -> ("deck_1", {...})
+    item = json.loads(b"{" + line + b"}")
+    if not isinstance(item, dict) or len(item) != 1:
+        raise ValueError("Bad snapshot line.")
+    deck_id, raw = next(iter(item.items()))
+    return str(deck_id), raw
+
+
+class _DeckStore:
+    """Snapshot + operation log for one memory_dir, with an id -> location index.
+
+    The index (location + DeckSummary per deck) is persisted next to the data in
+    decks.index so a cold start reads only summaries, never card payloads. Its
+    first line records which snapshot it describes; every other line mirrors a
+    snapshot entry or a log op and notes how far into decks.log it reaches
+    ("end"). Anything in the log past that point is replayed on load.
+
+    Processes sharing memory_dir (the app, the CLI importer) take the file lock
+    decks.lock around every refresh, append and compaction. Reads never modify
+    the files: a torn tail is only cut off by the next writer.
+    """
+
+    def __init__(self, memory_dir: str) -> None:
+        self.memory_dir = memory_dir
+        _ensure_dir(memory_dir)
+        self.lock = FileLock(Path(memory_dir) / "decks.lock")
+        self.index: Dict[str, _Loc] = {}
+        self.summaries: Dict[str, DeckSummary] = {}
+        self._snap_sig: Optional[Tuple[int, int, int]] = None
+        self._log_size = 0
+        self._log_ops = 0
+        self._loaded = False
+
+    @property
+    def snapshot_path(self) -> str:
+        return _decks_path(self.memory_dir)
+
+    @property
+    def log_path(self) -> str:
+        return _decks_log_path(self.memory_dir)
+
+    @property
+    def sidecar_path(self) -> str:
+        return _decks_index_path(self.memory_dir)
+
+    # -- index maintenance -------------------------------------------------
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the files on disk (stat-only if unchanged)."""
+        with self.lock:
+            snap_sig = _file_sig(self.snapshot_path)
+            log_size = _file_size(self.log_path)
+            if not self._loaded or snap_sig != self._snap_sig or log_size < self._log_size:
+                self._rebuild(snap_sig)
+            elif log_size > self._log_size:
+                self._replay_log(self._log_size)
+
+    def _set(self, deck_id: str, loc: _Loc, summary: DeckSummary) -> None:
+        self.index[deck_id] = loc
+        self.summaries[deck_id] = summary
+
+    def _unset(self, deck_id: str) -> None:
+        self.index.pop(deck_id, None)
+        self.summaries.pop(deck_id, None)
+
+    def _rebuild(self, snap_sig: Optional[Tuple[int, int, int]]) -> None:
+        self.index = {}
+        self.summaries = {}
+        self._snap_sig = snap_sig
+        self._log_size = 0
+        self._log_ops = 0
+        self._loaded = True
+
+        if self._load_sidecar(snap_sig):
+            if _file_size(self.log_path) > self._log_size:
+                self._replay_log(self._log_size)
+            return
+
+        if snap_sig is not None and not self._index_snapshot():
+            # Older pretty-printed decks.json: rewrite it once in line format.
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            items = raw.items() if isinstance(raw, dict) else []
+            self._write_snapshot(((str(k), v) for k, v in items if isinstance(v, dict)), truncate_log=False)
+
+        self._replay_log(0, sidecar=False)
+        self._write_sidecar()
+
+    def _index_snapshot(self) -> bool:
+        with open(self.snapshot_path, "rb") as f:
+            data = f.read()
+
+        lines = data.split(b"\n")
+        if not lines or lines[0] != b"{":
+            return False
+
+        index: Dict[str, _Loc] = {}
+        summaries: Dict[str, DeckSummary] = {}
+        pos = len(lines[0]) + 1
+        closed = False
+        for line in lines[1:]:
+            if closed:
+                if line.strip():
+                    return False
+            elif line == b"}":
+                closed = True
+            else:
+                body = line[:-1] if line.endswith(b",") else line
+                try:
+                    deck_id, raw = _parse_snapshot_line(body)
+                except Exception:
+                    return False
+                if isinstance(raw, dict):
+                    index[deck_id] = _Loc(_SNAPSHOT, pos, len(body))
+                    summaries[deck_id] = _summary_from_raw(deck_id, raw)
+            pos += len(line) + 1
+
+        if not closed:
+            return False
+        self.index = index
+        self.summaries = summaries
+        return True
+
+    def _replay_log(self, start: int, sidecar: bool = True) -> None:
+        if not os.path.exists(self.log_path):
+            self._log_size = 0
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+
+        records: List[Dict[str, Any]] = []
+
+        def apply(op: Dict[str, Any], offset: int, length: int, end: int) -> None:
+            deck_id = str(op["id"])
+            if op["op"] == "put" and isinstance(op.get("deck"), dict):
+                loc = _Loc(_LOG, offset, length)
+                summary = _summary_from_raw(deck_id, op["deck"])
+                self._set(deck_id, loc, summary)
+                records.append(_sidecar_record(deck_id, loc, summary, end))
+            elif op["op"] == "del":
+                self._unset(deck_id)
+                records.append({"id": deck_id, "del": True, "end": end})
+            self._log_ops += 1
+
+        # Ops written by put_many carry a "txn" id and only count once the
+        # matching {"op": "commit"} line is there.
+        txn_ops: List[Tuple[Dict[str, Any], int, int]] = []
+        txn_pos: Optional[int] = None
+        pos = 0
+        while True:
+            nl = data.find(b"\n", pos)
+            if nl < 0:
+                # A final fragment without its newline: not complete (yet). Left on
+                # disk for the next writer to repair, never cut off from here.
+                break
+            try:
+                op = json.loads(data[pos:nl])
+                kind = op["op"]
+                if kind != "commit":
+                    str(op["id"])
+            except Exception:
+                log.warning("%s: skipping unreadable line at byte %d", self.log_path, start + pos)
+                pos = nl + 1
+                continue
+            txn = op.get("txn")
+            if txn_ops and txn != txn_ops[0][0].get("txn"):
+                # Another op before the commit: that batch was abandoned.
+                txn_ops, txn_pos = [], None
+            if kind == "commit":
+                for pending, offset, length in txn_ops:
+                    apply(pending, offset, length, start + nl + 1)
+                txn_ops, txn_pos = [], None
+            elif txn:
+                if txn_pos is None:
+                    txn_pos = pos
+                txn_ops.append((op, start + pos, nl - pos))
+            else:
+                apply(op, start + pos, nl - pos, start + nl + 1)
+            pos = nl + 1
+
+        # An open batch at the end is not applied yet; stop before it so the next
+        # refresh looks at it again (its commit may still be on the way).
+        self._log_size = start + (txn_pos if txn_pos is not None else pos)
+
+        if sidecar and records:
+            self._append_sidecar(records)
+
+    # -- sidecar index -----------------------------------------------------
+
+    def _load_sidecar(self, snap_sig: Optional[Tuple[int, int, int]]) -> bool:
+        try:
+            with open(self.sidecar_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        lines = data.split(b"\n")
+        try:
+            header = json.loads(lines[0])
+        except Exception:
+            return False
+        if not isinstance(header, dict) or header.get("snapshot") != (list(snap_sig) if snap_sig else None):
+            return False
+
+        end = 0
+        ops = 0
+        last = len(lines) - 1
+        for n, line in enumerate(lines[1:], 1):
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                deck_id = str(rec["id"])
+                if rec.get("del"):
+                    self._unset(deck_id)
+                else:
+                    self._set(
+                        deck_id,
+                        _Loc(int(rec["src"]), int(rec["off"]), int(rec["len"])),
+                        DeckSummary(
+                            id=str(rec["deck_id"]),
+                            name=str(rec["name"]),
+                            topic=str(rec["topic"]),
+                            difficulty=str(rec["difficulty"]),
+                            card_count=int(rec["card_count"]),
+                            created_at=float(rec["created_at"]),
+                        ),
+                    )
+                if rec.get("del") or rec.get("src") == _LOG:
+                    ops += 1
+                end = max(end, int(rec.get("end", 0)))
+            except Exception:
+                if n == last:
+                    # Torn tail (no newline); whatever it described is still in decks.log.
+                    break
+                # A bad record in the middle would hide the ones it shadows: rebuild instead.
+                log.warning("%s: unreadable record, rebuilding the index", self.sidecar_path)
+                self.index = {}
+                self.summaries = {}
+                return False
+
+        if end > _file_size(self.log_path):
+            self.index = {}
+            self.summaries = {}
+            return False
+
+        self._log_size = end
+        self._log_ops = ops
+        return True
+
+    def _write_sidecar(self) -> None:
+        lines = [json.dumps({"snapshot": list(self._snap_sig) if self._snap_sig else None})]
+        for deck_id, loc in self.index.items():
+            record = _sidecar_record(deck_id, loc, self.summaries[deck_id], self._log_size)
+            lines.append(json.dumps(record, ensure_ascii=False))
+        f, tmp = _temp_file(self.sidecar_path)
+        try:
+            with f:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            os.replace(tmp, self.sidecar_path)
+        except BaseException:
+            _discard(tmp)
+            raise
+
+    def _append_sidecar(self, records: List[Dict[str, Any]]) -> None:
+        # No fsync: if these lines are lost, the same ops are replayed from decks.log.
+        with open(self.sidecar_path, "ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                # Finish off a torn last line first, so the new records start on their own line.
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+
+    # -- reads -------------------------------------------------------------
+
+    def read_one(self, deck_id: str) -> Optional[Any]:
+        loc = self.index.get(deck_id)
+        if loc is None:
+            return None
+        path = self.snapshot_path if loc.source == _SNAPSHOT else self.log_path
+        with open(path, "rb") as f:
+            f.seek(loc.offset)
+            line = f.read(loc.length)
+        if loc.source == _SNAPSHOT:
+            _, raw = _parse_snapshot_line(line)
+        else:
+            raw = json.loads(line)["deck"]
+        return raw if isinstance(raw, dict) else None
+
+    def read_all(self) -> Dict[str, Any]:
+        snap = b""
+        log = b""
+        if any(loc.source == _SNAPSHOT for loc in self.index.values()):
+            with open(self.snapshot_path, "rb") as f:
+                snap = f.read()
+        if any(loc.source == _LOG for loc in self.index.values()):
+            with open(self.log_path, "rb") as f:
+                log = f.read(self._log_size)
+
+        out: Dict[str, Any] = {}
+        for deck_id, loc in self.index.items():
+            if loc.source == _SNAPSHOT:
+                _, raw = _parse_snapshot_line(snap[loc.offset : loc.offset + loc.length])
+            else:
+                raw = json.loads(log[loc.offset : loc.offset + loc.length])["deck"]
+            if isinstance(raw, dict):
+                out[deck_id] = raw
+        return out
+
+    def iter_all(self) -> Iterator[Tuple[str, Any]]:
+        """(deck id, raw deck) one at a time: a record is read only when it's needed."""
+        files: Dict[int, Any] = {}
+        try:
+            for deck_id, loc in list(self.index.items()):
+                f = files.get(loc.source)
+                if f is None:
+                    path = self.snapshot_path if loc.source == _SNAPSHOT else self.log_path
+                    f = files[loc.source] = open(path, "rb")
+                f.seek(loc.offset)
+                line = f.read(loc.length)
+                raw = _parse_snapshot_line(line)[1] if loc.source == _SNAPSHOT else json.loads(line)["deck"]
+                if isinstance(raw, dict):
+                    yield deck_id, raw
+        finally:
+            # Closed before _write_snapshot swaps the files.
+            for f in files.values():
+                f.close()
+
+    # -- writes ------------------------------------------------------------
+
+    def _append(self, op: Dict[str, Any]) -> _Loc:
+        # Caller holds the lock and has refreshed: anything past _log_size is a torn write.
+        _repair_tail(self.log_path, self._log_size)
+        line = json.dumps(op, ensure_ascii=False).encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            offset = f.tell()
+            f.write(line + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_size = offset + len(line) + 1
+        self._log_ops += 1
+        return _Loc(_LOG, offset, len(line))
+
+    def put(self, deck: Deck) -> None:
+        with self.lock:
+            self.refresh()
+            raw = _deck_to_raw(deck)
+            loc = self._append({"op": "put", "id": deck.id, "deck": raw})
+            summary = _summary_from_raw(deck.id, raw)
+            self._set(deck.id, loc, summary)
+            self._append_sidecar([_sidecar_record(deck.id, loc, summary, self._log_size)])
+            self._maybe_compact()
+
+    def put_many(self, decks: Iterable[Deck]) -> int:
+        """Write a stream of decks as one batch: a single append and fsync, all or nothing.
+
+        Decks are serialized one at a time as the iterable yields them, so only
+        their summaries are held until the batch commits. They're staged in a
+        temp file first; the lock is only held to copy it onto the log.
+        """
+        txn = f"{time.time_ns():x}"
+        pending: List[Tuple[str, int, int, DeckSummary]] = []
+        staged, tmp = _temp_file(self.log_path)
+        try:
+            with staged:
+                offset = 0
+                for deck in decks:
+                    raw = _deck_to_raw(deck)
+                    line = json.dumps({"op": "put", "id": deck.id, "txn": txn, "deck": raw}, ensure_ascii=False).encode("utf-8")
+                    staged.write(line + b"\n")
+                    pending.append((deck.id, offset, len(line), _summary_from_raw(deck.id, raw)))
+                    offset += len(line) + 1
+                if pending:
+                    staged.write(json.dumps({"op": "commit", "txn": txn}).encode("utf-8") + b"\n")
+            if not pending:
+                return 0
+
+            with self.lock:
+                self.refresh()
+                _repair_tail(self.log_path, self._log_size)
+                with open(self.log_path, "ab") as f, open(tmp, "rb") as src:
+                    begin = f.tell()
+                    try:
+                        shutil.copyfileobj(src, f, 1 << 20)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    except BaseException:
+                        f.truncate(begin)
+                        raise
+                    end = f.tell()
+
+                self._log_size = end
+                self._log_ops += len(pending)
+                records = []
+                for deck_id, off, length, summary in pending:
+                    loc = _Loc(_LOG, begin + off, length)
+                    self._set(deck_id, loc, summary)
+                    records.append(_sidecar_record(deck_id, loc, summary, end))
+                self._append_sidecar(records)
+                self._maybe_compact()
+            return len(pending)
+        finally:
+            _discard(tmp)
+
+    def delete(self, deck_id: str) -> bool:
+        with self.lock:
+            self.refresh()
+            if deck_id not in self.index:
+                return False
+            self._append({"op": "del", "id": deck_id})
+            self._unset(deck_id)
+            self._append_sidecar([{"id": deck_id, "del": True, "end": self._log_size}])
+            self._maybe_compact()
+            return True
+
+    def _maybe_compact(self) -> None:
+        snap_size = self._snap_sig[1] if self._snap_sig else 0
+        if self._log_ops >= COMPACT_MIN_OPS and self._log_size > snap_size:
+            self.compact()
+
+    def compact(self) -> None:
+        with self.lock:
+            self.refresh()
+            # Streamed, so compacting after a big import doesn't hold every deck at once.
+            self._write_snapshot(self.iter_all())
+
+    def _write_snapshot(self, records: Iterable[Tuple[str, Any]], truncate_log: bool = True) -> None:
+        # Write + fsync the new snapshot, swap it in, then empty the log and
+        # rewrite the sidecar. A crash in between leaves a sidecar whose header
+        # no longer matches, so the next load rebuilds from snapshot + log
+        # (replaying puts/dels that are already in the snapshot is harmless).
+        path = self.snapshot_path
+        index: Dict[str, _Loc] = {}
+        summaries: Dict[str, DeckSummary] = {}
+        f, tmp = _temp_file(path)
+        try:
+            with f:
+                f.write(b"{\n")
+                pos = 2
+                first = True
+                for deck_id, raw in records:
+                    if not first:
+                        f.write(b",\n")
+                        pos += 2
+                    first = False
+                    line = (
+                        json.dumps(deck_id, ensure_ascii=False) + ": " + json.dumps(raw, ensure_ascii=False)
+                    ).encode("utf-8")
+                    f.write(line)
+                    index[deck_id] = _Loc(_SNAPSHOT, pos, len(line))
+                    summaries[deck_id] = _summary_from_raw(deck_id, raw)
+                    pos += len(line)
+                f.write(b"\n}\n" if not first else b"}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            _discard(tmp)
+            raise
+
+        if truncate_log:
+            with open(self.log_path, "wb"):
+                pass
+
+        self.index = index
+        self.summaries = summaries
+        self._snap_sig = _file_sig(path)
+        self._log_size = 0
+        self._log_ops = 0
+        if truncate_log:
+            self._write_sidecar()
+
+
+class StorageBackend(ABC):
+    """Where decks and stats live for one memory_dir. See get_backend()."""
+
+    @abstractmethod
+    def load_decks(self) -> Dict[str, Deck]: ...
+
+    @abstractmethod
+    def load_deck(self, deck_id: str) -> Optional[Deck]: ...
+
+    @abstractmethod
+    def save_decks(self, decks: Dict[str, Deck]) -> None: ...
+
+    @abstractmethod
+    def upsert_deck(self, deck: Deck) -> None: ...
+
+    def upsert_decks(self, decks: Iterable[Deck]) -> int:
+        """Insert/replace many decks in one transaction; returns how many were written."""
+        n = 0
+        for deck in decks:
+            self.upsert_deck(deck)
+            n += 1
+        return n
+
+    @abstractmethod
+    def delete_deck(self, deck_id: str) -> bool: ...
+
+    @abstractmethod
+    def count_decks(self) -> int: ...
+
+    @abstractmethod
+    def page_decks(self, offset: int = 0, limit: Optional[int] = None) -> List[DeckSummary]:
+        """Deck summaries, newest first, without card payloads."""
+
+    def load_deck_summaries(self) -> List[DeckSummary]:
+        return self.page_decks()
+
+    @abstractmethod
+    def load_stats(self) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def save_stats(self, stats: Dict[str, Any]) -> None: ...
+
+    def compact(self) -> None:
+        pass
+
+    def deck_version(self) -> Any:
+        """Cheap token that changes whenever decks change on disk (None = unknown)."""
+        return None
+
+    def stats_version(self) -> Any:
+        return None
+
+
+class JsonBackend(StorageBackend):
+    """decks.json + decks.log + stats.json inside memory_dir."""
+
+    def __init__(self, memory_dir: str) -> None:
+        self.memory_dir = memory_dir
+        self.store = _DeckStore(memory_dir)
+
+    def load_decks(self) -> Dict[str, Deck]:
+        with self.store.lock:
+            self.store.refresh()
+            raw = self.store.read_all()
+        return {deck_id: _deck_from_raw(deck_id, d) for deck_id, d in raw.items()}
+
+    def load_deck(self, deck_id: str) -> Optional[Deck]:
+        with self.store.lock:
+            self.store.refresh()
+            raw = self.store.read_one(deck_id)
+        return _deck_from_raw(deck_id, raw) if raw is not None else None
+
+    def save_decks(self, decks: Dict[str, Deck]) -> None:
+        with self.store.lock:
+            self.store._write_snapshot((deck_id, _deck_to_raw(deck)) for deck_id, deck in decks.items())
+
+    def upsert_deck(self, deck: Deck) -> None:
+        self.store.put(deck)
+
+    def upsert_decks(self, decks: Iterable[Deck]) -> int:
+        return self.store.put_many(decks)
+
+    def delete_deck(self, deck_id: str) -> bool:
+        return self.store.delete(deck_id)
+
+    def count_decks(self) -> int:
+        with self.store.lock:
+            self.store.refresh()
+            return len(self.store.index)
+
+    def page_decks(self, offset: int = 0, limit: Optional[int] = None) -> List[DeckSummary]:
+        with self.store.lock:
+            self.store.refresh()
+            summaries = sorted(self.store.summaries.values(), key=lambda s: s.created_at, reverse=True)
+        end = None if limit is None else offset + limit
+        return summaries[offset:end]
+
+    def load_stats(self) -> Dict[str, Any]:
+        path = _stats_path(self.memory_dir)
+        if not os.path.exists(path):
+            return {"streak_days": 0, "last_study_date": None}
 
-        created_at = d.get("created_at", time.time())
         try:
-            created_at_f = float(created_at)
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if not isinstance(raw, dict):
+                return {"streak_days": 0, "last_study_date": None}
+            return raw
         except Exception:
-            created_at_f = time.time()
+            return {"streak_days": 0, "last_study_date": None}
+
+    def save_stats(self, stats: Dict[str, Any]) -> None:
+        path = _stats_path(self.memory_dir)
+        _atomic_write_json(path, stats)
+
+    def compact(self) -> None:
+        self.store.compact()
+
+    def deck_version(self) -> Any:
+        with self.store.lock:
+            self.store.refresh()
+            return (self.store._snap_sig, self.store._log_size)
+
+    def stats_version(self) -> Any:
+        return _file_sig(_stats_path(self.memory_dir))
+
+
+class CachedBackend(StorageBackend):
+    """Keeps parsed decks and stats in memory in front of another backend.
+
+    Every read first asks the inner backend for deck_version()/stats_version()
+    (a stat call for JSON, PRAGMA data_version for SQLite) and only goes back to
+    disk when that changed. Decks are evicted least-recently-used once more than
+    max_cards cards are cached. Returned objects are shared: treat them as read-only.
+    """
+
+    def __init__(self, inner: StorageBackend, max_cards: int = CACHE_MAX_CARDS) -> None:
+        self.inner = inner
+        self.max_cards = max_cards
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+        self._decks: OrderedDict[str, Deck] = OrderedDict()
+        self._cached_cards = 0
+        self._complete = False  # _decks holds every deck
+        self._count: Optional[int] = None
+        self._pages: Dict[Tuple[int, Optional[int]], List[DeckSummary]] = {}
+        self._deck_version: Any = None
+
+        self._stats: Optional[Dict[str, Any]] = None
+        self._stats_version: Any = None
 
-        decks[str(deck_id)] = Deck(
-            id=str(d.get("id", deck_id)),
-            name=str(d.get("name", "Untitled Deck")),
-            topic=str(d.get("topic", "")),
-            difficulty=str(d.get("difficulty", "Beginner")),
-            cards=_normalize_cards(d.get("cards")),
-            created_at=created_at_f,
-        )
+    # -- bookkeeping -------------------------------------------------------
 
-    return decks
+    def _drop_decks(self) -> None:
+        self._decks.clear()
+        self._cached_cards = 0
+        self._complete = False
+        self._count = None
+        self._pages.clear()
+
+    def _check_decks(self) -> None:
+        version = self.inner.deck_version()
+        if version is None or version != self._deck_version:
+            self._drop_decks()
+            self._deck_version = version
+
+    def _remember(self, deck: Deck) -> None:
+        self._forget(deck.id)
+        self._decks[deck.id] = deck
+        self._cached_cards += len(deck.cards)
+        while self._cached_cards > self.max_cards and len(self._decks) > 1:
+            _, old = self._decks.popitem(last=False)
+            self._cached_cards -= len(old.cards)
+            self._complete = False
+
+    def _forget(self, deck_id: str) -> None:
+        old = self._decks.pop(deck_id, None)
+        if old is not None:
+            self._cached_cards -= len(old.cards)
+
+    def _wrote_decks(self, before: Any) -> None:
+        # before: the inner version read just ahead of our write. Adopt the new
+        # version only if that still matched the cache; otherwise someone else
+        # wrote too and adopting would hide their changes, so start over.
+        if before is None or before != self._deck_version:
+            self._drop_decks()
+        self._deck_version = self.inner.deck_version()
+        self._count = None
+        self._pages.clear()
+
+    # -- decks -------------------------------------------------------------
+
+    def load_decks(self) -> Dict[str, Deck]:
+        with self.lock:
+            self._check_decks()
+            if self._complete:
+                self.hits += 1
+                return dict(self._decks)
+
+            self.misses += 1
+            decks = self.inner.load_decks()
+            self._drop_decks()
+            self._complete = True
+            for deck in decks.values():
+                self._remember(deck)
+            self._count = len(decks)
+            return decks
+
+    def load_deck(self, deck_id: str) -> Optional[Deck]:
+        with self.lock:
+            self._check_decks()
+            deck = self._decks.get(deck_id)
+            if deck is not None:
+                self.hits += 1
+                self._decks.move_to_end(deck_id)
+                return deck
+            if self._complete:
+                self.hits += 1
+                return None
+
+            self.misses += 1
+            deck = self.inner.load_deck(deck_id)
+            if deck is not None:
+                self._remember(deck)
+            return deck
+
+    def save_decks(self, decks: Dict[str, Deck]) -> None:
+        with self.lock:
+            before = self.inner.deck_version()
+            self.inner.save_decks(decks)
+            self._drop_decks()
+            self._wrote_decks(before)
+
+    def upsert_deck(self, deck: Deck) -> None:
+        with self.lock:
+            before = self.inner.deck_version()
+            self.inner.upsert_deck(deck)
+            self._wrote_decks(before)
+            self._remember(deck)
+
+    def upsert_decks(self, decks: Iterable[Deck]) -> int:
+        # Batches are pulled from the stream (parsing an import, say) outside the lock,
+        # so readers only wait for each batch's write. Not cached on the way through:
+        # an import can be far bigger than max_cards.
+        n = 0
+        for batch in iter_batches(decks):
+            with self.lock:
+                before = self.inner.deck_version()
+                try:
+                    n += self.inner.upsert_decks(batch)
+                finally:
+                    for deck in batch:
+                        self._forget(deck.id)
+                    self._complete = False
+                    self._wrote_decks(before)
+        return n
+
+    def delete_deck(self, deck_id: str) -> bool:
+        with self.lock:
+            before = self.inner.deck_version()
+            deleted = self.inner.delete_deck(deck_id)
+            self._forget(deck_id)
+            self._wrote_decks(before)
+            return deleted
+
+    def count_decks(self) -> int:
+        with self.lock:
+            self._check_decks()
+            if self._count is None:
+                self._count = self.inner.count_decks()
+            return self._count
+
+    def page_decks(self, offset: int = 0, limit: Optional[int] = None) -> List[DeckSummary]:
+        with self.lock:
+            self._check_decks()
+            key = (offset, limit)
+            page = self._pages.get(key)
+            if page is None:
+                if len(self._pages) >= CACHE_MAX_PAGES:
+                    self._pages.clear()
+                page = self._pages[key] = self.inner.page_decks(offset, limit)
+            return list(page)
+
+    def compact(self) -> None:
+        with self.lock:
+            before = self.inner.deck_version()
+            self.inner.compact()
+            self._wrote_decks(before)
+
+    def deck_version(self) -> Any:
+        return self.inner.deck_version()
+
+    # -- stats -------------------------------------------------------------
+
+    def load_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            version = self.inner.stats_version()
+            if self._stats is None or version is None or version != self._stats_version:
+                self._stats = self.inner.load_stats()
+                self._stats_version = version
+            return dict(self._stats)
+
+    def save_stats(self, stats: Dict[str, Any]) -> None:
+        with self.lock:
+            self.inner.save_stats(stats)
+            self._stats = dict(stats)
+            self._stats_version = self.inner.stats_version()
+
+    def stats_version(self) -> Any:
+        return self.inner.stats_version()
+
+
+def _sqlite_backend(memory_dir: str) -> StorageBackend:
+    from sqlite_storage import SqliteBackend
+
+    return SqliteBackend(memory_dir)
+
+
+# FLASHCARDS_STORAGE picks the backend; register_backend() adds more.
+BACKENDS: Dict[str, Callable[[str], StorageBackend]] = {
+    "json": JsonBackend,
+    "sqlite": _sqlite_backend,
+}
+DEFAULT_BACKEND = "json"
+
+_BACKENDS_OPEN: Dict[Tuple[str, str], StorageBackend] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[str], StorageBackend]) -> None:
+    BACKENDS[name] = factory
+
+
+def get_backend(memory_dir: str, kind: Optional[str] = None) -> StorageBackend:
+    """Process-wide (cached) backend for memory_dir, shared by every Streamlit session."""
+    kind = (kind or os.getenv("FLASHCARDS_STORAGE", "") or DEFAULT_BACKEND).strip().lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {kind!r} (choose from {', '.join(BACKENDS)})")
+
+    key = (kind, os.path.abspath(memory_dir))
+    with _BACKENDS_LOCK:
+        backend = _BACKENDS_OPEN.get(key)
+        if backend is None:
+            backend = _BACKENDS_OPEN[key] = CachedBackend(BACKENDS[kind](memory_dir))
+        return backend
+
+
+def load_decks(memory_dir: str) -> Dict[str, Deck]:
+    return get_backend(memory_dir).load_decks()
+
+
+def load_deck(memory_dir: str, deck_id: str) -> Optional[Deck]:
+    return get_backend(memory_dir).load_deck(deck_id)
 
 
 def save_decks(memory_dir: str, decks: Dict[str, Deck]) -> None:
-    path = _decks_path(memory_dir)
-    payload: Dict[str, Any] = {deck_id: asdict(deck) for deck_id, deck in decks.items()}
-    _atomic_write_json(path, payload)
+    get_backend(memory_dir).save_decks(decks)
 
 
 def upsert_deck(memory_dir: str, deck: Deck) -> None:
-    decks = load_decks(memory_dir)
-    decks[deck.id] = deck
-    save_decks(memory_dir, decks)
+    get_backend(memory_dir).upsert_deck(deck)
+
+
+def upsert_decks(memory_dir: str, decks: Iterable[Deck]) -> int:
+    return get_backend(memory_dir).upsert_decks(decks)
 
 
 def delete_deck(memory_dir: str, deck_id: str) -> bool:
-    decks = load_decks(memory_dir)
-    if deck_id not in decks:
-        return False
-    decks.pop(deck_id, None)
-    save_decks(memory_dir, decks)
-    return True
+    return get_backend(memory_dir).delete_deck(deck_id)
 
 
-def load_stats(memory_dir: str) -> Dict[str, Any]:
-    path = _stats_path(memory_dir)
-    if not os.path.exists(path):
-        return {"streak_days": 0, "last_study_date": None}
+def count_decks(memory_dir: str) -> int:
+    return get_backend(memory_dir).count_decks()
 
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        if not isinstance(raw, dict):
-            return {"streak_days": 0, "last_study_date": None}
-        return raw
-    except Exception:
-        return {"streak_days": 0, "last_study_date": None}
+
+def page_decks(memory_dir: str, offset: int = 0, limit: Optional[int] = None) -> List[DeckSummary]:
+    return get_backend(memory_dir).page_decks(offset, limit)
+
+
+def load_deck_summaries(memory_dir: str) -> List[DeckSummary]:
+    """Every deck's name/topic/difficulty/card_count/created_at, newest first, without cards."""
+    return get_backend(memory_dir).load_deck_summaries()
+
+
+def compact_decks(memory_dir: str) -> None:
+    get_backend(memory_dir).compact()
+
+
+def load_stats(memory_dir: str) -> Dict[str, Any]:
+    return get_backend(memory_dir).load_stats()
 
 
 def save_stats(memory_dir: str, stats: Dict[str, Any]) -> None:
-    path = _stats_path(memory_dir)
-    _atomic_write_json(path, stats)
+    get_backend(memory_dir).save_stats(stats)